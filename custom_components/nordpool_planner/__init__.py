@@ -2,49 +2,176 @@
 
 from __future__ import annotations
 
+import asyncio
+import bisect
+from collections import deque
+from collections.abc import Callable, Hashable
+from concurrent.futures import ThreadPoolExecutor
 import datetime as dt
+import functools
 import logging
+import os
+import threading
+import time
+from typing import Any
 
 from homeassistant.config_entries import SOURCE_IMPORT, ConfigEntry
 from homeassistant.const import (
     ATTR_UNIT_OF_MEASUREMENT,
+    EVENT_HOMEASSISTANT_STOP,
     STATE_UNAVAILABLE,
     STATE_UNKNOWN,
     Platform,
 )
-from homeassistant.core import HomeAssistant, HomeAssistantError
+from homeassistant.core import HomeAssistant, HomeAssistantError, ServiceCall, callback
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_point_in_time,
     async_track_state_change_event,
     async_track_time_change,
 )
+from homeassistant.helpers.storage import STORAGE_DIR
+from homeassistant.helpers.typing import ConfigType
 from homeassistant.util import dt as dt_util
-
+import voluptuous as vol
+
+from .battery import (
+    BatteryAction,
+    BatteryOptimizer,
+    BatteryParameters,
+    BatteryPlan,
+    BatteryPlanStep,
+)
+from .cache import PlanCache
 from .config_flow import NordpoolPlannerConfigFlow
 from .const import (
+    ATTR_CONFIG_ENTRY_ID,
+    ATTR_REPLANS,
+    ATTR_TIMEOUT,
     CONF_ACCEPT_COST_ENTITY,
+    CONF_ACCEPT_PERCENTILE_ENTITY,
     CONF_ACCEPT_RATE_ENTITY,
+    CONF_BATTERY_CAPACITY_ENTITY,
+    CONF_CHARGE_POWER_ENTITY,
+    CONF_CO2_ENTITY,
+    CONF_CO2_WEIGHT_ENTITY,
+    CONF_COMFORT_MAX_ENTITY,
+    CONF_COMFORT_MIN_ENTITY,
+    CONF_DISCHARGE_POWER_ENTITY,
     CONF_DURATION_ENTITY,
+    CONF_EFFICIENCY_ENTITY,
     CONF_END_TIME_ENTITY,
+    CONF_FORECAST,
+    CONF_GROUP,
+    CONF_GROUP_POWER_LIMIT,
     CONF_HEALTH_ENTITY,
+    CONF_HEATER_POWER_ENTITY,
+    CONF_INDOOR_TEMP_ENTITY,
+    CONF_LOSS_COEFFICIENT_ENTITY,
+    CONF_OUTDOOR_TEMP_ENTITY,
+    CONF_POWER_ENTITY,
     CONF_PRICES_ENTITY,
+    CONF_RISK_ENTITY,
     CONF_SEARCH_LENGTH_ENTITY,
+    CONF_SOC_ENTITY,
     CONF_START_TIME_ENTITY,
+    CONF_THERMAL_CAPACITY_ENTITY,
     CONF_TYPE,
+    CONF_TYPE_BATTERY,
+    CONF_TYPE_DEADLINE,
     CONF_TYPE_MOVING,
     CONF_TYPE_STATIC,
+    CONF_TYPE_THERMAL,
     CONF_USED_HOURS_LOW_ENTITY,
+    CONF_WORKERS,
+    DATA_PLAN_CACHE,
+    DATA_PLANNER_GROUPS,
+    DATA_PRICES_BATCHES,
+    DATA_PROFILER,
+    DATA_TICK_DISPATCHER,
+    DATA_WORKER_POOL,
+    DATA_WORKERS,
     DOMAIN,
-    NAME_FILE_READER,
-    PATH_FILE_READER,
+    FORECAST_SCENARIOS,
+    HISTORY_DIR,
+    HISTORY_RETENTION_DAYS,
+    PLAN_CACHE_SIZE,
+    PLAN_TRACE_SIZE,
+    PLANNER_MAX_WORKERS,
+    PLANNER_TIMEOUT,
+    PLANNER_WORKERS,
+    PROFILE_MAX_BYTES,
+    PROFILE_MAX_REPLANS,
+    PROFILE_MAX_SECONDS,
+    SERVICE_PROFILE,
+    SIGNAL_SOURCE_REFRESHED,
     PlannerStates,
 )
-from .helpers import get_np_from_file
+from .deadline import DeadlinePlan, DeadlineSchedule
+from .forecast import PROFILE_WEEKS, PriceProfile, PriceScenarios
+from .group import GroupDemand, GroupSchedule, schedule_group
+from .history import PlanHistory
+from .planning import (
+    moving_range,
+    plan_windows,
+    static_duration_left,
+    static_range,
+)
+from .profiling import PlanProfiler, summary
+from .series import PriceSeries, PriceWindow
+from .sources import PriceSourceAdapter, configured_adapter, detect_adapter
+from .stats import RollingPriceStatistics
+from .thermal import ThermalOptimizer, ThermalParameters, ThermalPlan, ThermalPlanStep
+from .trace import PlanTrace, PlanTraces
+from .websocket_api import async_register_commands
 
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS = [Platform.BINARY_SENSOR, Platform.BUTTON, Platform.NUMBER, Platform.SENSOR]
+PLATFORMS = [
+    Platform.BINARY_SENSOR,
+    Platform.BUTTON,
+    Platform.CALENDAR,
+    Platform.NUMBER,
+    Platform.SENSOR,
+]
+
+# Only settings shared by all planners, planners are configured in the UI
+CONFIG_SCHEMA = vol.Schema(
+    {
+        vol.Optional(DOMAIN): vol.Schema(
+            {
+                vol.Optional(CONF_WORKERS, default=PLANNER_WORKERS): vol.All(
+                    vol.Coerce(int), vol.Range(min=1, max=PLANNER_MAX_WORKERS)
+                ),
+            }
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_REPLANS, default=10): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=PROFILE_MAX_REPLANS)
+        ),
+        vol.Optional(ATTR_TIMEOUT, default=300): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=PROFILE_MAX_SECONDS)
+        ),
+    }
+)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the settings shared by all planners."""
+    if DOMAIN in config:
+        hass.data[DATA_WORKERS] = config[DOMAIN][CONF_WORKERS]
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
@@ -53,12 +180,21 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
 
     if DOMAIN not in hass.data:
         hass.data[DOMAIN] = {}
+        async_register_commands(hass)
 
     if config_entry.entry_id not in hass.data[DOMAIN]:
         planner = NordpoolPlanner(hass, config_entry)
         await planner.async_setup()
         hass.data[DOMAIN][config_entry.entry_id] = planner
 
+    if not hass.services.has_service(DOMAIN, SERVICE_PROFILE):
+        hass.services.async_register(
+            DOMAIN,
+            SERVICE_PROFILE,
+            functools.partial(async_profile, hass),
+            schema=PROFILE_SCHEMA,
+        )
+
     if config_entry is not None:
         if config_entry.source == SOURCE_IMPORT:
             hass.async_create_task(
@@ -76,9 +212,119 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     if unload_ok:
         planner = hass.data[DOMAIN].pop(entry.entry_id)
         planner.cleanup()
+        if not hass.data[DOMAIN]:
+            async_stop_profile(hass)
+            hass.services.async_remove(DOMAIN, SERVICE_PROFILE)
+            if pool := hass.data.pop(DATA_WORKER_POOL, None):
+                pool.shutdown(wait=False, cancel_futures=True)
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the plan history of a removed config entry."""
+
+    def _remove():
+        try:
+            os.remove(history_path(hass, entry.entry_id))
+        except FileNotFoundError:
+            pass
+
+    await hass.async_add_executor_job(_remove)
+
+
+def history_path(hass: HomeAssistant, entry_id: str) -> str:
+    """Get path of the plan history file of a config entry."""
+    return hass.config.path(STORAGE_DIR, HISTORY_DIR, f"{entry_id}.bin")
+
+
+def get_worker_pool(hass: HomeAssistant) -> ThreadPoolExecutor:
+    """Get the bounded pool for heavy planner computations, created if new."""
+    if DATA_WORKER_POOL not in hass.data:
+        pool = ThreadPoolExecutor(
+            max_workers=hass.data.get(DATA_WORKERS, PLANNER_WORKERS),
+            thread_name_prefix=DOMAIN,
+        )
+        hass.data[DATA_WORKER_POOL] = pool
+
+        async def _async_shutdown(_):
+            if hass.data.get(DATA_WORKER_POOL) is pool:
+                hass.data.pop(DATA_WORKER_POOL)
+            await hass.async_add_executor_job(
+                functools.partial(pool.shutdown, wait=True, cancel_futures=True)
+            )
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_shutdown)
+    return hass.data[DATA_WORKER_POOL]
+
+
+async def async_profile(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Profile the next replans of the selected planners, or all of them.
+
+    The stats are written to the config directory when the number of
+    replans are profiled, or at the timeout if fewer.
+    """
+    if DATA_PROFILER in hass.data:
+        raise ServiceValidationError("A profile of planners is already running")
+    entry_ids = call.data.get(ATTR_CONFIG_ENTRY_ID)
+    if entry_ids and (unknown := set(entry_ids) - set(hass.data.get(DOMAIN, {}))):
+        raise ServiceValidationError(
+            f"No planner of config entry {', '.join(sorted(unknown))}"
+        )
+    path = hass.config.path(f"{DOMAIN}_profile_{dt_util.now():%Y%m%d_%H%M%S}.prof")
+    profiler = PlanProfiler(entry_ids, call.data[ATTR_REPLANS], path)
+
+    @callback
+    def _timeout(_):
+        profiler.cancel = None
+        async_stop_profile(hass)
+
+    profiler.cancel = async_call_later(hass, call.data[ATTR_TIMEOUT], _timeout)
+    hass.data[DATA_PROFILER] = profiler
+    _LOGGER.info(
+        "Profiling next %s replans of %s",
+        profiler.replans,
+        ", ".join(entry_ids) if entry_ids else "all planners",
+    )
+
+
+@callback
+def async_stop_profile(hass: HomeAssistant) -> None:
+    """Stop the running profile, if any, and write its stats in executor."""
+    profiler: PlanProfiler | None = hass.data.pop(DATA_PROFILER, None)
+    if profiler is None:
+        return
+    if profiler.cancel is not None:
+        profiler.cancel()
+        profiler.cancel = None
+    if not profiler.profiled:
+        _LOGGER.warning("No replans profiled before timeout, nothing written")
+        return
+    hass.async_create_background_task(
+        _async_write_profile(hass, profiler), name=f"{DOMAIN} profile"
+    )
+
+
+async def _async_write_profile(hass: HomeAssistant, profiler: PlanProfiler) -> None:
+    """Write stats and log the most costly functions."""
+    try:
+        size = await hass.async_add_executor_job(profiler.write, PROFILE_MAX_BYTES)
+        rows = await hass.async_add_executor_job(summary, profiler.path, 10)
+    except OSError as e:
+        _LOGGER.error("Could not write profile to %s: %s", profiler.path, e)
+        return
+    _LOGGER.info(
+        "Profiled %s replans in %.1f ms, %s bytes of stats written to %s, "
+        "cumulative time of top functions:\n%s",
+        profiler.profiled,
+        profiler.elapsed * 1000,
+        size,
+        profiler.path,
+        "\n".join(
+            f"{ct * 1000:9.2f} ms {nc:6} calls {func}" for func, nc, _, ct in rows
+        ),
+    )
+
+
 async def async_reload_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
     """Reload the config entry."""
     await async_unload_entry(hass, config_entry)
@@ -149,6 +395,12 @@ async def async_migrate_entry(hass: HomeAssistant, config_entry: ConfigEntry) ->
             data[CONF_HEALTH_ENTITY] = True
         return data
 
+    def data_22_to_23(data: dict):
+        # Source format, group, CO2, forecast and consumption keys are
+        # optional, entries without them keep the detected format and
+        # planners of their own
+        return data
+
     if config_entry.version == 1:
         try:
             # Version 1.x to 2.0
@@ -157,6 +409,8 @@ async def async_migrate_entry(hass: HomeAssistant, config_entry: ConfigEntry) ->
             new_data = data_20_to_21(new_data)
             # Version 2.1 to 2.2
             new_data = data_21_to_22(new_data)
+            # Version 2.2 to 2.3
+            new_data = data_22_to_23(new_data)
         except MigrateError:
             _LOGGER.warning("Error while upgrading from version 1.x to 2.1")
             return False
@@ -167,6 +421,8 @@ async def async_migrate_entry(hass: HomeAssistant, config_entry: ConfigEntry) ->
             new_data = data_20_to_21(new_data)
             # Version 2.1 to 2.2
             new_data = data_21_to_22(new_data)
+            # Version 2.2 to 2.3
+            new_data = data_22_to_23(new_data)
         except MigrateError:
             _LOGGER.warning("Error while upgrading from version 2.0 to 2.1")
             return False
@@ -175,10 +431,16 @@ async def async_migrate_entry(hass: HomeAssistant, config_entry: ConfigEntry) ->
         try:
             # Version 2.1 to 2.2
             new_data = data_21_to_22(new_data)
+            # Version 2.2 to 2.3
+            new_data = data_22_to_23(new_data)
         except MigrateError:
             _LOGGER.warning("Error while upgrading from version 2.1 to 2.2")
             return False
 
+    if config_entry.version == 2 and config_entry.minor_version == 2:
+        # Version 2.2 to 2.3
+        new_data = data_22_to_23(new_data)
+
     hass.config_entries.async_update_entry(
         config_entry,
         data=new_data,
@@ -199,16 +461,31 @@ async def async_migrate_entry(hass: HomeAssistant, config_entry: ConfigEntry) ->
 class NordpoolPlanner:
     """Planner base class."""
 
-    _hourly_update = None
-
     def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
         """Initialize my coordinator."""
         self._hass = hass
         self._config = config_entry
         self._state_change_listeners = []
-
-        # Input entities
-        self._prices_entity = PricesEntity(self._config.data[CONF_PRICES_ENTITY])
+        self._transition_listener = None
+        self._output_signature = None
+
+        # Input entities, prices are shared by all planners of the same source
+        self._prices_batch = get_prices_batch(
+            hass,
+            self._config.data[CONF_PRICES_ENTITY],
+            configured_adapter(
+                self._config.data[CONF_PRICES_ENTITY], self._config.data
+            ),
+        )
+        self._prices_entity = self._prices_batch.prices_entity
+        # Optional second series (e.g. CO2 intensity) weighted against price
+        self._co2_entity: PricesEntity | None = None
+        if self._config.data.get(CONF_CO2_ENTITY) and (
+            self._is_moving or self._is_static
+        ):
+            self._co2_entity = PricesEntity(self._config.data[CONF_CO2_ENTITY])
+        self._planning_series: PriceSeries | None = None
+        self._planning_series_key = None
         # TODO: Remove, likely not needed anymore as async_track_time_change in async_setup() will ensure update every hour
         # self._state_change_listeners.append(
         #     async_track_state_change_event(
@@ -222,9 +499,22 @@ class NordpoolPlanner:
         self._duration_number_entity = ""
         self._accept_cost_number_entity = ""
         self._accept_rate_number_entity = ""
+        self._accept_percentile_number_entity = ""
         self._search_length_number_entity = ""
         self._start_time_number_entity = ""
         self._end_time_number_entity = ""
+        self._battery_capacity_number_entity = ""
+        self._charge_power_number_entity = ""
+        self._discharge_power_number_entity = ""
+        self._efficiency_number_entity = ""
+        self._loss_coefficient_number_entity = ""
+        self._heater_power_number_entity = ""
+        self._thermal_capacity_number_entity = ""
+        self._comfort_min_number_entity = ""
+        self._comfort_max_number_entity = ""
+        self._power_number_entity = ""
+        self._co2_weight_number_entity = ""
+        self._risk_number_entity = ""
         # TODO: Make dictionary?
 
         # Output entities
@@ -232,28 +522,121 @@ class NordpoolPlanner:
 
         # Local state variables
         self._last_update = None
+        self._range_end = None
         self.low_hours = None
         self._planner_status = NordpoolPlannerStatus()
+        self._update_generation = 0
+        self._update_running = False
+        self._update_pending = False
+
+        # Latest plan traces, only formatted when read by diagnostics
+        self._traces = PlanTraces(PLAN_TRACE_SIZE)
+        self._trace: PlanTrace | None = None
+
+        # History of executed slots, recorded once set up, written in executor
+        self._history: PlanHistory | None = None
+        self._history_at: dt.datetime | None = None
+        self._history_slot: tuple[float, float, float, float] | None = None
+
+        # Moving planner forecast of unpublished prices, profile of the
+        # price history loaded in executor once a day
+        self._forecast = bool(self._config.data.get(CONF_FORECAST)) and self._is_moving
+        self._price_profile: PriceProfile | None = None
+        self._price_profile_day: dt.date | None = None
+        # Counts loaded profiles, scenarios and plans of a profile are kept
+        # until the next is loaded
+        self._price_profile_version = 0
+        self._profile_task: asyncio.Task | None = None
+        self._scenarios: PriceScenarios | None = None
+        self._scenarios_key = None
+
+        # Heavy computation in worker pool, result kept for the inputs (key)
+        self._job_task: asyncio.Task | None = None
+        self._job_key: Hashable | None = None
+        self._job_result: Any | None = None
+        self._plan_cache: PlanCache = hass.data.setdefault(
+            DATA_PLAN_CACHE, PlanCache(PLAN_CACHE_SIZE)
+        )
 
         # Output states
         self.low_cost_state = NordpoolPlannerState()
         self.high_cost_state = NordpoolPlannerState()
 
+        # Planned intervals, the version is increased when they change
+        self.plan_version = 0
+        self._timeline: list[tuple[str, dt.datetime, dt.datetime, float]] = []
+        self._plan_steps: list = []
+        self._plan_listeners: list[Callable[[], None]] = []
+        # Series, range, duration and weight the windows were searched in,
+        # ranked on request only
+        self._plan_search: tuple | None = None
+        self._ranked_search: tuple | None = None
+        self._ranked_windows: list[PriceWindow] = []
+
+        # Battery planner, optimizer is kept to replan only forward on SoC change
+        self._battery_optimizer: BatteryOptimizer | None = None
+        self.battery_plan: BatteryPlan | None = None
+
+        # Thermal planner, optimizer is kept to only re-simulate on temperature change
+        self._thermal_optimizer: ThermalOptimizer | None = None
+        self.thermal_plan: ThermalPlan | None = None
+
+        # Deadline planner, schedule is kept until prices change or deadline passes
+        self._deadline_schedule: DeadlineSchedule | None = None
+        self.deadline_plan: DeadlinePlan | None = None
+        self._group: PlannerGroup | None = None
+        if self._is_deadline and self._config.data.get(CONF_GROUP):
+            self._group = get_planner_group(hass, self._config.data[CONF_GROUP])
+
     def as_dict(self):
         """For diagnostics serialization."""
-        res = self.__dict__.copy()
-        for k, i in res.copy().items():
+        res = {
+            "_config": self._config,
+            "_prices_entity": self._prices_entity,
+            "_co2_entity": self._co2_entity,
+            "_last_update": self._last_update,
+            "low_hours": self.low_hours,
+            "_planner_status": self._planner_status,
+            "low_cost_state": self.low_cost_state,
+            "high_cost_state": self.high_cost_state,
+            "deadline_plan": self.deadline_plan,
+            "battery_plan": self.battery_plan,
+            "thermal_plan": self.thermal_plan,
+            "statistics": self.statistics,
+            "traces": self._traces,
+        }
+        for k, i in self.__dict__.items():
             if "_number_entity" in k:
                 res[k] = {"id": i, "value": self.get_number_entity_value(i)}
         return res
 
     async def async_setup(self):
         """Post initialization setup."""
-        # Ensure an update is done on every hour
-        self._hourly_update = async_track_time_change(
-            self._hass, self.scheduled_update, minute=0, second=0
+        # Scheduled updates are done for all planners of the source at once
+        self._prices_batch.add(self)
+        if self._group is not None:
+            self._group.add(self)
+        self._history = PlanHistory(
+            history_path(self._hass, self._config.entry_id), HISTORY_RETENTION_DAYS
         )
 
+        tracked = []
+        if self._is_battery:
+            tracked = [self._config.data[CONF_SOC_ENTITY]]
+        elif self._is_thermal:
+            tracked = [
+                self._config.data[CONF_INDOOR_TEMP_ENTITY],
+                self._config.data[CONF_OUTDOOR_TEMP_ENTITY],
+            ]
+        if tracked:
+            self._state_change_listeners.append(
+                async_track_state_change_event(
+                    self._hass,
+                    tracked,
+                    self._async_input_changed,
+                )
+            )
+
     @property
     def name(self) -> str:
         """Name of planner."""
@@ -269,6 +652,70 @@ class NordpoolPlanner:
         """Current price from source sensor."""
         return self._prices_entity.current_price_attr
 
+    @property
+    def prices_series(self) -> PriceSeries:
+        """Normalized prices from source sensor."""
+        return self._prices_entity.series
+
+    @property
+    def timeline(self) -> list[tuple[str, dt.datetime, dt.datetime, float]]:
+        """Planned (kind, start, end, average) intervals of plan_version, by start.
+
+        Kind is "low_cost" or "high_cost", for a battery charging and
+        discharging and for a thermal planner heating.
+        """
+        return self._timeline
+
+    @property
+    def plan_steps(self) -> list:
+        """Steps of the battery or thermal plan, empty for other planners."""
+        if self.battery_plan is not None:
+            return self.battery_plan.steps
+        if self.thermal_plan is not None:
+            return self.thermal_plan.steps
+        return []
+
+    @property
+    def statistics(self) -> dict:
+        """Statistics of the prices in the search range and of the planning."""
+        last = self._traces.latest
+        return {
+            "plan_version": self.plan_version,
+            "prices_version": self._prices_entity.version,
+            "prices": self._price_statistics.as_dict(),
+            "plan_cache": self._plan_cache.as_dict(),
+            "last_update": last.time if last else None,
+            "last_update_ms": round(last.elapsed * 1000, 3) if last else None,
+        }
+
+    def ranked_windows(self) -> list[PriceWindow]:
+        """Get all windows of the last search, lowest cost first.
+
+        Ranked from the series and range the current plan was searched in,
+        once per search, so it never replans. Empty for planners that do not
+        search windows.
+        """
+        if self._plan_search is None:
+            return []
+        if self._ranked_search is not self._plan_search:
+            series, start_time, end_time, duration, weight = self._plan_search
+            self._ranked_windows = sorted(
+                series.windows(start_time, end_time, duration),
+                key=lambda window: window.score(weight),
+            )
+            self._ranked_search = self._plan_search
+        return self._ranked_windows
+
+    def subscribe_plan(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """Call listener when the plan version changes, returns unsubscribe."""
+        self._plan_listeners.append(listener)
+
+        def _unsubscribe() -> None:
+            if listener in self._plan_listeners:
+                self._plan_listeners.remove(listener)
+
+        return _unsubscribe
+
     @property
     def planner_status(self) -> NordpoolPlannerStatus:
         """Current planner status."""
@@ -289,6 +736,21 @@ class NordpoolPlanner:
         """Get if planner is of type Static."""
         return self._config.data[CONF_TYPE] == CONF_TYPE_STATIC
 
+    @property
+    def _is_battery(self) -> bool:
+        """Get if planner is of type Battery."""
+        return self._config.data[CONF_TYPE] == CONF_TYPE_BATTERY
+
+    @property
+    def _is_deadline(self) -> bool:
+        """Get if planner is of type Deadline."""
+        return self._config.data[CONF_TYPE] == CONF_TYPE_DEADLINE
+
+    @property
+    def _is_thermal(self) -> bool:
+        """Get if planner is of type Thermal."""
+        return self._config.data[CONF_TYPE] == CONF_TYPE_THERMAL
+
     @property
     def _search_length(self) -> int:
         """Get search length parameter."""
@@ -296,6 +758,20 @@ class NordpoolPlanner:
             self._search_length_number_entity, integer=True
         )
 
+    @property
+    def _statistics_key(self) -> tuple:
+        """Get the search range of the planner, shared statistics per range."""
+        if self._is_moving:
+            return (CONF_TYPE_MOVING, self._search_length)
+        if self._is_static:
+            return (CONF_TYPE_STATIC, self._start_time, self._end_time)
+        return (self._config.data[CONF_TYPE],)
+
+    @property
+    def _price_statistics(self) -> RollingPriceStatistics:
+        """Get the statistics of the prices in the search range."""
+        return self._prices_batch.statistics(self._statistics_key)
+
     @property
     def _start_time(self) -> int:
         """Get start time parameter."""
@@ -318,10 +794,94 @@ class NordpoolPlanner:
         """Get accept rate parameter."""
         return self.get_number_entity_value(self._accept_rate_number_entity)
 
+    @property
+    def _accept_percentile(self) -> float:
+        """Get accept percentile parameter."""
+        return self.get_number_entity_value(self._accept_percentile_number_entity)
+
+    @property
+    def _co2_weight(self) -> float:
+        """Get weight of second series (e.g. CO2) against price parameter."""
+        return self.get_number_entity_value(self._co2_weight_number_entity)
+
+    @property
+    def _risk(self) -> float:
+        """Get risk aversion parameter, of forecast price scenarios."""
+        return self.get_number_entity_value(self._risk_number_entity)
+
+    @property
+    def _power(self) -> float:
+        """Get power parameter, of an appliance in a group."""
+        return self.get_number_entity_value(self._power_number_entity)
+
+    @property
+    def group_power_limit(self) -> float | None:
+        """Power limit of the group, as configured for this planner."""
+        return self._config.data.get(CONF_GROUP_POWER_LIMIT)
+
+    @property
+    def _battery_parameters(self) -> BatteryParameters | None:
+        """Get battery parameters."""
+        values = [
+            self.get_number_entity_value(self._battery_capacity_number_entity),
+            self.get_number_entity_value(self._charge_power_number_entity),
+            self.get_number_entity_value(self._discharge_power_number_entity),
+            self.get_number_entity_value(self._efficiency_number_entity),
+        ]
+        if None in values:
+            return None
+        return BatteryParameters(*values)
+
+    @property
+    def _soc(self) -> float | None:
+        """Get battery state of charge in percent."""
+        return self.get_number_entity_value(self._config.data.get(CONF_SOC_ENTITY))
+
+    @property
+    def _thermal_parameters(self) -> ThermalParameters | None:
+        """Get thermal model parameters."""
+        values = [
+            self.get_number_entity_value(self._loss_coefficient_number_entity),
+            self.get_number_entity_value(self._heater_power_number_entity),
+            self.get_number_entity_value(self._thermal_capacity_number_entity),
+            self.get_number_entity_value(self._comfort_min_number_entity),
+            self.get_number_entity_value(self._comfort_max_number_entity),
+        ]
+        if None in values:
+            return None
+        return ThermalParameters(*values)
+
+    @property
+    def _indoor_temperature(self) -> float | None:
+        """Get indoor temperature."""
+        return self.get_number_entity_value(
+            self._config.data.get(CONF_INDOOR_TEMP_ENTITY)
+        )
+
+    @property
+    def _outdoor_temperature(self) -> float | None:
+        """Get outdoor temperature."""
+        return self.get_number_entity_value(
+            self._config.data.get(CONF_OUTDOOR_TEMP_ENTITY)
+        )
+
     def cleanup(self):
         """Cleanup by removing event listeners."""
         for lister in self._state_change_listeners:
             lister()
+        self._prices_batch.remove(self)
+        if self._group is not None:
+            self._group.remove(self)
+        self._cancel_transition()
+        if self._job_task is not None:
+            self._job_task.cancel()
+            self._job_task = None
+        if self._profile_task is not None:
+            self._profile_task.cancel()
+            self._profile_task = None
+        self._plan_listeners.clear()
+        if self._history is not None and len(self._history):
+            self._hass.async_add_executor_job(self._flush_history)
 
     def get_number_entity_value(
         self, entity_id: str, integer: bool = False
@@ -360,12 +920,38 @@ class NordpoolPlanner:
             self._accept_cost_number_entity = entity_id
         elif conf_key == CONF_ACCEPT_RATE_ENTITY:
             self._accept_rate_number_entity = entity_id
+        elif conf_key == CONF_ACCEPT_PERCENTILE_ENTITY:
+            self._accept_percentile_number_entity = entity_id
         elif conf_key == CONF_SEARCH_LENGTH_ENTITY:
             self._search_length_number_entity = entity_id
         elif conf_key == CONF_START_TIME_ENTITY:
             self._start_time_number_entity = entity_id
         elif conf_key == CONF_END_TIME_ENTITY:
             self._end_time_number_entity = entity_id
+        elif conf_key == CONF_BATTERY_CAPACITY_ENTITY:
+            self._battery_capacity_number_entity = entity_id
+        elif conf_key == CONF_CHARGE_POWER_ENTITY:
+            self._charge_power_number_entity = entity_id
+        elif conf_key == CONF_DISCHARGE_POWER_ENTITY:
+            self._discharge_power_number_entity = entity_id
+        elif conf_key == CONF_EFFICIENCY_ENTITY:
+            self._efficiency_number_entity = entity_id
+        elif conf_key == CONF_LOSS_COEFFICIENT_ENTITY:
+            self._loss_coefficient_number_entity = entity_id
+        elif conf_key == CONF_HEATER_POWER_ENTITY:
+            self._heater_power_number_entity = entity_id
+        elif conf_key == CONF_THERMAL_CAPACITY_ENTITY:
+            self._thermal_capacity_number_entity = entity_id
+        elif conf_key == CONF_COMFORT_MIN_ENTITY:
+            self._comfort_min_number_entity = entity_id
+        elif conf_key == CONF_COMFORT_MAX_ENTITY:
+            self._comfort_max_number_entity = entity_id
+        elif conf_key == CONF_POWER_ENTITY:
+            self._power_number_entity = entity_id
+        elif conf_key == CONF_CO2_WEIGHT_ENTITY:
+            self._co2_weight_number_entity = entity_id
+        elif conf_key == CONF_RISK_ENTITY:
+            self._risk_number_entity = entity_id
         else:
             _LOGGER.warning(
                 'An entity "%s" was registered for callback but no match for key "%s"',
@@ -403,39 +989,246 @@ class NordpoolPlanner:
             model="Forecast",
         )
 
-    def scheduled_update(self, _):
-        """Scheduled updates callback."""
-        _LOGGER.debug("Scheduled callback")
-        self.update()
-
+    @callback
     def input_changed(self, value):
         """Input entity callback to initiate a planner update."""
         _LOGGER.debug("Sensor change event from callback: %s", value)
         self.update()
 
+    @callback
+    def set_used_hours(self, hours: float) -> None:
+        """Set used hours, from reset or restore, and replan."""
+        _LOGGER.debug("Setting used hours to %s", hours)
+        self.low_hours = hours
+        self.update()
+
     async def _async_input_changed(self, event):
         """Input entity change callback from state change event."""
         new_state = event.data.get("new_state")
         _LOGGER.debug("Sensor change event from HASS: %s", new_state)
         self.update()
 
-    def update(self):
-        """Planner update call function."""
+    def update(self, now: dt.datetime | None = None, prices_updated: bool = False):
+        """Planner update call function.
+
+        Single-flight, if an update is already in flight the request is merged
+        into one follow-up update when it is done, and the result of the
+        update in flight is discarded as superseded. When updated in batch the
+        prices are already updated and all planners get the same now.
+        """
+        self._update_generation += 1
+        if self._update_running:
+            _LOGGER.debug("Update in flight, merging request into follow-up")
+            self._update_pending = True
+            return
+        self._update_running = True
+        try:
+            self._update(now, prices_updated, self._update_generation)
+            while self._update_pending:
+                self._update_pending = False
+                self._update(None, False, self._update_generation)
+        finally:
+            self._update_running = False
+
+    def run_in_pool(
+        self, key: Hashable, func: Callable[..., Any], *args: Any
+    ) -> Any | None:
+        """Get result of pure func(*args) computed in the worker pool.
+
+        Returns None while computing, the planner is updated again when the
+        result is ready. A job for other inputs (key) still in flight is
+        superseded and cancelled, its result is never used. func also gets a
+        threading.Event as keyword cancelled, set when the job is cancelled
+        or times out, which a long func checks to stop and free its worker.
+        """
+        if key == self._job_key:
+            return self._job_result
+        if self._job_task is not None:
+            _LOGGER.debug("Cancelling superseded job")
+            self._job_task.cancel()
+        self._job_key = key
+        self._job_result = None
+        self._job_task = self._hass.async_create_background_task(
+            self._async_run_job(key, func, args), name=f"{DOMAIN} {self.name} job"
+        )
+        return None
+
+    async def _async_run_job(
+        self, key: Hashable, func: Callable[..., Any], args: tuple
+    ) -> None:
+        """Run job in worker pool with timeout and replan when done."""
+        cancelled = threading.Event()
+        started = time.perf_counter()
+        try:
+            async with asyncio.timeout(PLANNER_TIMEOUT):
+                result = await self._hass.loop.run_in_executor(
+                    get_worker_pool(self._hass),
+                    functools.partial(func, *args, cancelled=cancelled),
+                )
+        except TimeoutError:
+            _LOGGER.warning(
+                "Planning of %s timed out after %s s, keeping last plan",
+                self.name,
+                PLANNER_TIMEOUT,
+            )
+            if key == self._job_key:
+                self._job_failed("Planning timed out, using last plan")
+            return
+        except Exception as e:  # noqa: BLE001
+            _LOGGER.error("Planning of %s failed, keeping last plan: %s", self.name, e)
+            if key == self._job_key:
+                self._job_failed("Planning failed, using last plan")
+            return
+        finally:
+            # Awaiting is abandoned on timeout or cancel, stop the job too
+            cancelled.set()
+        if key != self._job_key:
+            return
+        _LOGGER.debug(
+            "Job of %s done in %.1f ms",
+            self.name,
+            (time.perf_counter() - started) * 1000,
+        )
+        self._job_task = None
+        self._job_result = result
+        self.update()
+
+    def _job_failed(self, text: str) -> None:
+        """Keep last plan and retry job on next update."""
+        self._job_task = None
+        self._job_key = None
+        self._planner_status.status = PlannerStates.Warning
+        self._planner_status.running_text = text
+        self.publish(dt_util.now())
+
+    def _superseded(self, generation: int) -> bool:
+        """Check if a newer update was requested since generation started."""
+        if generation != self._update_generation:
+            _LOGGER.debug(
+                "Discarding result of update %s superseded by %s",
+                generation,
+                self._update_generation,
+            )
+            return True
+        return False
+
+    def _update(
+        self, now: dt.datetime | None, prices_updated: bool, generation: int
+    ) -> None:
+        """Run one update and record its trace."""
+        if now is None:
+            now = dt_util.now()
+        self.record_history(now)
+        self._trace = trace = PlanTrace(now)
+        started = time.perf_counter()
+        try:
+            profiler: PlanProfiler | None = self._hass.data.get(DATA_PROFILER)
+            if profiler is not None and profiler.wants(self._config.entry_id):
+                profiler.run(self._update_plan, now, prices_updated, generation)
+                if profiler.done:
+                    async_stop_profile(self._hass)
+            else:
+                self._update_plan(now, prices_updated, generation)
+        finally:
+            trace.elapsed = time.perf_counter() - started
+            trace.prices_version = self._prices_entity.source_version
+            trace.status = self._planner_status.running_text
+            self._traces.append(trace)
+            self._trace = None
+
+    def record_history(self, now: dt.datetime) -> None:
+        """Record the price slots passed since last update to the history.
+
+        The outputs follow the last plan until the update at now, so the
+        hours on in each slot are known exactly. A slot is written when it
+        has passed, the slot in progress is kept with its price in case the
+        prices of it are gone at the next update (e.g. at midnight).
+        """
+        if self._history is None:
+            return
+        since, self._history_at = self._history_at, now
+        if since is None or now <= since:
+            return
+        series = self._prices_entity.series
+        begin, end = since.timestamp(), now.timestamp()
+
+        slots = []
+        if self._history_slot is not None:
+            slots.append(self._history_slot)
+            self._history_slot = None
+        i = max(series.index_at(begin), 0)
+        while i < len(series) and series.starts[i] < end:
+            if series.ends[i] > begin and (
+                not slots or series.starts[i] >= slots[-1][1]
+            ):
+                slots.append((series.starts[i], series.ends[i], series.values[i], 0.0))
+            i += 1
+
+        for slot_start, slot_end, price, hours in slots:
+            hours += self.low_cost_state.on_hours(
+                series.to_datetime(max(slot_start, begin)),
+                series.to_datetime(min(slot_end, end)),
+            )
+            if slot_end <= end:
+                self._history.append(slot_start, price, hours)
+            else:
+                self._history_slot = (slot_start, slot_end, price, hours)
+
+        if len(self._history):
+            self._hass.async_add_executor_job(self._flush_history, now)
+
+    def _flush_history(self, now: dt.datetime | None = None) -> None:
+        """Write history in the executor, records not written are kept."""
+        try:
+            self._history.flush(now)
+        except OSError as e:
+            _LOGGER.warning("Could not write plan history of %s: %s", self.name, e)
+
+    async def async_get_history(
+        self, start: dt.datetime, end: dt.datetime, daily: bool = True
+    ) -> list:
+        """Get cost, runtime and baseline per day of the slots in range.
+
+        If not daily the (slot start, price, hours on) of every slot instead.
+        """
+        if self._history is None:
+            return []
+        read = self._history.daily if daily else self._history.read
+        return await self._hass.async_add_executor_job(read, start, end)
+
+    def _update_plan(
+        self, now: dt.datetime, prices_updated: bool, generation: int
+    ) -> None:
+        """Run one update, results are only applied if not superseded."""
         _LOGGER.debug("Updating planner")
 
         # Update inputs
-        if not self._prices_entity.update(self._hass) and not self._prices_entity.valid:
+        if not prices_updated:
+            self._prices_entity.update(self._hass)
+        if not self._prices_entity.valid:
             self.set_unavailable()
             self._planner_status.status = PlannerStates.Error
             self._planner_status.running_text = "No valid Price data"
             return
 
+        if self._is_battery:
+            self.update_battery(now, generation)
+            return
+
+        if self._is_thermal:
+            self.update_thermal(now, generation)
+            return
+
         if not self._duration:
             _LOGGER.warning("Aborting update since no valid Duration")
             self._planner_status.status = PlannerStates.Error
             self._planner_status.running_text = "No valid Duration data"
             return
 
+        if self._is_deadline:
+            self.update_deadline(now, generation)
+            return
+
         if self._is_moving and not self._search_length:
             _LOGGER.warning("Aborting update since no valid Search length")
             self._planner_status.status = PlannerStates.Error
@@ -461,47 +1254,10 @@ class NordpoolPlanner:
         #     self._planner_status.status = PlannerStates.Warning
         #     self._planner_status.config_text = "Duration is Lager than Search-Window"
 
-        # initialize local variables
-        now = dt_util.now()
-
-        if self._is_static and self.low_hours is not None:
-            if self.low_hours >= self._duration:
-                _LOGGER.debug("No need to update, quota of hours fulfilled")
-                self.set_done_for_now()
-                self._planner_status.status = PlannerStates.Idle
-                self._planner_status.running_text = "Quota of hours fulfilled"
-                return
-            duration = dt.timedelta(hours=max(0, self._duration - self.low_hours) - 1)
-            # TODO: Need to fix this so that the duration amount of hours are found in range for static
-            # duration = dt.timedelta(hours=1)
-        else:
-            duration = dt.timedelta(hours=self._duration - 1)
-
-        # Initiate states and variables for Moving planner
         if self._is_moving:
-            start_time = now
-            end_time = now + dt.timedelta(hours=self._search_length)
-
-        # Initiate states and variables for Static planner
+            start_time, end_time = moving_range(now, self._search_length)
         elif self._is_static:
-            start_time = now.replace(
-                hour=self._start_time, minute=0, second=0, microsecond=0
-            )
-            end_time = now.replace(
-                hour=self._end_time, minute=0, second=0, microsecond=0
-            )
-            # First ensure end is after start (spans over midnight)
-            if end_time < start_time:
-                # Have not started range yet
-                if end_time < now:
-                    end_time += dt.timedelta(days=1)
-                # Started range "yesterday"
-                else:
-                    start_time -= dt.timedelta(days=1)
-            # In active range
-            if start_time < now and end_time > now:
-                # Bump up start to now so that prices in the past is not used
-                start_time = now
+            start_time, end_time = static_range(now, self._start_time, self._end_time)
 
         # Invalid planner type
         else:
@@ -510,22 +1266,188 @@ class NordpoolPlanner:
             self._planner_status.config_text = "Bad planner type"
             return
 
-        prices_groups: list[NordpoolPricesGroup] = []
-        offset = 0
-        while True:
-            start_offset = dt.timedelta(hours=offset)
-            first_time = start_time + start_offset
-            last_time = first_time + duration
-            if offset != 0 and last_time > end_time:
-                break
-            offset += 1
-            prices_group = self._prices_entity.get_prices_group(first_time, last_time)
-            if not prices_group.valid:
-                continue
-                # TODO: Should not end up here, why?
-            prices_groups.append(prices_group)
+        if self._is_static:
+            self.update_used_hours(now, end_time)
+            duration = static_duration_left(self._duration, self.low_hours)
+            if duration is None:
+                _LOGGER.debug("No need to update, quota of hours fulfilled")
+                self.set_done_for_now(now)
+                self._planner_status.status = PlannerStates.Idle
+                self._planner_status.running_text = "Quota of hours fulfilled"
+                return
+        else:
+            duration = dt.timedelta(hours=self._duration)
+
+        trace = self._trace
+        if trace is not None:
+            trace.inputs = {
+                "type": self._config.data[CONF_TYPE],
+                "start": start_time,
+                "end": end_time,
+                "duration": duration,
+                "accept_cost": self._accept_cost,
+                "accept_rate": self._accept_rate,
+                "accept_percentile": self._accept_percentile,
+                "co2_weight": self._co2_weight if self._co2_entity else None,
+                "risk": self._risk if self._forecast else None,
+            }
+
+        # Same prices and parameters always give the same choice among the
+        # windows starting at the slots of the range, for static planners the
+        # duration left after used hours is part of the key. The slots are
+        # added by the planning, only the window at the start is evaluated
+        # on a cache hit
+        series = self.get_planning_series()
+        scenarios = self.get_scenarios(now, end_time)
+        cache_key = (
+            self._prices_entity.source_version,
+            self._co2_entity.source_version if self._co2_entity else None,
+            self._co2_weight if self._co2_entity else None,
+            duration,
+            self._accept_cost,
+            self._accept_rate,
+            self._accept_percentile,
+            self._scenarios_key if scenarios else None,
+            self._risk if scenarios else None,
+        )
+        result = self.find_windows(
+            start_time, end_time, duration, series, scenarios, cache_key
+        )
+        if result is None:
+            return
+
+        if self._superseded(generation):
+            return
+        lowest_cost_window, highest_cost_window = result
+        if trace is not None:
+            trace.lowest = lowest_cost_window
+            trace.highest = highest_cost_window
+        self._plan_search = (
+            series,
+            start_time,
+            end_time,
+            duration,
+            self._co2_weight or 0.0,
+        )
+        self.set_lowest_cost_state(lowest_cost_window)
+        self.set_highest_cost_state(highest_cost_window)
+
+        self._last_update = now
+        self.publish(now)
 
-        if len(prices_groups) == 0:
+    def get_planning_series(self) -> PriceSeries:
+        """Get the price series, with the second series if configured and valid.
+
+        The second series is aligned to the price slots once per version of
+        both sources, the windows then get both averages in the same pass.
+        """
+        series = self._prices_entity.series
+        if self._co2_entity is None:
+            return series
+        self._co2_entity.update(self._hass)
+        if not self._co2_entity.valid:
+            return series
+        key = (self._prices_entity.source_version, self._co2_entity.source_version)
+        if key != self._planning_series_key:
+            self._planning_series = series.with_secondary(
+                series.aligned(self._co2_entity.series)
+            )
+            self._planning_series_key = key
+        return self._planning_series
+
+    def get_scenarios(
+        self, now: dt.datetime, end_time: dt.datetime
+    ) -> PriceScenarios | None:
+        """Get price scenarios up to end time if prices are not published yet.
+
+        Sampled once per prices version, profile and end slot. The profile of
+        the price history is loaded in the executor on the first update of a
+        day, until then (or without history) no scenarios are used.
+        """
+        if not self._forecast or self._history is None:
+            return None
+        if self._price_profile_day != now.date():
+            self._price_profile_day = now.date()
+            self._profile_task = self._hass.async_create_background_task(
+                self._async_load_profile(now), name=f"{DOMAIN} {self.name} profile"
+            )
+        series = self._prices_entity.series
+        if self._price_profile is None or not len(series):
+            return None
+        key = (
+            self._prices_entity.source_version,
+            self._price_profile_version,
+            series.slot_start(end_time),
+        )
+        if key != self._scenarios_key:
+            self._scenarios = self._price_profile.scenarios(
+                series, end_time, FORECAST_SCENARIOS, seed=int(series.ends[-1])
+            )
+            self._scenarios_key = key
+        return self._scenarios
+
+    async def _async_load_profile(self, now: dt.datetime) -> None:
+        """Load profile of the price history and replan.
+
+        If the history cannot be read the last profile is kept for the day.
+        """
+        history = self._history
+
+        def _load() -> PriceProfile:
+            records = history.read(now - dt.timedelta(weeks=PROFILE_WEEKS + 1), now)
+            return PriceProfile(
+                ((start, price) for start, price, _ in records), now.tzinfo
+            )
+
+        try:
+            profile = await self._hass.async_add_executor_job(_load)
+        except OSError as e:
+            _LOGGER.warning("Could not read price history of %s: %s", self.name, e)
+            return
+        finally:
+            self._profile_task = None
+        self._price_profile = profile
+        self._price_profile_version += 1
+        _LOGGER.debug("Loaded price profile of %s days", len(self._price_profile))
+        if len(self._price_profile):
+            self.update()
+
+    def find_windows(
+        self,
+        start_time: dt.datetime,
+        end_time: dt.datetime,
+        duration: dt.timedelta,
+        series: PriceSeries | None = None,
+        scenarios: PriceScenarios | None = None,
+        cache_key: Hashable = None,
+    ) -> tuple[PriceWindow, PriceWindow] | None:
+        """Find the lowest (or first accepted) and highest cost windows in range.
+
+        Windows are ranked by price, or by price plus weight times the second
+        series if the series has one, accept rules only look at the price.
+        With scenarios of unpublished prices a later window may be chosen.
+        With a cache key the plan cache is used, see plan_windows.
+        """
+        if series is None:
+            series = self._prices_entity.series
+        result = plan_windows(
+            series,
+            start_time,
+            end_time,
+            duration,
+            self._price_statistics,
+            self._prices_entity.version,
+            self._accept_cost,
+            self._accept_rate,
+            self._accept_percentile,
+            self._co2_weight or 0.0,
+            self._trace,
+            scenarios,
+            self._risk or 0.0,
+            self._plan_cache if cache_key is not None else None,
+            cache_key,
+        )
+        if result is None:
             _LOGGER.warning(
                 "Aborting update since no prices fetched in range %s to %s with duration %s",
                 start_time,
@@ -534,124 +1456,961 @@ class NordpoolPlanner:
             )
             self._planner_status.status = PlannerStates.Warning
             self._planner_status.running_text = "No prices in active range"
+        return result
+
+    def update_used_hours(self, now: dt.datetime, end_time: dt.datetime) -> None:
+        """Count the time low cost output was on since last update.
+
+        Resets the count when the end of the range passed since last update.
+        """
+        if self.low_hours is None:
+            self.low_hours = 0
+        if self._last_update is not None:
+            if (
+                self._range_end is not None
+                and self._last_update < self._range_end <= now
+            ):
+                _LOGGER.debug("End of range passed at %s", self._range_end)
+                self.low_hours = 0
+            else:
+                self.low_hours += self.low_cost_state.on_hours(self._last_update, now)
+        self._range_end = end_time
+        self._last_update = now
+
+    def update_deadline(self, now: dt.datetime, generation: int) -> None:
+        """Deadline planner update, place runtime before every upcoming deadline."""
+        deadline_hour = self._end_time
+        if deadline_hour is None:
+            _LOGGER.warning("Aborting update since no valid End time")
+            self._planner_status.status = PlannerStates.Error
+            self._planner_status.running_text = "No valid End-Time"
             return
 
-        _LOGGER.debug(
-            "Processing %s prices_groups found in range %s to %s",
-            len(prices_groups),
-            start_time,
-            end_time,
+        slots = self._prices_entity.get_price_slots(now)
+        if len(slots) == 0:
+            _LOGGER.warning("Aborting update since no prices after %s", now)
+            self._planner_status.status = PlannerStates.Warning
+            self._planner_status.running_text = "No prices in active range"
+            return
+
+        self.low_hours = self._deadline_used_hours(now)
+        self._last_update = now
+
+        self._deadline_schedule = self._current_deadline_schedule(
+            now, slots, deadline_hour
         )
 
-        accept_cost = self._accept_cost
-        accept_rate = self._accept_rate
-        lowest_cost_group: NordpoolPricesGroup = prices_groups[0]
-        for p in prices_groups:
-            if accept_cost and p.average < accept_cost:
-                _LOGGER.debug("Accept cost fulfilled")
-                self.set_lowest_cost_state(p)
-                break
-            if accept_rate:
-                if self._prices_entity.average_attr <= 0:
-                    if p.average <= 0:
-                        _LOGGER.debug(
-                            "Accept rate indirectly fulfilled (NP average & range average <= 0)"
-                        )
-                        self.set_lowest_cost_state(p)
-                        break
-                elif (p.average / self._prices_entity.average_attr) <= accept_rate:
-                    _LOGGER.debug("Accept rate fulfilled")
-                    self.set_lowest_cost_state(p)
-                    break
-            if p.average < lowest_cost_group.average:
-                lowest_cost_group = p
+        deadline_plan = None
+        rule = "deadline"
+        if self._group is not None:
+            deadline_plan = self._group.plan(self, now, slots)
+            rule = "group"
+        if deadline_plan is None:
+            deadline_plan = self._deadline_schedule.plan(
+                now, self._duration, self.low_hours
+            )
+            rule = "deadline"
+        if (trace := self._trace) is not None:
+            trace.inputs = {
+                "end_time": deadline_hour,
+                "duration": self._duration,
+                "low_hours": self.low_hours,
+                "power": self._power if self._group is not None else None,
+            }
+            trace.windows = len(slots)
+            trace.rule = rule
+            trace.lowest = deadline_plan.next_interval(now)
+        if self._superseded(generation):
+            return
+        self.set_deadline_plan(now, deadline_plan)
+
+    def _current_deadline_schedule(
+        self,
+        now: dt.datetime,
+        slots: list[tuple[dt.datetime, dt.datetime, float]],
+        deadline_hour: int,
+    ) -> DeadlineSchedule:
+        """Get deadline schedule, a new one if deadline, hour or prices changed."""
+        schedule = self._deadline_schedule
+        if (
+            schedule is None
+            or not schedule.valid_at(now)
+            or schedule.deadline_hour != deadline_hour
+            or schedule.version != self._prices_entity.version
+        ):
+            schedule = DeadlineSchedule(slots, deadline_hour, now)
+            schedule.version = self._prices_entity.version
+            _LOGGER.debug("New deadline schedule: %s", schedule.periods)
+        return schedule
+
+    def _deadline_used_hours(self, now: dt.datetime) -> float:
+        """Get hours output was on towards the next deadline at now.
+
+        Counts the time output was on since last update, if a deadline has
+        passed only the time after it counts towards the next deadline.
+        """
+        used = self.low_hours or 0.0
+        if self._deadline_schedule is None or self._last_update is None:
+            return used
+        counted_from = self._last_update
+        if not self._deadline_schedule.valid_at(now):
+            counted_from = max(counted_from, self._deadline_schedule.next_deadline)
+            used = 0.0
+        return used + self.low_cost_state.on_hours(counted_from, now)
+
+    def group_demands(
+        self,
+        now: dt.datetime,
+        slots: list[tuple[dt.datetime, dt.datetime, float]],
+    ) -> tuple[float, list[tuple[dt.datetime, dt.datetime, float, bool]]] | None:
+        """Get power and (start, deadline, hours, complete) needed for the group.
+
+        None if the parameters are not valid yet, the planner is then left out
+        of the joint schedule. Used hours are counted up to now, so all
+        planners of the group updating at the same time give the same demands.
+        """
+        power = self._power
+        if power is None or self._end_time is None or self._duration is None:
+            return None
+        used = self._deadline_used_hours(now)
+        schedule = self._current_deadline_schedule(now, slots, self._end_time)
+        return power, [
+            (
+                period.start,
+                period.deadline,
+                max(0.0, self._duration - used) if i == 0 else self._duration,
+                period.complete,
+            )
+            for i, period in enumerate(schedule.periods)
+        ]
+
+    def push_deadline_plan(self, now: dt.datetime, deadline_plan: DeadlinePlan) -> None:
+        """Set deadline plan pushed by the group, unless older than own plan.
+
+        A push counts as an update, so an update of the planner in flight is
+        superseded and merged into a follow-up, which gets the group plan.
+        """
+        if self._last_update is not None and now < self._last_update:
+            _LOGGER.debug("Ignoring group plan of %s, planned since", now)
+            return
+        if self._update_running:
+            self.update()
+            return
+        self._update_generation += 1
+        self.set_deadline_plan(now, deadline_plan)
+
+    def set_deadline_plan(self, now: dt.datetime, deadline_plan: DeadlinePlan) -> None:
+        """Set deadline plan and outputs from it."""
+        self.deadline_plan = deadline_plan
+        _LOGGER.debug("Deadline plan: %s", self.deadline_plan.intervals)
+
+        self._planner_status.status = PlannerStates.Ok
+        self._planner_status.running_text = "ok"
+        self._planner_status.config_text = "ok"
+        if self.deadline_plan.deadlines[0]["missing"] > 0:
+            self._planner_status.status = PlannerStates.Warning
+            self._planner_status.running_text = "Not enough time before deadline"
+        elif self.deadline_plan.deadlines[0]["needed"] == 0:
+            self._planner_status.status = PlannerStates.Idle
+            self._planner_status.running_text = "Quota of hours fulfilled"
+
+        self.set_deadline_interval_state(now)
+        self.high_cost_state.starts_at = STATE_UNAVAILABLE
+        self.high_cost_state.ends_at = STATE_UNAVAILABLE
+        self.high_cost_state.cost_at = STATE_UNAVAILABLE
+        self.high_cost_state.now_cost_rate = STATE_UNAVAILABLE
+
+        self.publish(now)
+
+    def set_deadline_interval_state(self, now: dt.datetime) -> None:
+        """Set the low cost state to the interval of deadline plan active or next."""
+        if interval := self.deadline_plan.next_interval(now):
+            start, end, average = interval
+            self.low_cost_state.starts_at = start
+            self.low_cost_state.ends_at = end
+            self.low_cost_state.cost_at = average
+            if average != 0 and self._prices_entity.current_price_attr is not None:
+                self.low_cost_state.now_cost_rate = (
+                    self._prices_entity.current_price_attr / average
+                )
+            else:
+                self.low_cost_state.now_cost_rate = STATE_UNAVAILABLE
         else:
-            self.set_lowest_cost_state(lowest_cost_group)
+            self.low_cost_state.starts_at = STATE_UNAVAILABLE
+            self.low_cost_state.ends_at = STATE_UNAVAILABLE
+            self.low_cost_state.cost_at = STATE_UNAVAILABLE
+            self.low_cost_state.now_cost_rate = STATE_UNAVAILABLE
 
-        highest_cost_group: NordpoolPricesGroup = prices_groups[0]
-        for p in prices_groups:
-            if p.average > highest_cost_group.average:
-                highest_cost_group = p
-        self.set_highest_cost_state(highest_cost_group)
+    def update_battery(self, now: dt.datetime, generation: int) -> None:
+        """Battery planner update, optimize charging over all known prices."""
+        params = self._battery_parameters
+        if params is None or not params.valid:
+            _LOGGER.warning("Aborting update since no valid Battery parameters")
+            self._planner_status.status = PlannerStates.Error
+            self._planner_status.running_text = "No valid Battery parameters"
+            return
 
-        if not self._last_update:
-            pass
-        elif self._last_update.hour != now.hour:
-            _LOGGER.debug(
-                "Swapping hour on change from %s to %s", self._last_update, now
-            )
-            if self._is_static:
-                if self.low_cost_state.on_at(now):
-                    if self.low_hours is None:
-                        self.low_hours = 1
-                    else:
-                        self.low_hours += 1
-                if end_time.hour == now.hour:
-                    self.low_hours = 0
+        soc = self._soc
+        if soc is None:
+            _LOGGER.warning("Aborting update since no valid State of charge")
+            self._planner_status.status = PlannerStates.Error
+            self._planner_status.running_text = "No valid State-of-Charge data"
+            return
+
+        slots = self._prices_entity.get_price_slots(now)
+        if len(slots) == 0:
+            _LOGGER.warning("Aborting update since no prices after %s", now)
+            self._planner_status.status = PlannerStates.Warning
+            self._planner_status.running_text = "No prices in active range"
+            return
+
+        self._planner_status.status = PlannerStates.Ok
+        self._planner_status.running_text = "ok"
+        self._planner_status.config_text = "ok"
+
+        if (trace := self._trace) is not None:
+            trace.inputs = {"parameters": params, "soc": soc}
+            trace.windows = len(slots)
+            trace.rule = "optimizer"
+            trace.cached = (
+                self._battery_optimizer is not None
+                and self._battery_optimizer.params == params
+                and self._battery_optimizer.slots == slots
+            )
+
+        # Only redo the backward pass if prices or parameters changed, it is
+        # done in the worker pool and the last plan is kept until done
+        if (
+            self._battery_optimizer is None
+            or self._battery_optimizer.params != params
+            or self._battery_optimizer.slots != slots
+        ):
+            optimizer = self.run_in_pool(
+                (params, tuple(slots)), BatteryOptimizer, params, list(slots)
+            )
+            if optimizer is None:
+                _LOGGER.debug("Optimizing battery over %s price slots", len(slots))
+                return
+            self._battery_optimizer = optimizer
+        battery_plan = self._battery_optimizer.plan(soc, now)
+        if self._superseded(generation):
+            return
+        self.battery_plan = battery_plan
+        _LOGGER.debug(
+            "Battery plan with expected profit %s: %s",
+            self.battery_plan.expected_profit,
+            self.battery_plan.steps,
+        )
+
+        self.set_plan_step_state(
+            self.low_cost_state, self.battery_plan.next_start(BatteryAction.Charge)
+        )
+        self.set_plan_step_state(
+            self.high_cost_state,
+            self.battery_plan.next_start(BatteryAction.Discharge),
+        )
         self._last_update = now
+        self.publish(now)
+
+    def update_thermal(self, now: dt.datetime, generation: int) -> None:
+        """Thermal planner update, optimize heating over all known prices."""
+        params = self._thermal_parameters
+        if params is None or not params.valid:
+            _LOGGER.warning("Aborting update since no valid Thermal parameters")
+            self._planner_status.status = PlannerStates.Error
+            self._planner_status.running_text = "No valid Thermal parameters"
+            return
+
+        indoor = self._indoor_temperature
+        outdoor = self._outdoor_temperature
+        if indoor is None or outdoor is None:
+            _LOGGER.warning("Aborting update since no valid Temperatures")
+            self._planner_status.status = PlannerStates.Error
+            self._planner_status.running_text = "No valid Temperature data"
+            return
+
+        slots = self._prices_entity.get_price_slots(now)
+        if len(slots) == 0:
+            _LOGGER.warning("Aborting update since no prices after %s", now)
+            self._planner_status.status = PlannerStates.Warning
+            self._planner_status.running_text = "No prices in active range"
+            return
+
+        self._planner_status.status = PlannerStates.Ok
+        self._planner_status.running_text = "ok"
+        self._planner_status.config_text = "ok"
+
+        # Outdoor is rounded to half degrees to not re-optimize on every small
+        # change, the optimization is done in the worker pool
+        outdoor = round(outdoor * 2) / 2
+        if (trace := self._trace) is not None:
+            trace.inputs = {
+                "parameters": params,
+                "indoor": indoor,
+                "outdoor": outdoor,
+            }
+            trace.windows = len(slots)
+            trace.rule = "optimizer"
+            trace.cached = (
+                self._thermal_optimizer is not None
+                and self._thermal_optimizer.params == params
+                and self._thermal_optimizer.outdoor == outdoor
+                and self._thermal_optimizer.slots == slots
+            )
+        if (
+            self._thermal_optimizer is None
+            or self._thermal_optimizer.params != params
+            or self._thermal_optimizer.outdoor != outdoor
+            or self._thermal_optimizer.slots != slots
+        ):
+            optimizer = self.run_in_pool(
+                (params, tuple(slots), outdoor),
+                ThermalOptimizer,
+                params,
+                list(slots),
+                outdoor,
+            )
+            if optimizer is None:
+                _LOGGER.debug("Optimizing heating over %s price slots", len(slots))
+                return
+            self._thermal_optimizer = optimizer
+        thermal_plan = self._thermal_optimizer.plan(indoor, now)
+        if self._superseded(generation):
+            return
+        self.thermal_plan = thermal_plan
+        _LOGGER.debug(
+            "Thermal plan with expected cost %s: %s",
+            self.thermal_plan.expected_cost,
+            self.thermal_plan.steps,
+        )
+
+        self.set_plan_step_state(
+            self.low_cost_state, self.thermal_plan.next_start(heat=True)
+        )
+        self.set_plan_step_state(
+            self.high_cost_state, self.thermal_plan.next_start(heat=False)
+        )
+        self._last_update = now
+        self.publish(now)
+
+    def publish(self, now: dt.datetime) -> None:
+        """Write output entities if changed and schedule the next transition."""
+        self._schedule_transition(now)
+        timeline = self._get_timeline()
+        steps = self.plan_steps
+        if timeline != self._timeline or steps != self._plan_steps:
+            self._timeline = timeline
+            self._plan_steps = steps
+            self.plan_version += 1
+            for listener in list(self._plan_listeners):
+                listener()
+        signature = self._get_output_signature(now)
+        if signature == self._output_signature:
+            _LOGGER.debug("Outputs unchanged, not writing states")
+            return
+        self._output_signature = signature
         for listener in self._output_listeners.values():
             listener.update_callback()
 
-    def set_lowest_cost_state(self, prices_group: NordpoolPricesGroup) -> None:
+    def _get_output_signature(self, now: dt.datetime) -> tuple:
+        """Get everything the output entities show at given time."""
+        return (
+            self.low_cost_state.on_at(now),
+            self.high_cost_state.on_at(now),
+            tuple(self.low_cost_state.__dict__.values()),
+            tuple(self.high_cost_state.__dict__.values()),
+            self.battery_plan.action_at(now) if self.battery_plan else None,
+            self.thermal_plan.heat_at(now) if self.thermal_plan else None,
+            id(self.battery_plan),
+            id(self.thermal_plan),
+            id(self.deadline_plan),
+            self._planner_status.status,
+            self._planner_status.running_text,
+            self._planner_status.config_text,
+            self.low_hours,
+            self.price_now,
+        )
+
+    def _get_timeline(self) -> list[tuple[str, dt.datetime, dt.datetime, float]]:
+        """Get the planned intervals of the current plan."""
+        if self.battery_plan is not None:
+            kinds = {
+                BatteryAction.Charge: "low_cost",
+                BatteryAction.Discharge: "high_cost",
+            }
+            intervals = [
+                (kinds[step.action], step.start, step.end, step.average)
+                for step in self.battery_plan.steps
+                if step.action in kinds
+            ]
+        elif self.thermal_plan is not None:
+            intervals = [
+                ("low_cost", step.start, step.end, step.average)
+                for step in self.thermal_plan.steps
+                if step.heat
+            ]
+        elif self.deadline_plan is not None:
+            intervals = [
+                ("low_cost", start, end, average)
+                for start, end, average in self.deadline_plan.intervals
+            ]
+        else:
+            intervals = [
+                (kind, state.starts_at, state.ends_at, state.cost_at)
+                for kind, state in [
+                    ("low_cost", self.low_cost_state),
+                    ("high_cost", self.high_cost_state),
+                ]
+                if isinstance(state.starts_at, dt.datetime)
+                and isinstance(state.ends_at, dt.datetime)
+            ]
+        return sorted(intervals, key=lambda interval: interval[1])
+
+    def _get_transitions(self) -> list[dt.datetime]:
+        """Get all times the outputs change state according to plan."""
+        times = []
+        for state in [self.low_cost_state, self.high_cost_state]:
+            times.extend(
+                t
+                for t in [state.starts_at, state.ends_at]
+                if isinstance(t, dt.datetime)
+            )
+        for plan in [self.battery_plan, self.thermal_plan]:
+            if plan is not None:
+                times.extend(step.start for step in plan.steps)
+        return times
+
+    def _schedule_transition(self, now: dt.datetime) -> None:
+        """Schedule a callback at the next transition after now."""
+        self._cancel_transition()
+        upcoming = [t for t in self._get_transitions() if t > now]
+        if not upcoming:
+            return
+        next_transition = min(upcoming)
+        _LOGGER.debug("Next output transition at %s", next_transition)
+        self._transition_listener = async_track_point_in_time(
+            self._hass, self._async_transition, next_transition
+        )
+
+    def _cancel_transition(self) -> None:
+        """Cancel scheduled transition callback."""
+        if self._transition_listener:
+            self._transition_listener()
+            self._transition_listener = None
+
+    @callback
+    def _async_transition(self, now: dt.datetime) -> None:
+        """Transition callback, write the outputs at the exact time of change.
+
+        The low cost state of a deadline plan moves on to the next interval
+        of the plan at the end of the current one.
+        """
+        _LOGGER.debug("Output transition at %s", now)
+        self._transition_listener = None
+        if self.deadline_plan is not None:
+            self.set_deadline_interval_state(now)
+        self.publish(now)
+
+    def set_plan_step_state(
+        self,
+        state: NordpoolPlannerState,
+        step: BatteryPlanStep | ThermalPlanStep | None,
+    ) -> None:
+        """Set the state to output variable from battery or thermal plan step."""
+        if step is None:
+            state.starts_at = STATE_UNAVAILABLE
+            state.ends_at = STATE_UNAVAILABLE
+            state.cost_at = STATE_UNAVAILABLE
+            state.now_cost_rate = STATE_UNAVAILABLE
+            return
+        state.starts_at = step.start
+        state.ends_at = step.end
+        state.cost_at = step.average
+        if step.average != 0 and self._prices_entity.current_price_attr is not None:
+            state.now_cost_rate = self._prices_entity.current_price_attr / step.average
+        else:
+            state.now_cost_rate = STATE_UNAVAILABLE
+
+    def set_lowest_cost_state(self, prices_window: PriceWindow) -> None:
         """Set the state to output variable."""
-        self.low_cost_state.starts_at = prices_group.start_time
-        self.low_cost_state.cost_at = prices_group.average
-        if prices_group.average != 0:
+        self.low_cost_state.starts_at = prices_window.start_time
+        self.low_cost_state.ends_at = prices_window.end_time
+        self.low_cost_state.cost_at = prices_window.average
+        if prices_window.average != 0:
             self.low_cost_state.now_cost_rate = (
-                self._prices_entity.current_price_attr / prices_group.average
+                self._prices_entity.current_price_attr / prices_window.average
             )
         else:
             self.low_cost_state.now_cost_rate = STATE_UNAVAILABLE
         _LOGGER.debug("Wrote lowest cost state: %s", self.low_cost_state)
 
-    def set_highest_cost_state(self, prices_group: NordpoolPricesGroup) -> None:
+    def set_highest_cost_state(self, prices_window: PriceWindow) -> None:
         """Set the state to output variable."""
-        self.high_cost_state.starts_at = prices_group.start_time
-        self.high_cost_state.cost_at = prices_group.average
-        if prices_group.average != 0:
+        self.high_cost_state.starts_at = prices_window.start_time
+        self.high_cost_state.ends_at = prices_window.end_time
+        self.high_cost_state.cost_at = prices_window.average
+        if prices_window.average != 0:
             self.high_cost_state.now_cost_rate = (
-                self._prices_entity.current_price_attr / prices_group.average
+                self._prices_entity.current_price_attr / prices_window.average
             )
         else:
             self.high_cost_state.now_cost_rate = STATE_UNAVAILABLE
         _LOGGER.debug("Wrote highest cost state: %s", self.high_cost_state)
 
-    def set_done_for_now(self) -> None:
+    def set_done_for_now(self, now: dt.datetime) -> None:
         """Set output state to off."""
-        now_hour = dt_util.now().replace(minute=0, second=0, microsecond=0)
+        now_hour = now.replace(minute=0, second=0, microsecond=0)
         start_hour = now_hour.replace(hour=self._start_time)
         if start_hour < now_hour:
             start_hour += dt.timedelta(days=1)
         self.low_cost_state.starts_at = start_hour
+        self.low_cost_state.ends_at = STATE_UNAVAILABLE
         self.low_cost_state.cost_at = STATE_UNAVAILABLE
         self.low_cost_state.now_cost_rate = STATE_UNAVAILABLE
         self.high_cost_state.starts_at = start_hour
+        self.high_cost_state.ends_at = STATE_UNAVAILABLE
         self.high_cost_state.cost_at = STATE_UNAVAILABLE
         self.high_cost_state.now_cost_rate = STATE_UNAVAILABLE
         _LOGGER.debug("Setting output states to unavailable")
-        for listener in self._output_listeners.values():
-            listener.update_callback()
+        self.publish(now)
 
     def set_unavailable(self) -> None:
         """Set output state to unavailable."""
         self.low_cost_state.starts_at = STATE_UNAVAILABLE
+        self.low_cost_state.ends_at = STATE_UNAVAILABLE
         self.low_cost_state.cost_at = STATE_UNAVAILABLE
         self.low_cost_state.now_cost_rate = STATE_UNAVAILABLE
         self.high_cost_state.starts_at = STATE_UNAVAILABLE
+        self.high_cost_state.ends_at = STATE_UNAVAILABLE
         self.high_cost_state.cost_at = STATE_UNAVAILABLE
         self.high_cost_state.now_cost_rate = STATE_UNAVAILABLE
         _LOGGER.debug("Setting output states to unavailable")
-        for listener in self._output_listeners.values():
-            listener.update_callback()
+        self.publish(dt_util.now())
+
+
+def get_tick_dispatcher(hass: HomeAssistant) -> TickDispatcher:
+    """Get the tick dispatcher of the domain, created if new."""
+    if DATA_TICK_DISPATCHER not in hass.data:
+        hass.data[DATA_TICK_DISPATCHER] = TickDispatcher(hass)
+    return hass.data[DATA_TICK_DISPATCHER]
+
+
+class TickDispatcher:
+    """One time listener for all planners, replanning on price slot boundaries.
+
+    Batches are updated in order of price source with the same now, on every
+    quarter hour or only on full hours depending on the slot length of their
+    prices.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize dispatcher."""
+        self._hass = hass
+        self._batches: dict[tuple[str, str], PricesBatch] = {}
+        self._time_listener = None
+        self.ticks = 0
+        self.latencies: deque[float] = deque(maxlen=96)
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "batches": sorted(unique_id for unique_id, _ in self._batches),
+            "ticks": self.ticks,
+            "last_latency": self.latencies[-1] if self.latencies else None,
+            "max_latency": max(self.latencies) if self.latencies else None,
+            "mean_latency": (
+                sum(self.latencies) / len(self.latencies) if self.latencies else None
+            ),
+        }
+
+    def add(self, batch: PricesBatch) -> None:
+        """Add batch to be updated on ticks."""
+        self._batches[batch.key] = batch
+        if self._time_listener is None:
+            self._time_listener = async_track_time_change(
+                self._hass, self._async_tick, minute="/15", second=0
+            )
+
+    def remove(self, batch: PricesBatch) -> None:
+        """Remove batch, the time listener is removed with the last batch."""
+        if self._batches.get(batch.key) is batch:
+            self._batches.pop(batch.key)
+        if not self._batches and self._time_listener:
+            self._time_listener()
+            self._time_listener = None
+
+    @callback
+    def _async_tick(self, _) -> None:
+        """Scheduled updates callback."""
+        self.tick(dt_util.now())
+
+    def tick(self, now: dt.datetime) -> None:
+        """Update all batches due at now."""
+        started = time.perf_counter()
+        updated = 0
+        for key in sorted(self._batches):
+            batch = self._batches[key]
+            if now.minute % batch.tick_minutes == 0:
+                batch.update(now)
+                updated += len(batch.planners)
+        self.ticks += 1
+        self.latencies.append(time.perf_counter() - started)
+        _LOGGER.debug(
+            "Tick at %s updated %s planners in %.1f ms",
+            now,
+            updated,
+            self.latencies[-1] * 1000,
+        )
+
+
+def get_prices_batch(
+    hass: HomeAssistant, unique_id: str, adapter: PriceSourceAdapter | None = None
+) -> PricesBatch:
+    """Get the batch of planners for a price source, created if new.
+
+    Planners of the same source share a batch if they declare the same
+    adapter (or none), a source read with different adapters gets one batch
+    per adapter.
+    """
+    batches: dict[tuple[str, str], PricesBatch] = hass.data.setdefault(
+        DATA_PRICES_BATCHES, {}
+    )
+    key = (unique_id, adapter_key(adapter))
+    if key not in batches:
+        batches[key] = PricesBatch(hass, unique_id, adapter)
+    return batches[key]
+
+
+def adapter_key(adapter: PriceSourceAdapter | None) -> str:
+    """Identify the configuration of a declared adapter, empty if detected."""
+    if adapter is None:
+        return ""
+    return repr(sorted(adapter.as_dict().items()))
+
+
+class PricesBatch:
+    """All planners sharing one price source, updated together.
+
+    The source is read and the price series with its prefix sums is built
+    once per update, then every planner is replanned from it with the same
+    time in one loop. Planners with identical settings are answered from the
+    plan cache, so the work grows with the number of distinct plans rather
+    than the number of planners. The rolling price statistics are kept per
+    search range, planners with the same range share them.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        unique_id: str,
+        adapter: PriceSourceAdapter | None = None,
+    ) -> None:
+        """Initialize batch."""
+        self._hass = hass
+        self.prices_entity = PricesEntity(unique_id, adapter)
+        self._planners: list[NordpoolPlanner] = []
+        self._statistics: dict[tuple, RollingPriceStatistics] = {}
+        # Sources read in the background replan when read
+        self._refreshed_listener = async_dispatcher_connect(
+            hass,
+            SIGNAL_SOURCE_REFRESHED.format(unique_id),
+            self._async_source_refreshed,
+        )
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "prices_entity": self.prices_entity.unique_id,
+            "planners": [p.name for p in self._planners],
+            "tick_minutes": self.tick_minutes,
+            "statistics": len(self._statistics),
+        }
+
+    @property
+    def unique_id(self) -> str:
+        """Entity id of price source."""
+        return self.prices_entity.unique_id
+
+    @property
+    def key(self) -> tuple[str, str]:
+        """Entity id of price source and configuration of its adapter."""
+        return self.prices_entity.key
+
+    @property
+    def tick_minutes(self) -> int:
+        """Minutes between scheduled updates, the slot length of the prices.
+
+        Quarter-hourly until prices are known, hourly prices only need an
+        update every hour as transitions within the hour are scheduled.
+        """
+        series = self.prices_entity.series if self.prices_entity.valid else None
+        if series is not None and series.resolution >= 3600:
+            return 60
+        return 15
+
+    @property
+    def planners(self) -> list[NordpoolPlanner]:
+        """Planners in batch."""
+        return self._planners
+
+    def statistics(self, key: tuple) -> RollingPriceStatistics:
+        """Get the price statistics of a search range, created if new."""
+        if key not in self._statistics:
+            self._statistics[key] = RollingPriceStatistics()
+        return self._statistics[key]
+
+    def add(self, planner: NordpoolPlanner) -> None:
+        """Add planner to batch."""
+        if planner in self._planners:
+            return
+        self._planners.append(planner)
+        get_tick_dispatcher(self._hass).add(self)
+
+    def remove(self, planner: NordpoolPlanner) -> None:
+        """Remove planner from batch, the batch is dropped when empty."""
+        if planner in self._planners:
+            self._planners.remove(planner)
+        if self._planners:
+            keys = {p._statistics_key for p in self._planners}
+            for key in set(self._statistics) - keys:
+                self._statistics.pop(key)
+            return
+        get_tick_dispatcher(self._hass).remove(self)
+        self._refreshed_listener()
+        batches = self._hass.data.get(DATA_PRICES_BATCHES, {})
+        if batches.get(self.key) is self:
+            batches.pop(self.key)
+
+    @callback
+    def _async_source_refreshed(self) -> None:
+        """Source read in the background callback."""
+        self.update()
+
+    def update(self, now: dt.datetime | None = None) -> None:
+        """Update prices once and replan all planners in batch."""
+        if now is None:
+            now = dt_util.now()
+        self.prices_entity.update(self._hass)
+        _LOGGER.debug(
+            "Updating %s planners of %s",
+            len(self._planners),
+            self.prices_entity.unique_id,
+        )
+        for planner in self._planners:
+            planner.update(now, prices_updated=True)
+
+
+def get_planner_group(hass: HomeAssistant, name: str) -> PlannerGroup:
+    """Get the group of planners with name, created if new."""
+    groups: dict[str, PlannerGroup] = hass.data.setdefault(DATA_PLANNER_GROUPS, {})
+    if name not in groups:
+        groups[name] = PlannerGroup(hass, name)
+    return groups[name]
+
+
+class PlannerGroup:
+    """Deadline planners sharing a power limit, e.g. of the main fuse.
+
+    The runtime of all planners in the group is placed jointly so the sum of
+    their power never exceeds the limit in any price slot. Whichever planner
+    updates solves for all of them, and the plans that changed are pushed to
+    the outputs of the others. The schedule is kept for its inputs, so the
+    other planners updating in the same price slot with the same demands
+    reuse it.
+    """
+
+    def __init__(self, hass: HomeAssistant, name: str) -> None:
+        """Initialize group."""
+        self._hass = hass
+        self.name = name
+        self._planners: list[NordpoolPlanner] = []
+        self._key: Hashable | None = None
+        self._plans: dict[NordpoolPlanner, DeadlinePlan] = {}
+        self.schedule: GroupSchedule | None = None
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "name": self.name,
+            "planners": [p.name for p in self._planners],
+            "power_limit": self.power_limit,
+            "schedule": self.schedule,
+        }
+
+    @property
+    def planners(self) -> list[NordpoolPlanner]:
+        """Planners in group."""
+        return self._planners
+
+    @property
+    def power_limit(self) -> float | None:
+        """Power limit in kW, the lowest configured by the planners."""
+        return min(
+            (
+                p.group_power_limit
+                for p in self._planners
+                if p.group_power_limit is not None
+            ),
+            default=None,
+        )
+
+    def add(self, planner: NordpoolPlanner) -> None:
+        """Add planner to group."""
+        if planner not in self._planners:
+            self._planners.append(planner)
+            self._key = None
+
+    def remove(self, planner: NordpoolPlanner) -> None:
+        """Remove planner from group, the group is dropped when empty."""
+        if planner in self._planners:
+            self._planners.remove(planner)
+            self._plans.pop(planner, None)
+            self._key = None
+        if self._planners:
+            return
+        groups = self._hass.data.get(DATA_PLANNER_GROUPS, {})
+        if groups.get(self.name) is self:
+            groups.pop(self.name)
+
+    def plan(
+        self,
+        planner: NordpoolPlanner,
+        now: dt.datetime,
+        slots: list[tuple[dt.datetime, dt.datetime, float]],
+    ) -> DeadlinePlan | None:
+        """Plan all planners of the group jointly and get the plan of planner.
+
+        Returns None if the planner cannot be part of the joint schedule, e.g.
+        its power is not known yet.
+        """
+        # Demands are placed in slots, which start at the start of the current
+        # slot and not at now, so the planners updating within a slot share
+        # one solve while nothing changed
+        start_stamps = [start.timestamp() for start, _, _ in slots]
+        end_stamps = [end.timestamp() for _, end, _ in slots]
+        members: list[NordpoolPlanner] = []
+        demands: list[GroupDemand] = []
+        owners = []
+        for member in self._planners:
+            if member.price_sensor_id != planner.price_sensor_id:
+                _LOGGER.debug(
+                    'Planner "%s" in group "%s" has another price source, left out',
+                    member.name,
+                    self.name,
+                )
+                continue
+            if (member_demands := member.group_demands(now, slots)) is None:
+                continue
+            members.append(member)
+            power, periods = member_demands
+            for start, deadline, needed, complete in periods:
+                demands.append(
+                    GroupDemand(
+                        power,
+                        needed,
+                        bisect.bisect_right(end_stamps, start.timestamp()),
+                        bisect.bisect_left(start_stamps, deadline.timestamp()),
+                    )
+                )
+                owners.append((member, deadline, needed, complete))
+        limit = self.power_limit
+        key = (
+            limit,
+            tuple((start, end, price) for start, end, price in slots),
+            tuple(id(member) for member in members),
+            tuple(
+                (id(member), deadline, complete, d.power, d.hours, d.first, d.last)
+                for (member, deadline, _, complete), d in zip(owners, demands)
+            ),
+        )
+        if key != self._key:
+            self._solve(planner, now, slots, limit, members, demands, owners)
+            self._key = key
+        return self._plans.get(planner)
+
+    def _solve(
+        self,
+        planner: NordpoolPlanner,
+        now: dt.datetime,
+        slots: list[tuple[dt.datetime, dt.datetime, float]],
+        limit: float | None,
+        members: list[NordpoolPlanner],
+        demands: list[GroupDemand],
+        owners: list,
+    ) -> None:
+        """Solve the joint schedule and push changed plans to the other planners."""
+        starts = [max(start, now) for start, _, _ in slots]
+        hours = [
+            (end - start).total_seconds() / 3600
+            for start, (_, end, _) in zip(starts, slots)
+        ]
+        prices = [price for _, _, price in slots]
+
+        started = time.perf_counter()
+        self.schedule = schedule_group(
+            prices, hours, limit if limit is not None else float("inf"), demands
+        )
+        _LOGGER.debug(
+            'Solved group "%s" with %s demands in %.1f ms, cost %s',
+            self.name,
+            len(demands),
+            (time.perf_counter() - started) * 1000,
+            self.schedule.cost,
+        )
+        if any(missing > 0 for missing in self.schedule.missing):
+            _LOGGER.warning(
+                'Group "%s" cannot place all runtime before the deadlines',
+                self.name,
+            )
+
+        intervals: dict[NordpoolPlanner, list] = {m: [] for m in members}
+        deadlines: dict[NordpoolPlanner, list] = {m: [] for m in members}
+        for k, (member, deadline, needed, complete) in enumerate(owners):
+            for s, h in self.schedule.slots(k):
+                intervals[member].append(
+                    (starts[s], starts[s] + dt.timedelta(hours=h), prices[s])
+                )
+            deadlines[member].append(
+                {
+                    "deadline": deadline,
+                    "needed": needed,
+                    "missing": self.schedule.missing[k],
+                    "complete": complete,
+                }
+            )
+
+        plans = {
+            member: DeadlinePlan(sorted(intervals[member]), deadlines[member])
+            for member in members
+        }
+        previous = self._plans
+        self._plans = plans
+        for member, plan in plans.items():
+            if member is planner:
+                continue
+            old = previous.get(member)
+            if (
+                old is None
+                or old.intervals != plan.intervals
+                or old.deadlines != plan.deadlines
+            ):
+                member.push_deadline_plan(now, plan)
 
 
 class PricesEntity:
     """Representation for Nordpool state."""
 
-    def __init__(self, unique_id: str) -> None:
-        """Initialize state tracker."""
+    def __init__(
+        self, unique_id: str, adapter: PriceSourceAdapter | None = None
+    ) -> None:
+        """Initialize state tracker, the format is detected if no adapter given."""
         self._unique_id = unique_id
         self._np = None
+        self._adapter: PriceSourceAdapter | None = adapter
+        self._adapter_key = adapter_key(adapter)
+        self.version = 0
+        self._series: PriceSeries | None = None
+        self._series_version = None
 
     def as_dict(self):
         """For diagnostics serialization."""
@@ -663,74 +2422,46 @@ class PricesEntity:
         return self._unique_id
 
     @property
-    def valid(self) -> bool:
-        """Get if data is valid."""
-        # TODO: Add more checks, make function of those in update()
-        return self._np is not None
+    def key(self) -> tuple[str, str]:
+        """Identify the source and the configuration of its declared adapter."""
+        return self._unique_id, self._adapter_key
 
     @property
-    def _all_prices(self):
-        if np_prices := self._np.attributes.get("raw_today"):
-            # For Nordpool format
-            if self._np.attributes["tomorrow_valid"]:
-                np_prices += self._np.attributes["raw_tomorrow"]
-            return np_prices
-        elif e_prices := self._np.attributes.get("prices"):  # noqa: RET505
-            # For ENTSO-e format
-            e_prices = [
-                {"start": dt_util.parse_datetime(ep["time"]), "value": ep["price"]}
-                for ep in e_prices
-            ]
-            return e_prices  # noqa: RET504
-        return []
+    def source_version(self) -> tuple:
+        """Identify the prices across planners sharing the same source."""
+        return (
+            self._unique_id,
+            self._adapter_key,
+            self._np.last_updated if self._np is not None else None,
+        )
 
     @property
-    def average_attr(self):
-        """Get the average price attribute."""
-        if self._np is not None:
-            if "average_electricity_price" in self._np.entity_id:
-                # For ENTSO-e average
-                try:
-                    return float(self._np.state)
-                except ValueError:
-                    _LOGGER.warning(
-                        'Could not convert "%s" to float for average sensor "%s"',
-                        self._np.state,
-                        self._np.entity_id,
-                    )
-            else:
-                # For Nordpool format
-                return self._np.attributes["average"]
-        return None
+    def valid(self) -> bool:
+        """Get if data is valid."""
+        # TODO: Add more checks, make function of those in update()
+        return self._np is not None
 
     @property
     def current_price_attr(self):
         """Get the current price attribute."""
         if self._np is not None:
-            if current := self._np.attributes.get("current_price"):
-                # For Nordpool format
+            if (current := self._adapter.current_price(self._np)) is not None:
                 return current
-            else:  # noqa: RET505
-                # For general, find in list
-                now = dt_util.now()
-                for price in self._all_prices:
-                    if (
-                        price["start"] < now
-                        and price["start"] + dt.timedelta(hours=1) > now
-                    ):
-                        return price["value"]
+            return self.series.value_at(dt_util.now())
         return None
 
     def update(self, hass: HomeAssistant) -> bool:
         """Update price in storage."""
-        if self._unique_id == NAME_FILE_READER:
-            np = get_np_from_file(PATH_FILE_READER)
-        else:
-            np = hass.states.get(self._unique_id)
+        if self._adapter is None:
+            # Format is detected once from the first state of the source
+            self._adapter = detect_adapter(
+                self._unique_id, hass.states.get(self._unique_id)
+            )
+        np = self._adapter.get_state(hass) if self._adapter is not None else None
 
         if np is None:
             _LOGGER.warning("Got empty data from Nordpool entity %s ", self._unique_id)
-        elif "today" not in np.attributes and "prices_today" not in np.attributes:
+        elif not self._adapter.has_prices(np):
             _LOGGER.warning(
                 "No values for today in Nordpool entity %s ", self._unique_id
             )
@@ -738,76 +2469,29 @@ class PricesEntity:
             _LOGGER.debug(
                 "Nordpool sensor %s was updated successfully", self._unique_id
             )
-            if self._np is None:
-                pass
+            if self._np is None or np.last_updated != self._np.last_updated:
+                self.version += 1
             self._np = np
 
         if self._np is None:
             return False
         return True
 
-    def get_prices_group(
-        self, start: dt.datetime, end: dt.datetime
-    ) -> NordpoolPricesGroup:
-        """Get a range of prices from NP given the start and end datetimes.
-
-        Ex. If start is 7:05 and end 10:05, a list of 4 prices will be returned,
-        7, 8, 9 & 10.
-        """
-        started = False
-        selected = []
-        for p in self._all_prices:
-            if p["start"] > start - dt.timedelta(hours=1):
-                started = True
-            if p["start"] > end:
-                break
-            if started:
-                selected.append(p)
-        return NordpoolPricesGroup(selected)
-
-
-class NordpoolPricesGroup:
-    """A slice if Nordpool prices with helper functions."""
-
-    def __init__(self, prices) -> None:
-        """Initialize price group."""
-        self._prices = prices
-
-    def __str__(self) -> str:
-        """Get string representation of class."""
-        return f"start_time={self.start_time.strftime("%Y-%m-%d %H:%M")} average={self.average} len(_prices)={len(self._prices)}"
-
-    def __repr__(self) -> str:
-        """Get string representation for debugging."""
-        return type(self).__name__ + f" ({self.__str__()})"
+    def get_price_slots(
+        self, after: dt.datetime
+    ) -> list[tuple[dt.datetime, dt.datetime, float]]:
+        """Get (start, end, price) slots that has not ended at given time."""
+        return self.series.slots(after)
 
     @property
-    def valid(self) -> bool:
-        """Is the price group valid."""
-        if len(self._prices) == 0:
-            # _LOGGER.debug("None-valid price range group, len=%s", len(self._prices))
-            return False
-        return True
-
-    @property
-    def average(self) -> float:
-        """The average price of the price group."""
-        # if not self.valid:
-        #     _LOGGER.warning(
-        #         "Average set to 1 for invalid price group, should not happen"
-        #     )
-        #     return 1
-        return sum([p["value"] for p in self._prices]) / len(self._prices)
-
-    @property
-    def start_time(self) -> dt.datetime:
-        """The start time of first price in group."""
-        # if not self.valid:
-        #     _LOGGER.warning(
-        #         "Start time set to None for invalid price group, should not happen"
-        #     )
-        #     return None
-        return self._prices[0]["start"]
+    def series(self) -> PriceSeries:
+        """Get the normalized price series, rebuilt when source is updated."""
+        if self._series is None or self._series_version != self.version:
+            self._series = (
+                self._adapter.series(self._np) if self._np else PriceSeries([])
+            )
+            self._series_version = self.version
+        return self._series
 
 
 class NordpoolPlannerState:
@@ -816,6 +2500,7 @@ class NordpoolPlannerState:
     def __init__(self) -> None:
         """Initiate states."""
         self.starts_at = STATE_UNKNOWN
+        self.ends_at = STATE_UNKNOWN
         self.cost_at = STATE_UNKNOWN
         self.now_cost_rate = STATE_UNKNOWN
 
@@ -828,14 +2513,31 @@ class NordpoolPlannerState:
         return self.__dict__
 
     def on_at(self, time: dt.datetime) -> bool:
-        """Get boolean state if start is before given timestamp."""
+        """Get boolean state if given timestamp is between start and end."""
         if self.starts_at not in [
             STATE_UNKNOWN,
             STATE_UNAVAILABLE,
         ]:
-            return self.starts_at < time
+            if self.ends_at not in [STATE_UNKNOWN, STATE_UNAVAILABLE]:
+                return self.starts_at <= time < self.ends_at
+            return self.starts_at <= time
         return False
 
+    def on_hours(self, start: dt.datetime, end: dt.datetime) -> float:
+        """Get hours the state was on between start and end."""
+        if self.starts_at in [
+            STATE_UNKNOWN,
+            STATE_UNAVAILABLE,
+        ]:
+            return 0.0
+        on_from = max(start, self.starts_at)
+        on_to = end
+        if self.ends_at not in [STATE_UNKNOWN, STATE_UNAVAILABLE]:
+            on_to = min(end, self.ends_at)
+        if on_from >= on_to:
+            return 0.0
+        return (on_to - on_from).total_seconds() / 3600
+
 
 class NordpoolPlannerStatus:
     """Status for the overall planner."""
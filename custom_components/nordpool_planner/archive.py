@@ -0,0 +1,201 @@
+"""Local archive of prices in fixed size binary records, memory-mapped.
+
+Each record is the start of a price slot (int64 epoch seconds) and its price
+(float64), little endian and sorted by start, so a file is used without
+parsing: a range is found by binary search directly in the mapped file and
+sliced without copying. An archive is a single file, or a directory with
+one shard per year (e.g. 2024.bin), optionally in a subdirectory per area.
+
+Example, import the prices of diagnostics files to the archive of area SE3:
+
+    python -m custom_components.nordpool_planner.archive \\
+        config/nordpool_planner_archive --area SE3 diagnostics/*.json
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections.abc import Iterable
+import datetime as dt
+import json
+import mmap
+import os
+import pathlib
+import struct
+import sys
+
+from .planning import normalize_prices
+
+# Slot start, price
+RECORD = struct.Struct("<qd")
+
+
+class _Shard:
+    """One archive file, mapped to memory on first use."""
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+        self._view: memoryview | None = None
+
+    @property
+    def view(self) -> memoryview:
+        """All complete records of the file."""
+        if self._view is None:
+            with open(self.path, "rb") as file:
+                size = os.fstat(file.fileno()).st_size
+                size -= size % RECORD.size
+                if size == 0:
+                    self._view = memoryview(b"")
+                else:
+                    # The mapping stays valid after the file is closed
+                    data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._view = memoryview(data)[:size]
+        return self._view
+
+    def __len__(self) -> int:
+        return len(self.view) // RECORD.size
+
+    def start(self, i: int) -> int:
+        """Start of record i."""
+        return RECORD.unpack_from(self.view, i * RECORD.size)[0]
+
+    def bisect(self, timestamp: float) -> int:
+        """Index of first record starting at or after timestamp."""
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.start(mid) < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def slice(self, start: float, end: float) -> memoryview:
+        """Records starting in range, without copying."""
+        return self.view[
+            self.bisect(start) * RECORD.size : self.bisect(end) * RECORD.size
+        ]
+
+
+class PriceArchive:
+    """Prices of an archive file or directory of shards."""
+
+    def __init__(self, path: str | os.PathLike, area: str | None = None) -> None:
+        """Initialize archive at path, in subdirectory area if given."""
+        root = pathlib.Path(path)
+        if area:
+            root /= area
+        self.path = root
+        if root.is_dir():
+            self._shards = [_Shard(p) for p in sorted(root.glob("*.bin"))]
+        elif root.is_file():
+            self._shards = [_Shard(root)]
+        else:
+            self._shards = []
+
+    def __len__(self) -> int:
+        """Number of records in archive."""
+        return sum(len(shard) for shard in self._shards)
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "path": str(self.path),
+            "shards": [shard.path.name for shard in self._shards],
+        }
+
+    def records(self, start: dt.datetime, end: dt.datetime) -> Iterable[memoryview]:
+        """Get the packed records of slots starting in range, per shard."""
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        for shard in self._shards:
+            if len(shard) and (
+                shard.start(0) < end_ts and shard.start(len(shard) - 1) >= start_ts
+            ):
+                yield shard.slice(start_ts, end_ts)
+
+    def prices(
+        self, start: dt.datetime, end: dt.datetime, tzinfo: dt.tzinfo | None = None
+    ) -> list[dict]:
+        """Get list of dicts with "start" and "value" of slots starting in range."""
+        return [
+            {
+                "start": dt.datetime.fromtimestamp(epoch, tzinfo or start.tzinfo),
+                "value": value,
+            }
+            for records in self.records(start, end)
+            for epoch, value in RECORD.iter_unpack(records)
+        ]
+
+
+def write_archive(
+    path: str | os.PathLike, prices: Iterable[dict], area: str | None = None
+) -> int:
+    """Merge prices into the archive at path, one shard per (UTC) year.
+
+    Prices are dicts with "start" and "value", a price of a slot already in
+    the archive replaces it. Shards are replaced atomically. Returns the
+    number of records of the shards written.
+    """
+    root = pathlib.Path(path)
+    if area:
+        root /= area
+    years: dict[int, dict[int, float]] = {}
+    for price in prices:
+        if price.get("value") is None:
+            continue
+        start = int(price["start"].timestamp())
+        year = dt.datetime.fromtimestamp(start, dt.UTC).year
+        years.setdefault(year, {})[start] = float(price["value"])
+
+    root.mkdir(parents=True, exist_ok=True)
+    written = 0
+    for year, new in years.items():
+        shard = root / f"{year}.bin"
+        records: dict[int, float] = {}
+        if shard.is_file():
+            data = shard.read_bytes()
+            records.update(
+                RECORD.iter_unpack(data[: len(data) - len(data) % RECORD.size])
+            )
+        records.update(new)
+        tmp = shard.with_suffix(".tmp")
+        tmp.write_bytes(
+            b"".join(RECORD.pack(start, records[start]) for start in sorted(records))
+        )
+        os.replace(tmp, shard)
+        written += len(records)
+    return written
+
+
+def import_diagnostics(
+    path: str | os.PathLike, files: Iterable[str], area: str | None = None
+) -> int:
+    """Import the prices of diagnostics (or other price) JSON files."""
+    prices = []
+    for file in files:
+        data = json.loads(pathlib.Path(file).read_text(encoding="utf-8"))
+        prices.extend(normalize_prices(data))
+    return write_archive(path, prices, area)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run importer command line, returns exit code."""
+    parser = argparse.ArgumentParser(
+        description="Import prices of planner diagnostics or price JSON files "
+        "to a price archive."
+    )
+    parser.add_argument("archive", help="archive directory")
+    parser.add_argument("files", nargs="+", help="JSON files to import")
+    parser.add_argument("--area", help="subdirectory of the area, e.g. SE3")
+    options = parser.parse_args(argv)
+    try:
+        records = import_diagnostics(options.archive, options.files, options.area)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        sys.stderr.write(f"Import failed: {e}\n")
+        return 1
+    sys.stdout.write(f"{records} records in archive\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+"""Battery arbitrage optimization for the battery planner type."""
+
+from __future__ import annotations
+
+from concurrent.futures import CancelledError
+import datetime as dt
+from enum import Enum
+import math
+import threading
+
+
+class BatteryAction(Enum):
+    """Actions the battery can take in one price slot."""
+
+    Charge = "charge"
+    Idle = "idle"
+    Discharge = "discharge"
+
+
+_ACTIONS = [BatteryAction.Idle, BatteryAction.Charge, BatteryAction.Discharge]
+
+# Upper bound of the state-of-charge grid sized from the slots
+MAX_LEVELS = 1000
+
+# Tolerance in grid steps, for step energies that are a multiple of the grid
+_STEP_TOLERANCE = 1e-9
+
+
+class BatteryParameters:
+    """Physical limits of the battery."""
+
+    def __init__(
+        self,
+        capacity: float,
+        charge_power: float,
+        discharge_power: float,
+        efficiency: float,
+        levels: int = 100,
+    ) -> None:
+        """Initialize parameters.
+
+        Capacity is in kWh, powers in kW and efficiency is the round-trip
+        efficiency as a ratio. The state of charge is discretized to at least
+        `levels` equally sized steps, more if the battery could not move one
+        step in the shortest slot.
+        """
+        self.capacity = capacity
+        self.charge_power = charge_power
+        self.discharge_power = discharge_power
+        self.efficiency = efficiency
+        self.levels = levels
+
+    def __eq__(self, other: object) -> bool:
+        """Compare parameters."""
+        if not isinstance(other, BatteryParameters):
+            return NotImplemented
+        return self.key == other.key
+
+    def __hash__(self) -> int:
+        """Hash of parameters."""
+        return hash(self.key)
+
+    @property
+    def key(self) -> tuple:
+        """Tuple identifying the parameters."""
+        return (
+            self.capacity,
+            self.charge_power,
+            self.discharge_power,
+            self.efficiency,
+            self.levels,
+        )
+
+    @property
+    def valid(self) -> bool:
+        """Are the parameters usable for planning."""
+        return (
+            self.capacity > 0
+            and self.charge_power > 0
+            and self.discharge_power > 0
+            and 0 < self.efficiency <= 1
+            and self.levels > 0
+        )
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return self.__dict__
+
+
+class BatteryPlanStep:
+    """One interval of constant action in the battery plan."""
+
+    def __init__(
+        self,
+        start: dt.datetime,
+        end: dt.datetime,
+        action: BatteryAction,
+        soc_start: float,
+        soc_end: float,
+        price: float,
+    ) -> None:
+        """Initialize step."""
+        self.start = start
+        self.end = end
+        self.action = action
+        self.soc_start = soc_start
+        self.soc_end = soc_end
+        self._price_sum = price
+        self._slot_count = 1
+
+    @property
+    def average(self) -> float:
+        """The average price of slots in step."""
+        return self._price_sum / self._slot_count
+
+    def extend(self, end: dt.datetime, soc_end: float, price: float) -> None:
+        """Extend step with a following slot of same action."""
+        self.end = end
+        self.soc_end = soc_end
+        self._price_sum += price
+        self._slot_count += 1
+
+    def __repr__(self) -> str:
+        """Get string representation for debugging."""
+        return (
+            type(self).__name__
+            + f" (start={self.start} end={self.end} action={self.action.value}"
+            + f" soc={self.soc_start:.0f}-{self.soc_end:.0f})"
+        )
+
+    def as_dict(self):
+        """For diagnostics and state attribute serialization."""
+        return {
+            "start": self.start,
+            "end": self.end,
+            "action": self.action.value,
+            "soc_start": round(self.soc_start, 1),
+            "soc_end": round(self.soc_end, 1),
+            "average": self.average,
+        }
+
+
+class BatteryPlan:
+    """Result of a forward pass through the optimized policy."""
+
+    def __init__(self, steps: list[BatteryPlanStep], expected_profit: float) -> None:
+        """Initialize plan."""
+        self.steps = steps
+        self.expected_profit = expected_profit
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "steps": [s.as_dict() for s in self.steps],
+            "expected_profit": self.expected_profit,
+        }
+
+    def action_at(self, time: dt.datetime) -> BatteryAction | None:
+        """Get the planned action at given timestamp."""
+        for step in self.steps:
+            if step.start <= time < step.end:
+                return step.action
+        return None
+
+    def steps_at(
+        self, time: dt.datetime
+    ) -> tuple[BatteryPlanStep | None, BatteryPlanStep | None]:
+        """Get the step at given timestamp and the step after it."""
+        for i, step in enumerate(self.steps):
+            if time < step.end:
+                following = self.steps[i + 1] if i + 1 < len(self.steps) else None
+                if step.start <= time:
+                    return step, following
+                return None, step
+        return None, None
+
+    def next_start(self, action: BatteryAction) -> BatteryPlanStep | None:
+        """Get the first step with given action."""
+        for step in self.steps:
+            if step.action == action:
+                return step
+        return None
+
+
+class BatteryOptimizer:
+    """Dynamic programming over a discretized state-of-charge grid.
+
+    The backward pass is done once per set of prices and parameters and does
+    not depend on the current state of charge, so replanning on a changed
+    state of charge is only a forward pass through the stored policy. The
+    action of the first, partly elapsed, slot is chosen again in the forward
+    pass for the time left of it.
+    """
+
+    def __init__(
+        self,
+        params: BatteryParameters,
+        slots: list[tuple[dt.datetime, dt.datetime, float]],
+        cancelled: threading.Event | None = None,
+    ) -> None:
+        """Initialize and run backward pass over (start, end, price) slots.
+
+        Raises CancelledError if cancelled is set before the pass is done.
+        """
+        self._params = params
+        self._slots = slots
+        self._levels = self._grid_levels()
+        self._policy: list[bytearray] = []
+        self._value: list[float] = []
+        # Value of every level at the end of the first slot
+        self._next_value: list[float] = []
+        self._solve(cancelled)
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "params": self._params,
+            "slots": len(self._slots),
+            "levels": self._levels,
+        }
+
+    @property
+    def params(self) -> BatteryParameters:
+        """Parameters used for optimization."""
+        return self._params
+
+    @property
+    def slots(self) -> list[tuple[dt.datetime, dt.datetime, float]]:
+        """Slots used for optimization."""
+        return self._slots
+
+    @property
+    def levels(self) -> int:
+        """Number of steps of the state-of-charge grid."""
+        return self._levels
+
+    def _grid_levels(self) -> int:
+        """Get the number of grid steps, so the shortest slot moves at least one."""
+        params = self._params
+        levels = params.levels
+        if self._slots:
+            hours = min((end - start).total_seconds() for start, end, _ in self._slots)
+            energy = (
+                min(
+                    params.charge_power * math.sqrt(params.efficiency),
+                    params.discharge_power,
+                )
+                * hours
+                / 3600
+            )
+            if energy > 0:
+                levels = max(
+                    levels, min(MAX_LEVELS, math.ceil(params.capacity / energy))
+                )
+        return levels
+
+    def _steps(self, start: dt.datetime, end: dt.datetime) -> tuple[int, int]:
+        """Get number of grid steps the battery can charge and discharge in a slot."""
+        hours = (end - start).total_seconds() / 3600
+        step_energy = self._params.capacity / self._levels
+        one_way = math.sqrt(self._params.efficiency)
+        charge = int(
+            self._params.charge_power * hours * one_way / step_energy + _STEP_TOLERANCE
+        )
+        discharge = int(
+            self._params.discharge_power * hours / step_energy + _STEP_TOLERANCE
+        )
+        return charge, discharge
+
+    def _action(
+        self, level: int, start: dt.datetime, end: dt.datetime, price: float
+    ) -> BatteryAction:
+        """Get the best action at level in the first slot, from start to end."""
+        levels = self._levels
+        step_energy = self._params.capacity / levels
+        one_way = math.sqrt(self._params.efficiency)
+        value = self._next_value
+        charge_steps, discharge_steps = self._steps(start, end)
+        best = value[level]
+        best_action = BatteryAction.Idle
+        if charge_steps and level < levels:
+            k = min(charge_steps, levels - level)
+            v = value[level + k] - k * price * step_energy / one_way
+            if v > best:
+                best = v
+                best_action = BatteryAction.Charge
+        if discharge_steps and level > 0:
+            k = min(discharge_steps, level)
+            v = value[level - k] + k * price * step_energy * one_way
+            if v > best:
+                best_action = BatteryAction.Discharge
+        return best_action
+
+    def _solve(self, cancelled: threading.Event | None = None) -> None:
+        """Backward pass computing the optimal action for every slot and level."""
+        levels = self._levels
+        step_energy = self._params.capacity / levels
+        one_way = math.sqrt(self._params.efficiency)
+
+        # Value stored energy at end of horizon to the average price, to not
+        # empty the battery at any price just because the horizon ends.
+        if self._slots:
+            terminal_price = sum(s[2] for s in self._slots) / len(self._slots)
+        else:
+            terminal_price = 0.0
+        value = [i * step_energy * one_way * terminal_price for i in range(levels + 1)]
+
+        policy: list[bytearray] = [bytearray(levels + 1) for _ in self._slots]
+        for t in range(len(self._slots) - 1, -1, -1):
+            if cancelled is not None and cancelled.is_set():
+                raise CancelledError
+            if t == 0:
+                self._next_value = value
+            start, end, price = self._slots[t]
+            charge_steps, discharge_steps = self._steps(start, end)
+            buy_cost = price * step_energy / one_way
+            sell_gain = price * step_energy * one_way
+            actions = policy[t]
+            new_value = [0.0] * (levels + 1)
+            for i in range(levels + 1):
+                best = value[i]
+                best_action = 0
+                if charge_steps and i < levels:
+                    k = min(charge_steps, levels - i)
+                    v = value[i + k] - k * buy_cost
+                    if v > best:
+                        best = v
+                        best_action = 1
+                if discharge_steps and i > 0:
+                    k = min(discharge_steps, i)
+                    v = value[i - k] + k * sell_gain
+                    if v > best:
+                        best = v
+                        best_action = 2
+                new_value[i] = best
+                actions[i] = best_action
+            value = new_value
+
+        self._policy = policy
+        self._value = value
+
+    def plan(self, soc: float, now: dt.datetime | None = None) -> BatteryPlan:
+        """Forward pass from state of charge in percent at now.
+
+        The first slot is planned from now if it has started.
+        """
+        levels = self._levels
+        step_energy = self._params.capacity / levels
+        one_way = math.sqrt(self._params.efficiency)
+        level = round(max(0.0, min(100.0, soc)) / 100 * levels)
+
+        steps: list[BatteryPlanStep] = []
+        profit = 0.0
+        for t, (start, end, price) in enumerate(self._slots):
+            if t == 0 and now is not None and start < now < end:
+                start = now
+                action = self._action(level, start, end, price)
+            else:
+                action = _ACTIONS[self._policy[t][level]]
+            charge_steps, discharge_steps = self._steps(start, end)
+            new_level = level
+            if action == BatteryAction.Charge:
+                k = min(charge_steps, levels - level)
+                new_level = level + k
+                profit -= k * step_energy / one_way * price
+            elif action == BatteryAction.Discharge:
+                k = min(discharge_steps, level)
+                new_level = level - k
+                profit += k * step_energy * one_way * price
+
+            soc_start = level / levels * 100
+            soc_end = new_level / levels * 100
+            if steps and steps[-1].action == action and steps[-1].end == start:
+                steps[-1].extend(end, soc_end, price)
+            else:
+                steps.append(
+                    BatteryPlanStep(start, end, action, soc_start, soc_end, price)
+                )
+            level = new_level
+
+        return BatteryPlan(steps, profit)
@@ -114,6 +114,7 @@ class NordpoolPlannerBinarySensor(NordpoolPlannerEntity, BinarySensorEntity):
         """Extra state attributes."""
         state_attributes = {
             "starts_at": STATE_UNKNOWN,
+            "ends_at": STATE_UNKNOWN,
             "cost_at": STATE_UNKNOWN,
             "current_cost": self._planner.price_now,
             "current_cost_rate": STATE_UNKNOWN,
@@ -123,6 +124,7 @@ class NordpoolPlannerBinarySensor(NordpoolPlannerEntity, BinarySensorEntity):
         if self.entity_description.key == CONF_LOW_COST_ENTITY:
             state_attributes = {
                 "starts_at": self._planner.low_cost_state.starts_at,
+                "ends_at": self._planner.low_cost_state.ends_at,
                 "cost_at": self._planner.low_cost_state.cost_at,
                 "current_cost": self._planner.price_now,
                 "current_cost_rate": self._planner.low_cost_state.now_cost_rate,
@@ -131,6 +133,7 @@ class NordpoolPlannerBinarySensor(NordpoolPlannerEntity, BinarySensorEntity):
         elif self.entity_description.key == CONF_HIGH_COST_ENTITY:
             state_attributes = {
                 "starts_at": self._planner.high_cost_state.starts_at,
+                "ends_at": self._planner.high_cost_state.ends_at,
                 "cost_at": self._planner.high_cost_state.cost_at,
                 "current_cost": self._planner.price_now,
                 "current_cost_rate": self._planner.high_cost_state.now_cost_rate,
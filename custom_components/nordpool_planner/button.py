@@ -27,7 +27,7 @@ _LOGGER = logging.getLogger(__name__)
 CONF_USED_TIME_RESET_ENTITY_DESCRIPTION = ButtonEntityDescription(
     key=CONF_USED_TIME_RESET_ENTITY,
     device_class=ButtonDeviceClass.RESTART,
-    entity_category=EntityCategory.DIAGNOSTIC
+    entity_category=EntityCategory.DIAGNOSTIC,
 )
 
 
@@ -81,6 +81,6 @@ class NordpoolPlannerButton(NordpoolPlannerEntity, ButtonEntity):
             self.entity_id, self.entity_description.key
         )
 
-    def press(self) -> None:
+    async def async_press(self) -> None:
         """Press the button."""
-        self._planner.low_hours = 0
+        self._planner.set_used_hours(0)
@@ -0,0 +1,56 @@
+"""Bounded cache of plan results shared by all planners."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+
+class PlanCache:
+    """Least recently used cache of plan results.
+
+    Keys shall contain everything the result depends on, e.g. the version of
+    the prices and all planner parameters, so an entry never has to be
+    invalidated, only evicted when the cache is full.
+    """
+
+    def __init__(self, size: int) -> None:
+        """Initialize cache holding at most size entries."""
+        self._size = size
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """Number of entries in cache."""
+        return len(self._entries)
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "size": self._size,
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def get(self, key: Hashable) -> Any | None:
+        """Get cached result for key, None if not cached."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, result: Any) -> None:
+        """Store result for key, evicting the least recently used if full."""
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._entries.clear()
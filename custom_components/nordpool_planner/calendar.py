@@ -0,0 +1,129 @@
+"""Calendar definitions."""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+
+from homeassistant.components.calendar import CalendarEntity, CalendarEvent
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity import EntityDescription
+from homeassistant.util import dt as dt_util
+
+from . import NordpoolPlanner, NordpoolPlannerEntity
+from .const import CONF_CALENDAR_ENTITY, CONF_HIGH_COST_ENTITY, DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+CALENDAR_ENTITY_DESCRIPTION = EntityDescription(
+    key=CONF_CALENDAR_ENTITY,
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant, config_entry: ConfigEntry, async_add_entities
+):
+    """Create calendar entity for platform."""
+
+    planner: NordpoolPlanner = hass.data[DOMAIN][config_entry.entry_id]
+    kinds = ["low_cost"]
+    if config_entry.data.get(CONF_HIGH_COST_ENTITY):
+        kinds.append("high_cost")
+
+    async_add_entities(
+        [
+            NordpoolPlannerCalendar(
+                planner,
+                entity_description=CALENDAR_ENTITY_DESCRIPTION,
+                kinds=kinds,
+            )
+        ]
+    )
+    return True
+
+
+class NordpoolPlannerCalendar(NordpoolPlannerEntity, CalendarEntity):
+    """Calendar of the planned intervals.
+
+    The events are only created when requested, from the timeline of the
+    planner, and kept until the plan version changes, so reading the
+    calendar never replans.
+    """
+
+    _attr_icon = "mdi:calendar-clock"
+
+    def __init__(
+        self,
+        planner,
+        entity_description: EntityDescription,
+        kinds: list[str],
+    ) -> None:
+        """Initialize the entity."""
+        super().__init__(planner)
+        self.entity_description = entity_description
+        self._kinds = kinds
+        self._attr_name = (
+            self._planner.name
+            + " "
+            + entity_description.key.replace("_entity", "").replace("_", " ")
+        )
+        self._attr_unique_id = (
+            ("nordpool_planner_" + self._attr_name)
+            .lower()
+            .replace(".", "")
+            .replace(" ", "_")
+        )
+        self._plan_version = None
+        self._intervals: list[tuple[str, dt.datetime, dt.datetime, float]] = []
+        self._events: dict[int, CalendarEvent] = {}
+
+    def _get_intervals(self) -> list[tuple[str, dt.datetime, dt.datetime, float]]:
+        """Get the intervals of the calendar, dropping events of an old plan."""
+        if self._plan_version != self._planner.plan_version:
+            self._intervals = [
+                interval
+                for interval in self._planner.timeline
+                if interval[0] in self._kinds
+            ]
+            self._events = {}
+            self._plan_version = self._planner.plan_version
+        return self._intervals
+
+    def _get_event(self, i: int) -> CalendarEvent:
+        """Get the event of interval i, created on first request."""
+        if (event := self._events.get(i)) is None:
+            kind, start, end, average = self._intervals[i]
+            event = CalendarEvent(
+                start=start,
+                end=end,
+                summary=f"{self._planner.name} {kind.replace('_', ' ')}",
+                description=f"Average price {average:.3f}",
+                uid=f"{self.unique_id}_{kind}_{start.isoformat()}",
+            )
+            self._events[i] = event
+        return event
+
+    @property
+    def event(self) -> CalendarEvent | None:
+        """Current or next upcoming event."""
+        now = dt_util.now()
+        for i, (_, _, end, _) in enumerate(self._get_intervals()):
+            if end > now:
+                return self._get_event(i)
+        return None
+
+    async def async_get_events(
+        self, hass: HomeAssistant, start_date: dt.datetime, end_date: dt.datetime
+    ) -> list[CalendarEvent]:
+        """Get events overlapping range."""
+        return [
+            self._get_event(i)
+            for i, (_, start, end, _) in enumerate(self._get_intervals())
+            if start < end_date and end > start_date
+        ]
+
+    async def async_added_to_hass(self) -> None:
+        """Register as output of planner when added to hass."""
+        await super().async_added_to_hass()
+        self._planner.register_output_listener_entity(self, self.entity_description.key)
@@ -0,0 +1,157 @@
+"""Plan price files outside of Home Assistant, results as JSON lines.
+
+Example, plan a 3 hour window within 10 hours at every price slot of all
+files, in parallel processes:
+
+    python -m custom_components.nordpool_planner.cli --duration 3 \\
+        --search-length 10 --every-slot prices/*.json > plans.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import datetime as dt
+import json
+import multiprocessing
+import os
+import pathlib
+import sys
+import time
+
+from .planning import (
+    moving_range,
+    normalize_prices,
+    parse_time,
+    plan_windows,
+    static_range,
+)
+from .series import PriceSeries
+from .stats import RollingPriceStatistics
+
+
+def plan_file(path: str, options: dict) -> list[dict]:
+    """Plan one price file, one result for each planning time."""
+    try:
+        data = json.loads(pathlib.Path(path).read_text(encoding="utf-8"))
+        series = PriceSeries(normalize_prices(data))
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return [{"file": path, "error": str(e)}]
+    if not len(series):
+        return [{"file": path, "error": "No prices"}]
+
+    if options["every_slot"]:
+        times = [series.to_datetime(start) for start in series.starts]
+    elif options["now"]:
+        times = [parse_time(options["now"])]
+    else:
+        times = [series.to_datetime(series.starts[0])]
+
+    statistics = RollingPriceStatistics()
+    duration = dt.timedelta(hours=options["duration"])
+    results = []
+    for now in times:
+        if options["type"] == "static":
+            start, end = static_range(now, options["start_hour"], options["end_hour"])
+        else:
+            start, end = moving_range(now, options["search_length"])
+        started = time.perf_counter()
+        result = plan_windows(
+            series,
+            start,
+            end,
+            duration,
+            statistics,
+            path,
+            options["accept_cost"],
+            options["accept_rate"],
+            options["accept_percentile"],
+        )
+        line = {
+            "file": path,
+            "now": now.isoformat(),
+            "elapsed_ms": (time.perf_counter() - started) * 1000,
+        }
+        if result is None:
+            line["warning"] = "No prices in active range"
+        else:
+            lowest, highest = result
+            line["low_starts_at"] = lowest.start_time.isoformat()
+            line["low_ends_at"] = lowest.end_time.isoformat()
+            line["low_cost_at"] = lowest.average
+            line["high_starts_at"] = highest.start_time.isoformat()
+            line["high_cost_at"] = highest.average
+            line["range_mean"] = statistics.mean
+        results.append(line)
+    return results
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """Get parser of command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Plan price files (lists of prices, Nordpool or ENTSO-e "
+        "attributes, or planner diagnostics) and write results as JSON lines."
+    )
+    parser.add_argument("files", nargs="+", help="JSON price files")
+    parser.add_argument("--type", choices=["moving", "static"], default="moving")
+    parser.add_argument("--duration", type=float, default=3, help="hours")
+    parser.add_argument("--search-length", type=float, default=10, help="hours")
+    parser.add_argument("--start-hour", type=int, default=18, help="static only")
+    parser.add_argument("--end-hour", type=int, default=7, help="static only")
+    parser.add_argument("--accept-cost", type=float)
+    parser.add_argument("--accept-rate", type=float)
+    parser.add_argument("--accept-percentile", type=float)
+    parser.add_argument("--now", help="ISO time to plan at, default first price")
+    parser.add_argument(
+        "--every-slot", action="store_true", help="plan at every price slot start"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="number of processes"
+    )
+    parser.add_argument("--output", help="file to write to, default stdout")
+    return parser
+
+
+def _write(out, results) -> bool:
+    """Write results as JSON lines, returns if any file failed."""
+    failed = False
+    for lines in results:
+        for line in lines:
+            failed = failed or "error" in line
+            out.write(json.dumps(line) + "\n")
+    return failed
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run command line, returns exit code."""
+    options = vars(get_parser().parse_args(argv))
+    files = options.pop("files")
+    workers = max(1, min(options.pop("workers") or 1, len(files)))
+    output = options.pop("output")
+
+    out = open(output, "w", encoding="utf-8") if output else sys.stdout  # noqa: SIM115
+    try:
+        if workers == 1:
+            failed = _write(out, (plan_file(path, options) for path in files))
+        else:
+            # Spawn, forking a process with threads (e.g. pytest) may deadlock
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                failed = _write(
+                    out,
+                    executor.map(
+                        plan_file,
+                        files,
+                        [options] * len(files),
+                        chunksize=max(1, len(files) // (workers * 4)),
+                    ),
+                )
+    finally:
+        if output:
+            out.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,26 +14,61 @@ from homeassistant.helpers import selector, template
 
 from .const import (
     CONF_ACCEPT_COST_ENTITY,
+    CONF_ACCEPT_PERCENTILE_ENTITY,
     CONF_ACCEPT_RATE_ENTITY,
+    CONF_BATTERY_ACTION_ENTITY,
+    CONF_BATTERY_CAPACITY_ENTITY,
+    CONF_CHARGE_POWER_ENTITY,
+    CONF_CO2_ENTITY,
+    CONF_CO2_WEIGHT_ENTITY,
+    CONF_COMFORT_MAX_ENTITY,
+    CONF_COMFORT_MIN_ENTITY,
+    CONF_CONSUMPTION_ENTITY,
+    CONF_DISCHARGE_POWER_ENTITY,
     CONF_DURATION_ENTITY,
+    CONF_EFFICIENCY_ENTITY,
     CONF_END_TIME_ENTITY,
+    CONF_FORECAST,
+    CONF_GROUP,
+    CONF_GROUP_POWER_LIMIT,
     CONF_HEALTH_ENTITY,
+    CONF_HEATER_POWER_ENTITY,
+    CONF_HEATING_PLAN_ENTITY,
     CONF_HIGH_COST_ENTITY,
+    CONF_INDOOR_TEMP_ENTITY,
+    CONF_LOSS_COEFFICIENT_ENTITY,
     CONF_LOW_COST_ENTITY,
+    CONF_OUTDOOR_TEMP_ENTITY,
+    CONF_POWER_ENTITY,
+    CONF_PRICES_END_FIELD,
     CONF_PRICES_ENTITY,
+    CONF_PRICES_PATH,
+    CONF_PRICES_START_FIELD,
+    CONF_PRICES_VALUE_FIELD,
+    CONF_REALIZED_COST_ENTITY,
+    CONF_RISK_ENTITY,
     CONF_SEARCH_LENGTH_ENTITY,
+    CONF_SOC_ENTITY,
     CONF_START_TIME_ENTITY,
     CONF_STARTS_AT_ENTITY,
+    CONF_THERMAL_CAPACITY_ENTITY,
     CONF_TYPE,
+    CONF_TYPE_BATTERY,
+    CONF_TYPE_DEADLINE,
     CONF_TYPE_LIST,
     CONF_TYPE_MOVING,
     CONF_TYPE_STATIC,
+    CONF_TYPE_THERMAL,
     CONF_USED_HOURS_LOW_ENTITY,
+    DATA_PLANNER_GROUPS,
     DOMAIN,
+    NAME_ARCHIVE_READER,
     NAME_FILE_READER,
     PATH_FILE_READER,
 )
 from .helpers import get_np_from_file
+from .series import PriceSeries
+from .sources import AttributePathAdapter, detect_adapter
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -54,7 +89,7 @@ class NordpoolPlannerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Nordpool Planner config flow."""
 
     VERSION = 2
-    MINOR_VERSION = 2
+    MINOR_VERSION = 3
     data = None
     options = None
     _reauth_entry: config_entries.ConfigEntry | None = None
@@ -65,17 +100,55 @@ class NordpoolPlannerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Handle initial user step."""
         errors: dict[str, str] = {}
 
-        if user_input is not None:
+        if user_input is not None and (
+            user_input.get(CONF_GROUP) and user_input[CONF_TYPE] != CONF_TYPE_DEADLINE
+        ):
+            errors[CONF_GROUP] = "group_not_supported"
+        elif user_input is not None and (
+            user_input.get(CONF_FORECAST) and user_input[CONF_TYPE] != CONF_TYPE_MOVING
+        ):
+            errors[CONF_FORECAST] = "forecast_not_supported"
+        elif user_input is not None:
             self.data = user_input
             # Add those that are not optional
             self.data[CONF_LOW_COST_ENTITY] = True
-            self.data[CONF_DURATION_ENTITY] = True
+            if self.data[CONF_TYPE] not in [CONF_TYPE_BATTERY, CONF_TYPE_THERMAL]:
+                self.data[CONF_DURATION_ENTITY] = True
+            if self.data.get(CONF_CO2_ENTITY) and self.data[CONF_TYPE] in [
+                CONF_TYPE_MOVING,
+                CONF_TYPE_STATIC,
+            ]:
+                self.data[CONF_CO2_WEIGHT_ENTITY] = True
+            if self.data.get(CONF_CONSUMPTION_ENTITY):
+                self.data[CONF_REALIZED_COST_ENTITY] = True
             if self.data[CONF_TYPE] == CONF_TYPE_MOVING:
                 self.data[CONF_SEARCH_LENGTH_ENTITY] = True
+                if self.data.get(CONF_FORECAST):
+                    self.data[CONF_RISK_ENTITY] = True
             elif self.data[CONF_TYPE] == CONF_TYPE_STATIC:
                 self.data[CONF_START_TIME_ENTITY] = True
                 self.data[CONF_END_TIME_ENTITY] = True
                 self.data[CONF_USED_HOURS_LOW_ENTITY] = True
+            elif self.data[CONF_TYPE] == CONF_TYPE_DEADLINE:
+                self.data[CONF_END_TIME_ENTITY] = True
+                self.data[CONF_USED_HOURS_LOW_ENTITY] = True
+                if self.data.get(CONF_GROUP):
+                    self.data[CONF_POWER_ENTITY] = True
+            elif self.data[CONF_TYPE] == CONF_TYPE_BATTERY:
+                # Low cost is charging and high cost is discharging
+                self.data[CONF_HIGH_COST_ENTITY] = True
+                self.data[CONF_BATTERY_CAPACITY_ENTITY] = True
+                self.data[CONF_CHARGE_POWER_ENTITY] = True
+                self.data[CONF_DISCHARGE_POWER_ENTITY] = True
+                self.data[CONF_EFFICIENCY_ENTITY] = True
+                self.data[CONF_BATTERY_ACTION_ENTITY] = True
+            elif self.data[CONF_TYPE] == CONF_TYPE_THERMAL:
+                self.data[CONF_LOSS_COEFFICIENT_ENTITY] = True
+                self.data[CONF_HEATER_POWER_ENTITY] = True
+                self.data[CONF_THERMAL_CAPACITY_ENTITY] = True
+                self.data[CONF_COMFORT_MIN_ENTITY] = True
+                self.data[CONF_COMFORT_MAX_ENTITY] = True
+                self.data[CONF_HEATING_PLAN_ENTITY] = True
 
             self.options = {}
             if self.data[CONF_PRICES_ENTITY] == NAME_FILE_READER:
@@ -87,7 +160,7 @@ class NordpoolPlannerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 self.options[ATTR_UNIT_OF_MEASUREMENT] = np_entity.attributes.get(
                     ATTR_UNIT_OF_MEASUREMENT
                 )
-            except (IndexError, KeyError):
+            except (AttributeError, IndexError, KeyError):
                 _LOGGER.warning("Could not extract currency from Nordpool entity")
 
             await self.async_set_unique_id(
@@ -99,14 +172,11 @@ class NordpoolPlannerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             )
             self._abort_if_unique_id_configured()
 
-            _LOGGER.debug(
-                'Creating entry "%s" with data "%s"',
-                self.unique_id,
-                self.data,
-            )
-            return self.async_create_entry(
-                title=self.data[ATTR_NAME], data=self.data, options=self.options
-            )
+            if detect_adapter(self.data[CONF_PRICES_ENTITY], np_entity) is None:
+                # Not a known format, ask where in the attributes the prices are
+                return await self.async_step_prices()
+
+            return await self._async_step_planner()
 
         selected_entities = []
         if NORDPOOL_DOMAIN:
@@ -117,6 +187,7 @@ class NordpoolPlannerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             ent = template.integration_entities(self.hass, ENTOSOE_DOMAIN)
             selected_entities.extend([s for s in ent if "average" in s])
         selected_entities.append(NAME_FILE_READER)
+        selected_entities.append(NAME_ARCHIVE_READER)
 
         schema = vol.Schema(
             {
@@ -125,13 +196,26 @@ class NordpoolPlannerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     selector.SelectSelectorConfig(options=CONF_TYPE_LIST),
                 ),
                 vol.Required(CONF_PRICES_ENTITY): selector.SelectSelector(
-                    selector.SelectSelectorConfig(options=selected_entities),
+                    selector.SelectSelectorConfig(
+                        options=selected_entities, custom_value=True
+                    ),
                 ),
                 vol.Required(CONF_ACCEPT_COST_ENTITY, default=False): bool,
                 vol.Required(CONF_ACCEPT_RATE_ENTITY, default=False): bool,
+                vol.Required(CONF_ACCEPT_PERCENTILE_ENTITY, default=False): bool,
                 vol.Required(CONF_HIGH_COST_ENTITY, default=False): bool,
                 vol.Required(CONF_STARTS_AT_ENTITY, default=False): bool,
                 vol.Required(CONF_HEALTH_ENTITY, default=True): bool,
+                vol.Optional(CONF_CO2_ENTITY): selector.EntitySelector(
+                    selector.EntitySelectorConfig(domain="sensor"),
+                ),
+                vol.Optional(CONF_GROUP): str,
+                vol.Required(CONF_FORECAST, default=False): bool,
+                vol.Optional(CONF_CONSUMPTION_ENTITY): selector.EntitySelector(
+                    selector.EntitySelectorConfig(
+                        domain="sensor", device_class=["power", "energy"]
+                    ),
+                ),
             }
         )
 
@@ -147,6 +231,184 @@ class NordpoolPlannerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             errors=errors,
         )
 
+    async def async_step_prices(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Handle step declaring the prices of an entity of unknown format."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            adapter = AttributePathAdapter(
+                self.data[CONF_PRICES_ENTITY],
+                user_input[CONF_PRICES_PATH],
+                user_input[CONF_PRICES_START_FIELD],
+                user_input[CONF_PRICES_VALUE_FIELD],
+                user_input.get(CONF_PRICES_END_FIELD) or None,
+            )
+            state = self.hass.states.get(self.data[CONF_PRICES_ENTITY])
+            if state is None:
+                errors["base"] = "invalid_prices_entity"
+            else:
+                # Validate the declaration against the live state of the source
+                try:
+                    series = PriceSeries(adapter.validate(state))
+                except (KeyError, IndexError, TypeError, ValueError) as e:
+                    _LOGGER.debug("Invalid prices declaration: %s", e)
+                    errors["base"] = "invalid_prices_path"
+                else:
+                    if not len(series):
+                        errors["base"] = "no_prices_found"
+            if not errors:
+                self.data[CONF_PRICES_PATH] = adapter.path
+                self.data[CONF_PRICES_START_FIELD] = adapter.start_field
+                self.data[CONF_PRICES_VALUE_FIELD] = adapter.value_field
+                if adapter.end_field:
+                    self.data[CONF_PRICES_END_FIELD] = adapter.end_field
+                return await self._async_step_planner()
+
+        schema = vol.Schema(
+            {
+                vol.Required(CONF_PRICES_PATH): str,
+                vol.Required(CONF_PRICES_START_FIELD, default="start"): str,
+                vol.Optional(CONF_PRICES_END_FIELD): str,
+                vol.Required(CONF_PRICES_VALUE_FIELD, default="value"): str,
+            }
+        )
+
+        return self.async_show_form(
+            step_id="prices",
+            data_schema=schema,
+            description_placeholders={
+                CONF_PRICES_ENTITY: self.data[CONF_PRICES_ENTITY]
+            },
+            errors=errors,
+        )
+
+    async def async_step_battery(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Handle battery planner step."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            if not self._has_numeric_state(user_input[CONF_SOC_ENTITY]):
+                errors[CONF_SOC_ENTITY] = "invalid_soc_entity"
+            else:
+                self.data[CONF_SOC_ENTITY] = user_input[CONF_SOC_ENTITY]
+                return self._async_create_planner_entry()
+
+        schema = vol.Schema(
+            {
+                vol.Required(CONF_SOC_ENTITY): selector.EntitySelector(
+                    selector.EntitySelectorConfig(
+                        domain=["sensor", "number", "input_number"]
+                    ),
+                ),
+            }
+        )
+
+        return self.async_show_form(
+            step_id="battery",
+            data_schema=schema,
+            errors=errors,
+        )
+
+    async def async_step_thermal(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Handle thermal planner step."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            for key in [CONF_INDOOR_TEMP_ENTITY, CONF_OUTDOOR_TEMP_ENTITY]:
+                if not self._has_numeric_state(user_input[key]):
+                    errors[key] = "invalid_temperature_entity"
+            if not errors:
+                self.data[CONF_INDOOR_TEMP_ENTITY] = user_input[CONF_INDOOR_TEMP_ENTITY]
+                self.data[CONF_OUTDOOR_TEMP_ENTITY] = user_input[
+                    CONF_OUTDOOR_TEMP_ENTITY
+                ]
+                return self._async_create_planner_entry()
+
+        temperature_selector = selector.EntitySelector(
+            selector.EntitySelectorConfig(domain=["sensor", "input_number"]),
+        )
+        schema = vol.Schema(
+            {
+                vol.Required(CONF_INDOOR_TEMP_ENTITY): temperature_selector,
+                vol.Required(CONF_OUTDOOR_TEMP_ENTITY): temperature_selector,
+            }
+        )
+
+        return self.async_show_form(
+            step_id="thermal",
+            data_schema=schema,
+            errors=errors,
+        )
+
+    async def async_step_group(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Handle step setting the power limit of a planner group."""
+        if user_input is not None:
+            self.data[CONF_GROUP_POWER_LIMIT] = user_input[CONF_GROUP_POWER_LIMIT]
+            return self._async_create_planner_entry()
+
+        # Suggest the limit of the group if it already has planners
+        group = self.hass.data.get(DATA_PLANNER_GROUPS, {}).get(self.data[CONF_GROUP])
+        limit = group.power_limit if group is not None else None
+        schema = vol.Schema(
+            {
+                vol.Required(
+                    CONF_GROUP_POWER_LIMIT, default=limit or 11.0
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=0.1,
+                        max=100.0,
+                        step=0.1,
+                        unit_of_measurement="kW",
+                        mode=selector.NumberSelectorMode.BOX,
+                    )
+                ),
+            }
+        )
+
+        return self.async_show_form(
+            step_id="group",
+            data_schema=schema,
+            description_placeholders={CONF_GROUP: self.data[CONF_GROUP]},
+        )
+
+    async def _async_step_planner(self) -> FlowResult:
+        """Continue with the step of the planner type, or create entry."""
+        if self.data.get(CONF_GROUP):
+            return await self.async_step_group()
+        if self.data[CONF_TYPE] == CONF_TYPE_BATTERY:
+            return await self.async_step_battery()
+        if self.data[CONF_TYPE] == CONF_TYPE_THERMAL:
+            return await self.async_step_thermal()
+        return self._async_create_planner_entry()
+
+    def _has_numeric_state(self, entity_id: str) -> bool:
+        """Check if entity exists and has a numeric state."""
+        entity = self.hass.states.get(entity_id)
+        try:
+            float(entity.state)
+        except (AttributeError, TypeError, ValueError):
+            return False
+        return True
+
+    def _async_create_planner_entry(self) -> FlowResult:
+        """Create the config entry from collected data."""
+        _LOGGER.debug(
+            'Creating entry "%s" with data "%s"',
+            self.unique_id,
+            self.data,
+        )
+        return self.async_create_entry(
+            title=self.data[ATTR_NAME], data=self.data, options=self.options
+        )
+
     # async def async_step_import(
     #     self, user_input: Optional[Dict[str, Any]] | None = None
     # ) -> FlowResult:
@@ -18,8 +18,21 @@ class PlannerStates(Enum):
 CONF_TYPE = "type"
 CONF_TYPE_MOVING = "moving"
 CONF_TYPE_STATIC = "static"
-CONF_TYPE_LIST = [CONF_TYPE_MOVING, CONF_TYPE_STATIC]
+CONF_TYPE_BATTERY = "battery"
+CONF_TYPE_THERMAL = "thermal"
+CONF_TYPE_DEADLINE = "deadline"
+CONF_TYPE_LIST = [
+    CONF_TYPE_MOVING,
+    CONF_TYPE_STATIC,
+    CONF_TYPE_BATTERY,
+    CONF_TYPE_THERMAL,
+    CONF_TYPE_DEADLINE,
+]
 CONF_PRICES_ENTITY = "prices_entity"
+CONF_PRICES_PATH = "prices_path"
+CONF_PRICES_START_FIELD = "prices_start_field"
+CONF_PRICES_END_FIELD = "prices_end_field"
+CONF_PRICES_VALUE_FIELD = "prices_value_field"
 CONF_LOW_COST_ENTITY = "low_cost_entity"
 CONF_HEALTH_ENTITY = "health_entity"
 CONF_HIGH_COST_ENTITY = "high_cost_entity"
@@ -27,12 +40,83 @@ CONF_STARTS_AT_ENTITY = "starts_at_entity"
 CONF_DURATION_ENTITY = "duration_entity"
 CONF_ACCEPT_COST_ENTITY = "accept_cost_entity"
 CONF_ACCEPT_RATE_ENTITY = "accept_rate_entity"
+CONF_ACCEPT_PERCENTILE_ENTITY = "accept_percentile_entity"
 CONF_SEARCH_LENGTH_ENTITY = "search_length_entity"
 CONF_END_TIME_ENTITY = "end_time_entity"
 CONF_USED_TIME_RESET_ENTITY = "used_time_reset_entity"
 CONF_START_TIME_ENTITY = "start_time_entity"
 CONF_USED_HOURS_LOW_ENTITY = "used_hours_low_entity"
+CONF_SOC_ENTITY = "soc_entity"
+CONF_BATTERY_CAPACITY_ENTITY = "battery_capacity_entity"
+CONF_CHARGE_POWER_ENTITY = "charge_power_entity"
+CONF_DISCHARGE_POWER_ENTITY = "discharge_power_entity"
+CONF_EFFICIENCY_ENTITY = "efficiency_entity"
+CONF_BATTERY_ACTION_ENTITY = "battery_action_entity"
+CONF_INDOOR_TEMP_ENTITY = "indoor_temp_entity"
+CONF_OUTDOOR_TEMP_ENTITY = "outdoor_temp_entity"
+CONF_LOSS_COEFFICIENT_ENTITY = "loss_coefficient_entity"
+CONF_HEATER_POWER_ENTITY = "heater_power_entity"
+CONF_THERMAL_CAPACITY_ENTITY = "thermal_capacity_entity"
+CONF_COMFORT_MIN_ENTITY = "comfort_min_entity"
+CONF_COMFORT_MAX_ENTITY = "comfort_max_entity"
+CONF_HEATING_PLAN_ENTITY = "heating_plan_entity"
+CONF_CO2_ENTITY = "co2_entity"
+CONF_CO2_WEIGHT_ENTITY = "co2_weight_entity"
+CONF_GROUP = "group"
+CONF_GROUP_POWER_LIMIT = "group_power_limit"
+CONF_POWER_ENTITY = "power_entity"
+CONF_CONSUMPTION_ENTITY = "consumption_entity"
+CONF_REALIZED_COST_ENTITY = "realized_cost_entity"
+CONF_FORECAST = "forecast"
+CONF_RISK_ENTITY = "risk_entity"
+CONF_CALENDAR_ENTITY = "calendar_entity"
 
 NAME_FILE_READER = "file_reader"
+NAME_ARCHIVE_READER = "archive_reader"
 
 PATH_FILE_READER = "config/config_entry-nordpool_planner.json"
+PATH_ARCHIVE_READER = "config/nordpool_planner_archive"
+
+# Plan results cache shared by all planners in hass.data
+DATA_PLAN_CACHE = f"{DOMAIN}_plan_cache"
+PLAN_CACHE_SIZE = 64
+
+# Planners grouped per price source in hass.data
+DATA_PRICES_BATCHES = f"{DOMAIN}_prices_batches"
+DATA_TICK_DISPATCHER = f"{DOMAIN}_tick_dispatcher"
+# Sent with the entity id of a price source read in the background when read
+SIGNAL_SOURCE_REFRESHED = f"{DOMAIN}_source_refreshed_{{}}"
+
+# Worker pool for heavy planner computations (battery and thermal optimization)
+DATA_WORKER_POOL = f"{DOMAIN}_worker_pool"
+DATA_WORKERS = f"{DOMAIN}_workers"
+CONF_WORKERS = "workers"
+PLANNER_WORKERS = 2
+PLANNER_MAX_WORKERS = 16
+PLANNER_TIMEOUT = 60
+
+# Deadline planners scheduled jointly under a shared power limit in hass.data
+DATA_PLANNER_GROUPS = f"{DOMAIN}_planner_groups"
+
+# Number of plan traces kept per planner for diagnostics
+PLAN_TRACE_SIZE = 50
+
+# Per planner history of executed price slots, in the storage directory
+HISTORY_DIR = f"{DOMAIN}_history"
+HISTORY_RETENTION_DAYS = 400
+
+# Scenarios of unpublished prices sampled by forecasting planners
+FORECAST_SCENARIOS = 50
+
+# Profile service, limited to be safe to run in production
+SERVICE_PROFILE = "profile"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_REPLANS = "replans"
+ATTR_TIMEOUT = "timeout"
+DATA_PROFILER = f"{DOMAIN}_profiler"
+PROFILE_MAX_REPLANS = 100
+PROFILE_MAX_SECONDS = 600
+PROFILE_MAX_BYTES = 1_000_000
+
+# Most items in one page of the WebSocket commands
+WS_PAGE_LIMIT = 500
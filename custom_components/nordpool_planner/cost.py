@@ -0,0 +1,176 @@
+"""Streaming accounting of the realized cost of consumption."""
+
+from __future__ import annotations
+
+import datetime as dt
+import math
+
+from .series import PriceSeries
+
+
+class CostMeter:
+    """Cost of the consumption of the current day, integrated slot by slot.
+
+    Consumption is reported as power (kW) or as the reading of an energy
+    meter (kWh), and is integrated from the last report to the next one at
+    the price of each slot in between, split exactly at slot boundaries and
+    at midnight. The current slot is kept with its end, so a report within
+    the same slot is O(1), and passing to the next slot only steps one index
+    forward. Consumption outside of known prices is not counted.
+    """
+
+    def __init__(self) -> None:
+        """Initialize meter without any consumption."""
+        self.day: dt.date | None = None
+        self.energy = 0.0
+        self.cost = 0.0
+        self.day_average: float | None = None
+        self._tzinfo: dt.tzinfo | None = None
+        self._time: float | None = None
+        self._power = 0.0
+        self._reading: float | None = None
+        self._day_end = math.inf
+        self._series: PriceSeries | None = None
+        self._index = -1
+        self._slot_start = math.inf
+        self._slot_end = -math.inf
+        self._price: float | None = None
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "day": self.day,
+            "energy": self.energy,
+            "cost": self.cost,
+            "average_price": self.average_price,
+            "day_average": self.day_average,
+            "savings": self.savings,
+            "power": self._power,
+        }
+
+    @property
+    def average_price(self) -> float | None:
+        """Average price paid for the energy of the day."""
+        if self.energy <= 0:
+            return None
+        return self.cost / self.energy
+
+    @property
+    def savings(self) -> float | None:
+        """Cost of the energy at the average price of the day minus the cost."""
+        if self.day_average is None:
+            return None
+        return self.energy * self.day_average - self.cost
+
+    def restore(self, day: dt.date, energy: float, cost: float) -> None:
+        """Restore the totals of day, e.g. after a restart."""
+        self.day = day
+        self.energy = energy
+        self.cost = cost
+
+    def set_power(
+        self, series: PriceSeries, time: dt.datetime, power: float | None
+    ) -> None:
+        """Integrate the last power up to time and continue with power (kW)."""
+        self.advance(series, time)
+        self._power = power or 0.0
+
+    def set_reading(
+        self, series: PriceSeries, time: dt.datetime, reading: float | None
+    ) -> None:
+        """Spread the energy since the last meter reading (kWh) evenly over time.
+
+        A lower reading than the last is taken as a reset of the meter.
+        """
+        if reading is None:
+            return
+        if self._reading is not None and self._time is not None:
+            energy = reading - self._reading if reading >= self._reading else reading
+            hours = (time.timestamp() - self._time) / 3600
+            if hours > 0:
+                self._power = energy / hours
+                self.advance(series, time)
+            else:
+                self._start(series, time)
+                self._add(energy)
+        else:
+            self._start(series, time)
+        self._power = 0.0
+        self._reading = reading
+
+    def advance(self, series: PriceSeries, time: dt.datetime) -> None:
+        """Integrate the current power up to time."""
+        if self._time is None:
+            self._start(series, time)
+            return
+        if series is not self._series:
+            # New prices, e.g. tomorrow's added, the day average may change
+            self._series = series
+            self._set_day(self._time)
+            self._locate()
+        end = time.timestamp()
+        while self._time < end:
+            if self._time >= self._day_end:
+                self._new_day(self._day_end)
+            while self._time >= self._slot_end:
+                self._set_slot(self._index + 1)
+            if self._time < self._slot_start:
+                # Before the next slot with a price
+                to = min(end, self._slot_start, self._day_end)
+            else:
+                to = min(end, self._slot_end, self._day_end)
+                self._add(self._power * (to - self._time) / 3600)
+            self._time = to
+        if self._time >= self._day_end:
+            self._new_day(self._day_end)
+
+    def _start(self, series: PriceSeries, time: dt.datetime) -> None:
+        """Start integrating at time, keeping restored totals of the same day."""
+        self._tzinfo = time.tzinfo
+        self._series = series
+        if self._time is None:
+            self._time = time.timestamp()
+            if self.day != time.date():
+                self._new_day(self._time)
+            else:
+                self._set_day(self._time)
+        self._locate()
+
+    def _add(self, energy: float) -> None:
+        """Add energy at the price of the current slot, if started."""
+        if self._price is not None and self._slot_start <= self._time:
+            self.energy += energy
+            self.cost += energy * self._price
+
+    def _new_day(self, timestamp: float) -> None:
+        self.energy = 0.0
+        self.cost = 0.0
+        self._set_day(timestamp)
+
+    def _set_day(self, timestamp: float) -> None:
+        start = dt.datetime.fromtimestamp(timestamp, self._tzinfo)
+        self.day = start.date()
+        day_start = dt.datetime.combine(self.day, dt.time(), start.tzinfo)
+        day_end = dt.datetime.combine(
+            self.day + dt.timedelta(days=1), dt.time(), start.tzinfo
+        )
+        self._day_end = day_end.timestamp()
+        self.day_average = self._series.average(day_start, day_end)
+
+    def _locate(self) -> None:
+        """Find the slot at or after the current time, by binary search."""
+        i = self._series.index_at(self._time)
+        if i < 0 or self._time >= self._series.ends[i]:
+            i += 1
+        self._set_slot(i)
+
+    def _set_slot(self, i: int) -> None:
+        """Set slot i as current, no price after the series."""
+        self._index = i
+        if i < len(self._series):
+            self._slot_start = self._series.starts[i]
+            self._slot_end = self._series.ends[i]
+            self._price = self._series.values[i]
+        else:
+            self._slot_start = self._slot_end = math.inf
+            self._price = None
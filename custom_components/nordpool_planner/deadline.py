@@ -0,0 +1,172 @@
+"""Ready-by planning for the deadline planner type."""
+
+from __future__ import annotations
+
+import bisect
+import datetime as dt
+
+
+class DeadlinePeriod:
+    """Time between two deadlines with candidate slots sorted by price."""
+
+    def __init__(
+        self,
+        start: dt.datetime,
+        deadline: dt.datetime,
+        slots: list[tuple[dt.datetime, dt.datetime, float]],
+    ) -> None:
+        """Initialize period with the (start, end, price) slots overlapping it."""
+        self.start = start
+        self.deadline = deadline
+        self.complete = bool(slots) and slots[-1][1] >= deadline
+        candidates = []
+        for s_start, s_end, price in slots:
+            s_start = max(s_start, start)
+            s_end = min(s_end, deadline)
+            if s_end > s_start:
+                candidates.append((price, s_start, s_end))
+        candidates.sort()
+        self.candidates = candidates
+
+    def __repr__(self) -> str:
+        """Get string representation for debugging."""
+        return (
+            type(self).__name__
+            + f" (start={self.start} deadline={self.deadline}"
+            + f" candidates={len(self.candidates)} complete={self.complete})"
+        )
+
+    def select(
+        self, now: dt.datetime, hours: float
+    ) -> tuple[list[tuple[dt.datetime, dt.datetime, float]], float]:
+        """Select cheapest slots after now to cover hours.
+
+        Returns selected (start, end, price) slots in time order and the hours
+        that could not be covered before the deadline.
+        """
+        selected = []
+        remaining = hours
+        for price, start, end in self.candidates:
+            if remaining <= 0:
+                break
+            if end <= now:
+                continue
+            start = max(start, now)
+            length = (end - start).total_seconds() / 3600
+            if length > remaining:
+                end = start + dt.timedelta(hours=remaining)
+                length = remaining
+            selected.append((start, end, price))
+            remaining -= length
+        selected.sort()
+        return selected, max(0.0, remaining)
+
+
+class DeadlineSchedule:
+    """Candidate slots per upcoming daily deadline over all published prices.
+
+    Candidates are sorted once per set of prices and deadline hour, so a
+    replan on a tick or changed quota is only a scan from the cheapest slot.
+    """
+
+    def __init__(
+        self,
+        slots: list[tuple[dt.datetime, dt.datetime, float]],
+        deadline_hour: int,
+        now: dt.datetime,
+    ) -> None:
+        """Initialize schedule from (start, end, price) slots."""
+        self._slots = slots
+        self._deadline_hour = deadline_hour
+        self.periods: list[DeadlinePeriod] = []
+        # Version of the prices the schedule was made from, set by owner
+        self.version = None
+
+        deadline = now.replace(hour=deadline_hour, minute=0, second=0, microsecond=0)
+        if deadline <= now:
+            deadline += dt.timedelta(days=1)
+        start = now
+        horizon_end = slots[-1][1] if slots else now
+        while True:
+            self.periods.append(DeadlinePeriod(start, deadline, slots))
+            if deadline >= horizon_end:
+                break
+            start = deadline
+            deadline += dt.timedelta(days=1)
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {"deadline_hour": self._deadline_hour, "periods": self.periods}
+
+    @property
+    def slots(self) -> list[tuple[dt.datetime, dt.datetime, float]]:
+        """Slots used for schedule."""
+        return self._slots
+
+    @property
+    def deadline_hour(self) -> int:
+        """Hour of day of the deadlines."""
+        return self._deadline_hour
+
+    @property
+    def next_deadline(self) -> dt.datetime:
+        """The first upcoming deadline."""
+        return self.periods[0].deadline
+
+    def valid_at(self, now: dt.datetime) -> bool:
+        """Is the schedule still valid, i.e. the first deadline has not passed."""
+        return now < self.next_deadline
+
+    def plan(self, now: dt.datetime, runtime: float, used: float) -> DeadlinePlan:
+        """Plan runtime hours before each deadline, with used hours for the first."""
+        intervals: list[tuple[dt.datetime, dt.datetime, float]] = []
+        deadlines = []
+        for i, period in enumerate(self.periods):
+            needed = max(0.0, runtime - used) if i == 0 else runtime
+            selected, missing = period.select(now, needed)
+            intervals.extend(selected)
+            deadlines.append(
+                {
+                    "deadline": period.deadline,
+                    "needed": needed,
+                    "missing": missing,
+                    "complete": period.complete,
+                }
+            )
+        return DeadlinePlan(intervals, deadlines)
+
+
+class DeadlinePlan:
+    """Planned on-intervals for the upcoming deadlines."""
+
+    def __init__(
+        self,
+        slots: list[tuple[dt.datetime, dt.datetime, float]],
+        deadlines: list[dict],
+    ) -> None:
+        """Initialize plan, merging adjacent slots to intervals."""
+        intervals: list[list] = []
+        for start, end, price in slots:
+            hours = (end - start).total_seconds() / 3600
+            if intervals and intervals[-1][1] == start:
+                intervals[-1][1] = end
+                intervals[-1][2] += price * hours
+                intervals[-1][3] += hours
+            else:
+                intervals.append([start, end, price * hours, hours])
+        self.intervals = [(i[0], i[1], i[2] / i[3]) for i in intervals]
+        self.deadlines = deadlines
+        self._ends = [i[1] for i in self.intervals]
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {"intervals": self.intervals, "deadlines": self.deadlines}
+
+    def next_interval(
+        self, time: dt.datetime
+    ) -> tuple[dt.datetime, dt.datetime, float] | None:
+        """Get the (start, end, average) interval active at or next after time."""
+        i = bisect.bisect_right(self._ends, time)
+        if i < len(self.intervals):
+            return self.intervals[i]
+        return None
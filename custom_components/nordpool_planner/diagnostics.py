@@ -11,7 +11,7 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 
 from . import NordpoolPlanner
-from .const import DOMAIN
+from .const import DATA_TICK_DISPATCHER, DOMAIN
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -22,9 +22,17 @@ async def async_get_config_entry_diagnostics(
     hass: HomeAssistant, config_entry: ConfigEntry
 ) -> dict[str, Any]:
     """Return diagnostics for a config entry."""
+    planner: NordpoolPlanner = hass.data[DOMAIN][config_entry.entry_id]
     diag_data = {
         # "config_entry": config_entry,  # Already included in the planner
-        "planner": hass.data[DOMAIN][config_entry.entry_id],
+        "planner": planner,
     }
+    # Only the timing of the ticks, the batches are of all entries
+    if (dispatcher := hass.data.get(DATA_TICK_DISPATCHER)) is not None:
+        tick = dispatcher.as_dict()
+        diag_data["tick_dispatcher"] = {
+            key: tick[key]
+            for key in ("ticks", "last_latency", "max_latency", "mean_latency")
+        }
 
     return diag_data
@@ -0,0 +1,207 @@
+"""Price scenarios for slots not published yet, from the price history."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+import datetime as dt
+import math
+import random
+
+from .series import PriceSeries, PriceWindow
+
+# Weeks of history used, the most recent ones follow the season best
+PROFILE_WEEKS = 8
+
+
+class PriceProfile:
+    """Prices of past days by time of day, to sample unpublished days from.
+
+    A scenario for a day takes all its prices from one past day, of the same
+    weekday if there is any, otherwise of any day, so the shape within the
+    day (e.g. cheap nights) is kept.
+    """
+
+    def __init__(
+        self, records: Iterable[tuple[float, float]], tzinfo: dt.tzinfo | None
+    ) -> None:
+        """Initialize from (slot start epoch, price) of past slots."""
+        self.tzinfo = tzinfo
+        self._days: dict[dt.date, dict[int, float]] = {}
+        for start, price in records:
+            time = dt.datetime.fromtimestamp(start, tzinfo)
+            self._days.setdefault(time.date(), {})[time.hour * 60 + time.minute] = price
+
+    def __len__(self) -> int:
+        """Number of past days in profile."""
+        return len(self._days)
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "days": len(self),
+            "first": min(self._days, default=None),
+            "last": max(self._days, default=None),
+        }
+
+    def candidates(self, day: dt.date) -> list[dict[int, float]]:
+        """Past days to sample day from, most recent first."""
+        days = sorted((d for d in self._days if d < day), reverse=True)
+        same_weekday = [d for d in days if d.weekday() == day.weekday()]
+        return [self._days[d] for d in (same_weekday or days)[:PROFILE_WEEKS]]
+
+    def scenarios(
+        self,
+        series: PriceSeries,
+        until: dt.datetime,
+        count: int,
+        seed: int = 0,
+    ) -> PriceScenarios | None:
+        """Get count scenarios of the slots after series up to until.
+
+        None if no slots are missing or the profile has no past days.
+        Slots are of the resolution of the series, and a slot without a
+        price in the sampled day gets the mean of all candidates.
+        """
+        if not len(series) or series.ends[-1] >= until.timestamp():
+            return None
+        step = series.ends[-1] - series.starts[-1]
+        slots = []
+        start = series.ends[-1]
+        while start < until.timestamp():
+            time = dt.datetime.fromtimestamp(start, self.tzinfo)
+            slots.append((start, time.date(), time.hour * 60 + time.minute))
+            start += step
+        candidates = {day: self.candidates(day) for _, day, _ in slots}
+        if not all(candidates.values()):
+            return None
+        means: dict[tuple[dt.date, int], float | None] = {}
+        for _, day, minute in slots:
+            prices = [c[minute] for c in candidates[day] if minute in c]
+            means[day, minute] = sum(prices) / len(prices) if prices else None
+        if any(mean is None for mean in means.values()):
+            return None
+
+        rng = random.Random(seed)
+        picked = [
+            {day: rng.choice(days) for day, days in candidates.items()}
+            for _ in range(count)
+        ]
+        values = [(value,) * count for value in series.values]
+        values += [
+            tuple(days[day].get(minute, means[day, minute]) for days in picked)
+            for _, day, minute in slots
+        ]
+        grid = PriceSeries(
+            [
+                {
+                    "start": series.to_datetime(start),
+                    "end": series.to_datetime(end),
+                    "value": sum(prices) / count,
+                }
+                for start, end, prices in zip(
+                    series.starts + [start for start, _, _ in slots],
+                    series.ends + [start + step for start, _, _ in slots],
+                    values,
+                )
+            ]
+        )
+        return PriceScenarios(grid, values)
+
+
+class PriceScenarios:
+    """Scenarios of the prices of a shared grid of slots.
+
+    The grid is a series of the known and the sampled slots, priced at the
+    mean over the scenarios, so the averages of its windows are the expected
+    ones. The prices of all scenarios are kept per slot, with prefix sums of
+    price * hours, to average a window in every scenario in one pass.
+    """
+
+    def __init__(self, grid: PriceSeries, values: list[tuple[float, ...]]) -> None:
+        """Initialize from grid and the prices of every scenario per slot."""
+        self.grid = grid
+        self._values = values
+        self._count = len(values[0]) if values else 0
+        self._cost = [(0.0,) * self._count]
+        for start, end, prices in zip(grid.starts, grid.ends, values):
+            hours = (end - start) / 3600
+            self._cost.append(
+                tuple(
+                    cost + price * hours for cost, price in zip(self._cost[-1], prices)
+                )
+            )
+
+    def __len__(self) -> int:
+        """Number of scenarios."""
+        return self._count
+
+    def values_at(self, time: dt.datetime) -> tuple[float, ...] | None:
+        """Prices of every scenario of the slot covering time."""
+        timestamp = time.timestamp()
+        i = self.grid.index_at(timestamp)
+        if i < 0 or timestamp >= self.grid.ends[i]:
+            return None
+        return self._values[i]
+
+    def _prefix(self, timestamp: float, i: int) -> tuple[float, ...]:
+        """Integral of price * hours up to timestamp in slot i, per scenario."""
+        if i < 0:
+            return self._cost[0]
+        hours = (min(timestamp, self.grid.ends[i]) - self.grid.starts[i]) / 3600
+        return tuple(
+            cost + price * hours for cost, price in zip(self._cost[i], self._values[i])
+        )
+
+    def averages(self, start: float, end: float, i: int, j: int) -> list[float]:
+        """Averages of every scenario between timestamps in slot i and slot j.
+
+        The window has to be covered by the grid, as the spans of the grid.
+        """
+        hours = self.grid._prefix(end, j)[1] - self.grid._prefix(start, i)[1]
+        return [
+            (last - first) / hours
+            for first, last in zip(self._prefix(start, i), self._prefix(end, j))
+        ]
+
+
+def forecast_window(
+    scenarios: PriceScenarios,
+    start_time: dt.datetime,
+    end_time: dt.datetime,
+    duration: dt.timedelta,
+    risk: float = 0.0,
+) -> PriceWindow | None:
+    """Get the window with the lowest expected average over all scenarios.
+
+    With risk above 0 the standard deviation over the scenarios times risk
+    is added, preferring windows with known or stable prices. The average
+    of the returned window is the expected average.
+    """
+    best = min(
+        forecast_spans(scenarios, start_time, end_time, duration, risk),
+        key=lambda span: span[0],
+        default=None,
+    )
+    if best is None:
+        return None
+    _, start, end, mean = best
+    grid = scenarios.grid
+    return PriceWindow(grid.to_datetime(start), grid.to_datetime(end), mean)
+
+
+def forecast_spans(
+    scenarios: PriceScenarios,
+    start_time: dt.datetime,
+    end_time: dt.datetime,
+    duration: dt.timedelta,
+    risk: float = 0.0,
+) -> Iterator[tuple[float, float, float, float]]:
+    """Get (score, start, end, expected average) of windows over the scenarios."""
+    for start, end, i, j, mean in scenarios.grid.spans(start_time, end_time, duration):
+        score = mean
+        if risk:
+            averages = scenarios.averages(start, end, i, j)
+            score += risk * math.sqrt(
+                sum((average - mean) ** 2 for average in averages) / len(averages)
+            )
+        yield score, start, end, mean
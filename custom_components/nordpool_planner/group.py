@@ -0,0 +1,163 @@
+"""Joint scheduling of several appliances under a shared power limit."""
+
+from __future__ import annotations
+
+# Tolerance for hours and power comparisons
+_EPSILON = 1e-9
+
+
+class GroupDemand:
+    """Runtime hours needed at a power within a range of slots."""
+
+    def __init__(self, power: float, hours: float, first: int, last: int) -> None:
+        """Initialize demand of hours in slots first to (not including) last."""
+        self.power = power
+        self.hours = hours
+        self.first = first
+        self.last = last
+
+    def __repr__(self) -> str:
+        """Get string representation for debugging."""
+        return (
+            type(self).__name__
+            + f" (power={self.power} hours={self.hours}"
+            + f" slots={self.first}-{self.last})"
+        )
+
+
+class GroupSchedule:
+    """Slots and hours used per demand, with the resulting load per slot."""
+
+    def __init__(
+        self,
+        prices: list[float],
+        used: list[dict[int, float]],
+        missing: list[float],
+        load: list[float],
+        cost: float,
+    ) -> None:
+        """Initialize schedule."""
+        self._prices = prices
+        self.used = used
+        self.missing = missing
+        self.load = load
+        self.cost = cost
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "cost": self.cost,
+            "peak_load": max(self.load, default=0.0),
+            "missing": self.missing,
+        }
+
+    def slots(self, demand: int) -> list[tuple[int, float]]:
+        """Get (slot, hours) used by demand in time order."""
+        return sorted(self.used[demand].items())
+
+
+def schedule_group(
+    prices: list[float],
+    hours: list[float],
+    power_limit: float,
+    demands: list[GroupDemand],
+) -> GroupSchedule:
+    """Place runtime of all demands in cheap slots without exceeding power limit.
+
+    Greedy with repair: demands are placed one by one, the least flexible
+    (fewest spare hours in its range) and most powerful first, each in its
+    cheapest slots with power left. If a demand cannot be covered, slots
+    blocked by the limit are freed by moving another demand from them to
+    another slot in that demand's range, repeatedly choosing the move that
+    adds the least cost. A slot counts as loaded with the full power of a
+    demand using any part of it.
+    """
+    load = [0.0] * len(prices)
+    used: list[dict[int, float]] = [{} for _ in demands]
+    missing = [0.0] * len(demands)
+
+    def slack(k: int) -> float:
+        demand = demands[k]
+        return sum(hours[demand.first : demand.last]) - demand.hours
+
+    for k in sorted(range(len(demands)), key=lambda k: (slack(k), -demands[k].power)):
+        demand = demands[k]
+        remaining = demand.hours
+        blocked = []
+        for s in sorted(range(demand.first, demand.last), key=lambda s: prices[s]):
+            if remaining <= _EPSILON:
+                break
+            if load[s] + demand.power > power_limit + _EPSILON:
+                blocked.append(s)
+                continue
+            remaining -= _use(load, used[k], s, min(hours[s], remaining), demand.power)
+        while remaining > _EPSILON and (
+            move := _best_move(
+                blocked, k, remaining, prices, hours, power_limit, demands, load, used
+            )
+        ):
+            s, j, t = move
+            blocked.remove(s)
+            _use(load, used[j], t, used[j].pop(s), demands[j].power)
+            load[s] -= demands[j].power
+            take = min(hours[s], remaining)
+            remaining -= _use(load, used[k], s, take, demand.power)
+        missing[k] = max(0.0, remaining)
+
+    cost = sum(
+        prices[s] * demands[k].power * h
+        for k in range(len(demands))
+        for s, h in used[k].items()
+    )
+    return GroupSchedule(prices, used, missing, load, cost)
+
+
+def _use(
+    load: list[float], used: dict[int, float], slot: int, hours: float, power: float
+) -> float:
+    """Let a demand use hours of slot, returns the hours."""
+    load[slot] += power
+    used[slot] = hours
+    return hours
+
+
+def _best_move(
+    blocked: list[int],
+    k: int,
+    remaining: float,
+    prices: list[float],
+    hours: list[float],
+    power_limit: float,
+    demands: list[GroupDemand],
+    load: list[float],
+    used: list[dict[int, float]],
+) -> tuple[int, int, int] | None:
+    """Find the cheapest move of another demand out of a slot blocked for k.
+
+    Returns (slot, demand, new slot) of the move that adds the least cost,
+    counting the price demand k pays for the remaining hours it takes in the
+    freed slot, None if no move fits.
+    """
+    power = demands[k].power
+    best = None
+    for slot in blocked:
+        for j, other in enumerate(demands):
+            if j == k or slot not in used[j]:
+                continue
+            if load[slot] - other.power + power > power_limit + _EPSILON:
+                continue
+            needed = used[j][slot]
+            for t in range(other.first, other.last):
+                if (
+                    t == slot
+                    or t in used[j]
+                    or hours[t] + _EPSILON < needed
+                    or load[t] + other.power > power_limit + _EPSILON
+                ):
+                    continue
+                delta = (prices[t] - prices[slot]) * other.power * needed
+                take = min(hours[slot], remaining)
+                delta += prices[slot] * power * take
+                if best is None or delta < best[0]:
+                    best = (delta, slot, j, t)
+    return best[1:] if best is not None else None
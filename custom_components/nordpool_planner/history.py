@@ -0,0 +1,238 @@
+"""Compact on-disk history of the price slots executed by a planner.
+
+Every price slot that has passed is one fixed size binary record of slot
+start (epoch seconds), price and hours the low cost output was on, appended
+in time order. Compaction drops records older than the retention and
+rewrites the file, reading a range is a binary search on slot start in a
+memory mapping of the file.
+
+Example, per day cost, runtime and baseline of a history file:
+
+    python -m custom_components.nordpool_planner.history \\
+        config/.storage/nordpool_planner_history/<entry id>.bin --days 31
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections.abc import Sequence
+import datetime as dt
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+
+# Slot start, price, hours on
+RECORD = struct.Struct("<qdd")
+
+
+class _Starts(Sequence):
+    """Slot starts of packed records, unpacked on access for binary search."""
+
+    def __init__(self, data: bytes | memoryview | mmap.mmap) -> None:
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._data) // RECORD.size
+
+    def __getitem__(self, i):
+        return RECORD.unpack_from(self._data, i * RECORD.size)[0]
+
+
+def _bisect(starts: _Starts, timestamp: float) -> int:
+    """Index of first record starting at or after timestamp."""
+    lo, hi = 0, len(starts)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if starts[mid] < timestamp:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class PlanHistory:
+    """Append-only history file of one planner.
+
+    Records are buffered by `append` (in the event loop) and written by
+    `flush`, which also compacts once a day. `flush`, `compact` and `read`
+    do file I/O and shall run in an executor.
+    """
+
+    def __init__(self, path: str, retention_days: int) -> None:
+        """Initialize history stored in file at path."""
+        self.path = path
+        self.retention_days = retention_days
+        self._pending: list[tuple[int, float, float]] = []
+        self._lock = threading.Lock()
+        self._compacted: dt.date | None = None
+
+    def __len__(self) -> int:
+        """Number of records not written yet."""
+        return len(self._pending)
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "path": self.path,
+            "retention_days": self.retention_days,
+            "pending": len(self._pending),
+            "compacted": self._compacted,
+        }
+
+    def append(self, start: float, price: float, hours: float) -> None:
+        """Add record of a passed slot, written on next flush."""
+        self._pending.append((int(start), price, hours))
+
+    def flush(self, now: dt.datetime | None = None) -> None:
+        """Write pending records, and compact if not done yet on the day of now.
+
+        Records at or before the last written slot are dropped, so the file
+        stays in time order e.g. after a restart within a slot. If writing
+        fails the records are kept pending for the next flush.
+        """
+        with self._lock:
+            records, self._pending = self._pending, []
+            if records:
+                try:
+                    self._write(records)
+                except OSError:
+                    # In place, records may be appended meanwhile
+                    self._pending[:0] = records
+                    raise
+            if now is not None and self._compacted != now.date():
+                self._compact(now)
+                self._compacted = now.date()
+
+    def _write(self, records: list[tuple[int, float, float]]) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "ab+") as file:
+            last = None
+            if file.tell() >= RECORD.size:
+                file.seek(-RECORD.size, os.SEEK_END)
+                last = RECORD.unpack(file.read(RECORD.size))[0]
+            file.write(
+                b"".join(
+                    RECORD.pack(*record)
+                    for record in records
+                    if last is None or record[0] > last
+                )
+            )
+
+    def compact(self, now: dt.datetime) -> None:
+        """Drop records older than retention, keeping one record per slot."""
+        with self._lock:
+            self._compact(now)
+            self._compacted = now.date()
+
+    def _compact(self, now: dt.datetime) -> None:
+        data = self._read_file()
+        if not data:
+            return
+        cutoff = (now - dt.timedelta(days=self.retention_days)).timestamp()
+        records = {
+            record[0]: record
+            for record in RECORD.iter_unpack(data)
+            if record[0] >= cutoff
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(
+                b"".join(RECORD.pack(*records[start]) for start in sorted(records))
+            )
+        os.replace(tmp_path, self.path)
+
+    def _read_file(self) -> bytes:
+        try:
+            with open(self.path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return b""
+        return data[: len(data) - len(data) % RECORD.size]
+
+    def read(
+        self, start: dt.datetime, end: dt.datetime
+    ) -> list[tuple[int, float, float]]:
+        """Get (slot start, price, hours on) of slots starting in range.
+
+        The file is memory mapped and only the records in range are read.
+        """
+        with self._lock:
+            records = self._read_range(start.timestamp(), end.timestamp())
+        written = records[-1][0] if records else -1
+        records.extend(
+            record
+            for record in list(self._pending)
+            if written < record[0] and start.timestamp() <= record[0] < end.timestamp()
+        )
+        return records
+
+    def _read_range(self, start: float, end: float) -> list[tuple[int, float, float]]:
+        try:
+            with open(self.path, "rb") as file:
+                if os.fstat(file.fileno()).st_size < RECORD.size:
+                    return []
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    starts = _Starts(data)
+                    first = _bisect(starts, start)
+                    last = max(first, _bisect(starts, end))
+                    return list(
+                        RECORD.iter_unpack(
+                            data[first * RECORD.size : last * RECORD.size]
+                        )
+                    )
+        except FileNotFoundError:
+            return []
+
+    def daily(self, start: dt.datetime, end: dt.datetime) -> list[dict]:
+        """Get cost, runtime and baseline per day (in time zone of start).
+
+        Cost is price times hours on, per kW of the appliance. Baseline is
+        the same runtime at the average price of the day, the cost of running
+        without planning, and savings the difference.
+        """
+        days: dict[dt.date, list[float]] = {}
+        for slot, price, hours in self.read(start, end):
+            day = dt.datetime.fromtimestamp(slot, start.tzinfo).date()
+            totals = days.setdefault(day, [0.0, 0.0, 0.0, 0])
+            totals[0] += price * hours
+            totals[1] += hours
+            totals[2] += price
+            totals[3] += 1
+        result = []
+        for day, (cost, runtime, prices, slots) in sorted(days.items()):
+            baseline = runtime * prices / slots
+            result.append(
+                {
+                    "date": day.isoformat(),
+                    "cost": cost,
+                    "runtime": runtime,
+                    "baseline": baseline,
+                    "savings": baseline - cost,
+                }
+            )
+        return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Write per day summary of a history file as JSON lines."""
+    parser = argparse.ArgumentParser(
+        description="Per day cost, runtime and baseline of a planner history."
+    )
+    parser.add_argument("file", help="history file")
+    parser.add_argument("--days", type=int, default=31, help="days back from now")
+    options = parser.parse_args(argv)
+
+    end = dt.datetime.now().astimezone()
+    start = (end - dt.timedelta(days=options.days)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    for day in PlanHistory(options.file, options.days).daily(start, end):
+        sys.stdout.write(json.dumps(day) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
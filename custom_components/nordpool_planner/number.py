@@ -7,13 +7,18 @@ import logging
 from homeassistant.components.number import (
     NumberDeviceClass,
     NumberEntityDescription,
+    NumberMode,
     RestoreNumber,
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
     ATTR_UNIT_OF_MEASUREMENT,
+    PERCENTAGE,
     STATE_UNAVAILABLE,
     STATE_UNKNOWN,
+    UnitOfEnergy,
+    UnitOfPower,
+    UnitOfTemperature,
     UnitOfTime,
 )
 from homeassistant.core import HomeAssistant
@@ -21,11 +26,24 @@ from homeassistant.core import HomeAssistant
 from . import NordpoolPlanner, NordpoolPlannerEntity
 from .const import (
     CONF_ACCEPT_COST_ENTITY,
+    CONF_ACCEPT_PERCENTILE_ENTITY,
     CONF_ACCEPT_RATE_ENTITY,
+    CONF_BATTERY_CAPACITY_ENTITY,
+    CONF_CHARGE_POWER_ENTITY,
+    CONF_CO2_WEIGHT_ENTITY,
+    CONF_COMFORT_MAX_ENTITY,
+    CONF_COMFORT_MIN_ENTITY,
+    CONF_DISCHARGE_POWER_ENTITY,
     CONF_DURATION_ENTITY,
+    CONF_EFFICIENCY_ENTITY,
     CONF_END_TIME_ENTITY,
+    CONF_HEATER_POWER_ENTITY,
+    CONF_LOSS_COEFFICIENT_ENTITY,
+    CONF_POWER_ENTITY,
+    CONF_RISK_ENTITY,
     CONF_SEARCH_LENGTH_ENTITY,
     CONF_START_TIME_ENTITY,
+    CONF_THERMAL_CAPACITY_ENTITY,
     DOMAIN,
 )
 
@@ -53,6 +71,13 @@ ACCEPT_RATE_ENTITY_DESCRIPTION = NumberEntityDescription(
     native_max_value=1.0,
     native_step=0.1,
 )
+ACCEPT_PERCENTILE_ENTITY_DESCRIPTION = NumberEntityDescription(
+    key=CONF_ACCEPT_PERCENTILE_ENTITY,
+    native_min_value=0,
+    native_max_value=100,
+    native_step=5,
+    native_unit_of_measurement=PERCENTAGE,
+)
 SEARCH_LENGTH_ENTITY_DESCRIPTION = NumberEntityDescription(
     key=CONF_SEARCH_LENGTH_ENTITY,
     device_class=NumberDeviceClass.DURATION,
@@ -77,6 +102,95 @@ START_TIME_ENTITY_DESCRIPTION = NumberEntityDescription(
     native_step=1,
     native_unit_of_measurement=UnitOfTime.HOURS,
 )
+BATTERY_CAPACITY_ENTITY_DESCRIPTION = NumberEntityDescription(
+    key=CONF_BATTERY_CAPACITY_ENTITY,
+    device_class=NumberDeviceClass.ENERGY_STORAGE,
+    native_min_value=0.5,
+    native_max_value=200.0,
+    native_step=0.5,
+    native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+)
+CHARGE_POWER_ENTITY_DESCRIPTION = NumberEntityDescription(
+    key=CONF_CHARGE_POWER_ENTITY,
+    device_class=NumberDeviceClass.POWER,
+    native_min_value=0.1,
+    native_max_value=50.0,
+    native_step=0.1,
+    native_unit_of_measurement=UnitOfPower.KILO_WATT,
+)
+DISCHARGE_POWER_ENTITY_DESCRIPTION = NumberEntityDescription(
+    key=CONF_DISCHARGE_POWER_ENTITY,
+    device_class=NumberDeviceClass.POWER,
+    native_min_value=0.1,
+    native_max_value=50.0,
+    native_step=0.1,
+    native_unit_of_measurement=UnitOfPower.KILO_WATT,
+)
+EFFICIENCY_ENTITY_DESCRIPTION = NumberEntityDescription(
+    key=CONF_EFFICIENCY_ENTITY,
+    native_min_value=0.5,
+    native_max_value=1.0,
+    native_step=0.01,
+)
+LOSS_COEFFICIENT_ENTITY_DESCRIPTION = NumberEntityDescription(
+    key=CONF_LOSS_COEFFICIENT_ENTITY,
+    native_min_value=0.01,
+    native_max_value=2.0,
+    native_step=0.01,
+    native_unit_of_measurement="kW/°C",
+)
+HEATER_POWER_ENTITY_DESCRIPTION = NumberEntityDescription(
+    key=CONF_HEATER_POWER_ENTITY,
+    device_class=NumberDeviceClass.POWER,
+    native_min_value=0.1,
+    native_max_value=30.0,
+    native_step=0.1,
+    native_unit_of_measurement=UnitOfPower.KILO_WATT,
+)
+THERMAL_CAPACITY_ENTITY_DESCRIPTION = NumberEntityDescription(
+    key=CONF_THERMAL_CAPACITY_ENTITY,
+    native_min_value=0.5,
+    native_max_value=100.0,
+    native_step=0.5,
+    native_unit_of_measurement="kWh/°C",
+)
+COMFORT_MIN_ENTITY_DESCRIPTION = NumberEntityDescription(
+    key=CONF_COMFORT_MIN_ENTITY,
+    device_class=NumberDeviceClass.TEMPERATURE,
+    native_min_value=5.0,
+    native_max_value=30.0,
+    native_step=0.5,
+    native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+)
+COMFORT_MAX_ENTITY_DESCRIPTION = NumberEntityDescription(
+    key=CONF_COMFORT_MAX_ENTITY,
+    device_class=NumberDeviceClass.TEMPERATURE,
+    native_min_value=5.0,
+    native_max_value=30.0,
+    native_step=0.5,
+    native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+)
+CO2_WEIGHT_ENTITY_DESCRIPTION = NumberEntityDescription(
+    key=CONF_CO2_WEIGHT_ENTITY,
+    native_min_value=0.0,
+    native_max_value=1.0,
+    native_step=0.00001,
+    mode=NumberMode.BOX,
+)
+POWER_ENTITY_DESCRIPTION = NumberEntityDescription(
+    key=CONF_POWER_ENTITY,
+    device_class=NumberDeviceClass.POWER,
+    native_min_value=0.1,
+    native_max_value=50.0,
+    native_step=0.1,
+    native_unit_of_measurement=UnitOfPower.KILO_WATT,
+)
+RISK_ENTITY_DESCRIPTION = NumberEntityDescription(
+    key=CONF_RISK_ENTITY,
+    native_min_value=0.0,
+    native_max_value=3.0,
+    native_step=0.1,
+)
 
 
 async def async_setup_entry(
@@ -125,6 +239,15 @@ async def async_setup_entry(
             )
         )
 
+    if config_entry.data.get(CONF_ACCEPT_PERCENTILE_ENTITY):
+        entities.append(
+            NordpoolPlannerNumber(
+                planner,
+                start_val=20,
+                entity_description=ACCEPT_PERCENTILE_ENTITY_DESCRIPTION,
+            )
+        )
+
     if config_entry.data.get(CONF_SEARCH_LENGTH_ENTITY):
         entities.append(
             NordpoolPlannerNumber(
@@ -152,6 +275,114 @@ async def async_setup_entry(
             )
         )
 
+    if config_entry.data.get(CONF_BATTERY_CAPACITY_ENTITY):
+        entities.append(
+            NordpoolPlannerNumber(
+                planner,
+                start_val=10.0,
+                entity_description=BATTERY_CAPACITY_ENTITY_DESCRIPTION,
+            )
+        )
+
+    if config_entry.data.get(CONF_CHARGE_POWER_ENTITY):
+        entities.append(
+            NordpoolPlannerNumber(
+                planner,
+                start_val=3.0,
+                entity_description=CHARGE_POWER_ENTITY_DESCRIPTION,
+            )
+        )
+
+    if config_entry.data.get(CONF_DISCHARGE_POWER_ENTITY):
+        entities.append(
+            NordpoolPlannerNumber(
+                planner,
+                start_val=3.0,
+                entity_description=DISCHARGE_POWER_ENTITY_DESCRIPTION,
+            )
+        )
+
+    if config_entry.data.get(CONF_EFFICIENCY_ENTITY):
+        entities.append(
+            NordpoolPlannerNumber(
+                planner,
+                start_val=0.9,
+                entity_description=EFFICIENCY_ENTITY_DESCRIPTION,
+            )
+        )
+
+    if config_entry.data.get(CONF_LOSS_COEFFICIENT_ENTITY):
+        entities.append(
+            NordpoolPlannerNumber(
+                planner,
+                start_val=0.1,
+                entity_description=LOSS_COEFFICIENT_ENTITY_DESCRIPTION,
+            )
+        )
+
+    if config_entry.data.get(CONF_HEATER_POWER_ENTITY):
+        entities.append(
+            NordpoolPlannerNumber(
+                planner,
+                start_val=3.0,
+                entity_description=HEATER_POWER_ENTITY_DESCRIPTION,
+            )
+        )
+
+    if config_entry.data.get(CONF_THERMAL_CAPACITY_ENTITY):
+        entities.append(
+            NordpoolPlannerNumber(
+                planner,
+                start_val=5.0,
+                entity_description=THERMAL_CAPACITY_ENTITY_DESCRIPTION,
+            )
+        )
+
+    if config_entry.data.get(CONF_COMFORT_MIN_ENTITY):
+        entities.append(
+            NordpoolPlannerNumber(
+                planner,
+                start_val=20.0,
+                entity_description=COMFORT_MIN_ENTITY_DESCRIPTION,
+            )
+        )
+
+    if config_entry.data.get(CONF_COMFORT_MAX_ENTITY):
+        entities.append(
+            NordpoolPlannerNumber(
+                planner,
+                start_val=23.0,
+                entity_description=COMFORT_MAX_ENTITY_DESCRIPTION,
+            )
+        )
+
+    if config_entry.data.get(CONF_CO2_WEIGHT_ENTITY):
+        entities.append(
+            NordpoolPlannerNumber(
+                planner,
+                start_val=0.0,
+                entity_description=CO2_WEIGHT_ENTITY_DESCRIPTION,
+            )
+        )
+
+    if config_entry.data.get(CONF_POWER_ENTITY):
+        entities.append(
+            NordpoolPlannerNumber(
+                planner,
+                start_val=2.0,
+                entity_description=POWER_ENTITY_DESCRIPTION,
+            )
+        )
+
+    if config_entry.data.get(CONF_RISK_ENTITY):
+        entities.append(
+            NordpoolPlannerNumber(
+                planner,
+                start_val=0.0,
+                entity_description=RISK_ENTITY_DESCRIPTION,
+            )
+        )
+
     async_add_entities(entities)
     return True
 
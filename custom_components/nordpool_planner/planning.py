@@ -0,0 +1,326 @@
+"""Planning core of the window planners, free of Home Assistant.
+
+Used by the planner in Home Assistant and by the command line in `cli.py`,
+so plans can be made, benchmarked and profiled on bulk price data.
+"""
+
+from __future__ import annotations
+
+import bisect
+from collections.abc import Hashable, Mapping
+import datetime as dt
+import logging
+
+from .cache import PlanCache
+from .forecast import PriceScenarios, forecast_spans
+from .series import PriceSeries, PriceWindow
+from .stats import RollingPriceStatistics
+from .trace import PlanTrace
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def parse_time(value) -> dt.datetime:
+    """Convert a timestamp as ISO string, datetime or epoch seconds."""
+    if isinstance(value, dt.datetime):
+        return value
+    if isinstance(value, (int, float)):
+        return dt.datetime.fromtimestamp(value, dt.UTC)
+    return dt.datetime.fromisoformat(str(value))
+
+
+def normalize_prices(data: Mapping | list) -> list[dict]:
+    """Get list of dicts with "start", optional "end" and "value" from price data.
+
+    Accepts a list of prices with "start" and "value" (or "time" and "price"),
+    the attributes of a Nordpool or ENTSO-e entity, a state with attributes,
+    or the diagnostics of a planner.
+    """
+    if isinstance(data, Mapping):
+        if planner := data.get("data", {}).get("planner"):
+            data = planner["_prices_entity"]["_np"]
+        if "attributes" in data:
+            data = data["attributes"]
+        if "raw_today" in data:
+            items = list(data.get("raw_today") or [])
+            if data.get("tomorrow_valid", True):
+                items += data.get("raw_tomorrow") or []
+        else:
+            items = data.get("prices") or []
+    else:
+        items = data
+
+    prices = []
+    for item in items:
+        price = {
+            "start": parse_time(item["start"] if "start" in item else item["time"]),
+            "value": item["value"] if "value" in item else item["price"],
+        }
+        if item.get("end") is not None:
+            price["end"] = parse_time(item["end"])
+        prices.append(price)
+    return prices
+
+
+def moving_range(
+    now: dt.datetime, search_length: float
+) -> tuple[dt.datetime, dt.datetime]:
+    """Get search range of a moving planner, from now and search length hours."""
+    return now, now + dt.timedelta(hours=search_length)
+
+
+def static_range(
+    now: dt.datetime, start_hour: int, end_hour: int
+) -> tuple[dt.datetime, dt.datetime]:
+    """Get current or next search range between hours of day of a static planner.
+
+    The range may span over midnight, and starts at now once it has started.
+    """
+    start_time = now.replace(hour=start_hour, minute=0, second=0, microsecond=0)
+    end_time = now.replace(hour=end_hour, minute=0, second=0, microsecond=0)
+    # First ensure end is after start (spans over midnight)
+    if end_time < start_time:
+        # Have not started range yet
+        if end_time < now:
+            end_time += dt.timedelta(days=1)
+        # Started range "yesterday"
+        else:
+            start_time -= dt.timedelta(days=1)
+    # In active range
+    if start_time < now and end_time > now:
+        # Bump up start to now so that prices in the past is not used
+        start_time = now
+    return start_time, end_time
+
+
+def static_duration_left(duration: float, used_hours: float) -> dt.timedelta | None:
+    """Get duration left to plan in range of static planner, None if fulfilled."""
+    if used_hours >= duration:
+        return None
+    return dt.timedelta(hours=duration - used_hours)
+
+
+def _lowest_window(
+    windows: list[PriceWindow],
+    statistics: RollingPriceStatistics,
+    accept_cost: float | None,
+    accept_rate: float | None,
+    accept_percentile: float | None,
+    weight: float,
+) -> tuple[PriceWindow, str]:
+    """Get the lowest (or first accepted) window and the rule that chose it."""
+    reference = statistics.mean
+    accept_percentile_price = (
+        statistics.percentile(accept_percentile) if accept_percentile else None
+    )
+    lowest_cost_window = windows[0]
+    for p in windows:
+        if accept_cost and p.average < accept_cost:
+            _LOGGER.debug("Accept cost fulfilled")
+            return p, "accept_cost"
+        if accept_rate and reference is not None:
+            if reference <= 0:
+                if p.average <= 0:
+                    _LOGGER.debug(
+                        "Accept rate indirectly fulfilled (range average & window average <= 0)"
+                    )
+                    return p, "accept_rate"
+            elif (p.average / reference) <= accept_rate:
+                _LOGGER.debug("Accept rate fulfilled")
+                return p, "accept_rate"
+        if accept_percentile_price is not None and p.average <= accept_percentile_price:
+            _LOGGER.debug("Accept percentile fulfilled")
+            return p, "accept_percentile"
+        if p.score(weight) < lowest_cost_window.score(weight):
+            lowest_cost_window = p
+    return lowest_cost_window, "lowest"
+
+
+def _highest_window(windows: list[PriceWindow], weight: float) -> PriceWindow:
+    """Get the (first) window with the highest score."""
+    highest_cost_window = windows[0]
+    for p in windows:
+        if p.score(weight) > highest_cost_window.score(weight):
+            highest_cost_window = p
+    return highest_cost_window
+
+
+class SlotWindows:
+    """Choice among the windows starting at a slot start after the search start.
+
+    It only depends on the slots the search range covers, not on where in
+    its first slot the range starts, so it is kept in the plan cache and a
+    replan within the same slot only evaluates the window at the start.
+    """
+
+    def __init__(
+        self,
+        windows: list[PriceWindow],
+        statistics: RollingPriceStatistics,
+        accept_cost: float | None,
+        accept_rate: float | None,
+        accept_percentile: float | None,
+        weight: float,
+        forecast: tuple[float, float, float, float] | None,
+    ) -> None:
+        """Initialize from the windows after the first, in time order."""
+        self.count = len(windows)
+        self.lowest: PriceWindow | None = None
+        self.rule: str | None = None
+        self.highest: PriceWindow | None = None
+        self.last_start = windows[-1].start_time if windows else None
+        # Best (score, start, end, expected average) over the scenarios
+        self.forecast = forecast
+        if windows:
+            self.lowest, self.rule = _lowest_window(
+                windows,
+                statistics,
+                accept_cost,
+                accept_rate,
+                accept_percentile,
+                weight,
+            )
+            self.highest = _highest_window(windows, weight)
+
+
+def slot_range(
+    series: PriceSeries,
+    start_time: dt.datetime,
+    end_time: dt.datetime,
+    duration: dt.timedelta,
+    scenarios: PriceScenarios | None = None,
+) -> tuple[int, ...]:
+    """Get the slots of a search range the windows after the first depend on.
+
+    That is the first and last slot start a window may start at, and the
+    slots of the price statistics. It only changes when start, end or end
+    less duration passes a slot start.
+    """
+    start = start_time.timestamp()
+    last = end_time.timestamp() - duration.total_seconds()
+    key = (
+        bisect.bisect_right(series.starts, start),
+        bisect.bisect_right(series.ends, start),
+        bisect.bisect_left(series.starts, end_time.timestamp()),
+        bisect.bisect_right(series.starts, last),
+    )
+    if scenarios:
+        starts = scenarios.grid.starts
+        key += (bisect.bisect_right(starts, start), bisect.bisect_right(starts, last))
+    return key
+
+
+def plan_windows(
+    series: PriceSeries,
+    start_time: dt.datetime,
+    end_time: dt.datetime,
+    duration: dt.timedelta,
+    statistics: RollingPriceStatistics,
+    version=None,
+    accept_cost: float | None = None,
+    accept_rate: float | None = None,
+    accept_percentile: float | None = None,
+    weight: float = 0.0,
+    trace: PlanTrace | None = None,
+    scenarios: PriceScenarios | None = None,
+    risk: float = 0.0,
+    cache: PlanCache | None = None,
+    key: Hashable = None,
+) -> tuple[PriceWindow, PriceWindow] | None:
+    """Find the lowest (or first accepted) and highest cost windows in range.
+
+    Returns None if no window of duration is covered by prices in range.
+    With scenarios of the prices not published yet, and no accept rule
+    fulfilled by the known prices, the lowest window is the one with the
+    lowest expected (risk adjusted) average over the scenarios if it starts
+    after the known prices, waiting for a likely cheaper window.
+
+    With a cache the choice among the windows starting at a slot start is
+    kept under key, which has to identify the prices and all parameters,
+    and the slots of the range, see SlotWindows.
+    """
+    statistics.update(series, version, start_time, end_time)
+    if series.secondary is None:
+        weight = 0.0
+    rules = (statistics, accept_cost, accept_rate, accept_percentile, weight)
+
+    rest = None
+    if cache is not None:
+        key = (key, slot_range(series, start_time, end_time, duration, scenarios))
+        rest = cache.get(key)
+    if rest is None:
+        first_ts = start_time.timestamp()
+        windows = series.windows(start_time, end_time, duration)
+        if windows and windows[0].start_time.timestamp() == first_ts:
+            windows = windows[1:]
+        forecast = None
+        if scenarios:
+            forecast = min(
+                (
+                    span
+                    for span in forecast_spans(
+                        scenarios, start_time, end_time, duration, risk
+                    )
+                    if span[1] != first_ts
+                ),
+                key=lambda span: span[0],
+                default=None,
+            )
+        rest = SlotWindows(windows, *rules, forecast)
+        if cache is not None:
+            cache.put(key, rest)
+    elif trace is not None:
+        trace.cached = True
+
+    first = series.window(start_time, duration)
+    count = rest.count + (first is not None)
+    if trace is not None:
+        trace.windows = count
+    if count == 0:
+        return None
+    _LOGGER.debug(
+        "Processing %s prices_windows found in range %s to %s",
+        count,
+        start_time,
+        end_time,
+    )
+
+    # The window at start comes first in time, it wins accept rules and ties
+    lowest_cost_window, rule = rest.lowest, rest.rule
+    highest_cost_window = rest.highest
+    if first is not None:
+        lowest_cost_window, rule = _lowest_window([first], *rules)
+        if (
+            rule == "lowest"
+            and rest.lowest is not None
+            and (
+                rest.rule != "lowest" or rest.lowest.score(weight) < first.score(weight)
+            )
+        ):
+            lowest_cost_window, rule = rest.lowest, rest.rule
+        if highest_cost_window is None or first.score(
+            weight
+        ) >= highest_cost_window.score(weight):
+            highest_cost_window = first
+
+    if rest.forecast is not None and rule == "lowest":
+        score, start, end, mean = rest.forecast
+        last_start = rest.last_start or first.start_time
+        at_start = next(
+            forecast_spans(scenarios, start_time, end_time, duration, risk), None
+        )
+        if (
+            at_start is None
+            or at_start[1] != start_time.timestamp()
+            or score < at_start[0]
+        ) and scenarios.grid.to_datetime(start) > last_start:
+            lowest_cost_window = PriceWindow(
+                scenarios.grid.to_datetime(start),
+                scenarios.grid.to_datetime(end),
+                mean,
+            )
+            _LOGGER.debug("Forecast window after known prices: %s", lowest_cost_window)
+            rule = "forecast"
+    if trace is not None:
+        trace.rule = rule
+    return lowest_cost_window, highest_cost_window
@@ -0,0 +1,103 @@
+"""Profiling of live planner updates, for diagnosing slow instances."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+import cProfile
+import marshal
+import os
+import pstats
+import time
+from typing import Any
+
+
+class PlanProfiler:
+    """Profile of the next replans of some or all planners.
+
+    Only the updates of the selected planners (all if none selected) are
+    profiled, up to a number of replans. Updates run on the event loop one
+    at a time, an update started within another (e.g. a planner group) is
+    profiled as part of the outer one.
+    """
+
+    def __init__(
+        self, entry_ids: Iterable[str] | None, replans: int, path: str
+    ) -> None:
+        """Initialize profiler of replans of planners, stats written to path."""
+        self.entry_ids = set(entry_ids) if entry_ids else None
+        self.replans = replans
+        self.path = path
+        self.profiled = 0
+        self.elapsed = 0.0
+        # Cancels the timeout of the profile, set by the service
+        self.cancel: Callable[[], None] | None = None
+        self._profile = cProfile.Profile()
+        self._depth = 0
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "entry_ids": sorted(self.entry_ids) if self.entry_ids else None,
+            "replans": self.replans,
+            "profiled": self.profiled,
+            "elapsed": self.elapsed,
+            "path": self.path,
+        }
+
+    @property
+    def done(self) -> bool:
+        """Check if all replans are profiled."""
+        return self.profiled >= self.replans
+
+    def wants(self, entry_id: str) -> bool:
+        """Check if the next update of a planner is to be profiled."""
+        return not self.done and (self.entry_ids is None or entry_id in self.entry_ids)
+
+    def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func(*args) profiled, counted as one replan."""
+        if self._depth:
+            return func(*args)
+        self._depth += 1
+        started = time.perf_counter()
+        self._profile.enable()
+        try:
+            return func(*args)
+        finally:
+            self._profile.disable()
+            self.elapsed += time.perf_counter() - started
+            self.profiled += 1
+            self._depth -= 1
+
+    def stats(self) -> dict:
+        """Get the aggregated stats, in the format of pstats."""
+        self._profile.create_stats()
+        return self._profile.stats
+
+    def write(self, max_bytes: int) -> int:
+        """Write the stats to file, readable by pstats, returns bytes written.
+
+        If larger than max_bytes only the functions of the longest cumulative
+        time are kept, halved until it fits. Not to be run on the event loop.
+        """
+        stats = self.stats()
+        functions = sorted(stats, key=lambda f: stats[f][3], reverse=True)
+        data = marshal.dumps(stats)
+        while len(data) > max_bytes and functions:
+            functions = functions[: len(functions) // 2]
+            data = marshal.dumps({f: stats[f] for f in functions})
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as file:
+            file.write(data)
+        os.replace(tmp, self.path)
+        return len(data)
+
+
+def summary(path: str, count: int = 20) -> list[tuple[str, int, float, float]]:
+    """Get (function, calls, total, cumulative seconds) of the most costly functions."""
+    stats = pstats.Stats(path)
+    rows = [
+        (pstats.func_std_string(func), nc, tt, ct)
+        for func, (_, nc, tt, ct, _) in stats.stats.items()
+    ]
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows[:count]
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import datetime as dt
 import logging
 
 from homeassistant.components.sensor import (
@@ -11,14 +12,32 @@ from homeassistant.components.sensor import (
     SensorEntityDescription,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN, EntityCategory
-from homeassistant.core import HomeAssistant
+from homeassistant.const import (
+    ATTR_UNIT_OF_MEASUREMENT,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
+    EntityCategory,
+    UnitOfEnergy,
+    UnitOfPower,
+)
+from homeassistant.core import Event, EventStateChangedData, HomeAssistant, callback
+from homeassistant.helpers.event import (
+    async_track_state_change_event,
+    async_track_time_change,
+)
+from homeassistant.util import dt as dt_util
 
 from . import NordpoolPlanner, NordpoolPlannerEntity
+from .battery import BatteryAction
+from .cost import CostMeter
 from .const import (
+    CONF_BATTERY_ACTION_ENTITY,
+    CONF_CONSUMPTION_ENTITY,
     CONF_HEALTH_ENTITY,
+    CONF_HEATING_PLAN_ENTITY,
     CONF_HIGH_COST_ENTITY,
     CONF_LOW_COST_ENTITY,
+    CONF_REALIZED_COST_ENTITY,
     CONF_STARTS_AT_ENTITY,
     CONF_USED_HOURS_LOW_ENTITY,
     DOMAIN,
@@ -57,6 +76,31 @@ HEALTH_ENTITY_DESCRIPTION = SensorEntityDescription(
     options=[e.name for e in PlannerStates],
 )
 
+BATTERY_ACTION_ENTITY_DESCRIPTION = SensorEntityDescription(
+    key=CONF_BATTERY_ACTION_ENTITY,
+    device_class=SensorDeviceClass.ENUM,
+    options=[e.value for e in BatteryAction],
+)
+
+HEATING_PLAN_ENTITY_DESCRIPTION = SensorEntityDescription(
+    key=CONF_HEATING_PLAN_ENTITY,
+    device_class=SensorDeviceClass.ENUM,
+    options=["heat", "off"],
+)
+
+REALIZED_COST_ENTITY_DESCRIPTION = SensorEntityDescription(
+    key=CONF_REALIZED_COST_ENTITY,
+    device_class=SensorDeviceClass.MONETARY,
+)
+
+# Factors to kW and kWh of the units of consumption sensors
+POWER_UNITS = {UnitOfPower.WATT: 0.001, UnitOfPower.KILO_WATT: 1.0}
+ENERGY_UNITS = {
+    UnitOfEnergy.WATT_HOUR: 0.001,
+    UnitOfEnergy.KILO_WATT_HOUR: 1.0,
+    UnitOfEnergy.MEGA_WATT_HOUR: 1000.0,
+}
+
 
 async def async_setup_entry(
     hass: HomeAssistant, config_entry: ConfigEntry, async_add_entities
@@ -99,6 +143,39 @@ async def async_setup_entry(
                 )
             )
 
+    if config_entry.data.get(CONF_BATTERY_ACTION_ENTITY):
+        entities.append(
+            NordpoolPlannerBatteryActionSensor(
+                planner,
+                entity_description=BATTERY_ACTION_ENTITY_DESCRIPTION,
+            )
+        )
+
+    if config_entry.data.get(CONF_HEATING_PLAN_ENTITY):
+        entities.append(
+            NordpoolPlannerHeatingPlanSensor(
+                planner,
+                entity_description=HEATING_PLAN_ENTITY_DESCRIPTION,
+            )
+        )
+
+    if config_entry.data.get(CONF_REALIZED_COST_ENTITY):
+        entity_description = REALIZED_COST_ENTITY_DESCRIPTION
+        # Currency of the price unit, e.g. EUR of EUR/kWh
+        if unit_of_measurement := config_entry.options.get(ATTR_UNIT_OF_MEASUREMENT):
+            entity_description = SensorEntityDescription(
+                key=REALIZED_COST_ENTITY_DESCRIPTION.key,
+                device_class=REALIZED_COST_ENTITY_DESCRIPTION.device_class,
+                native_unit_of_measurement=unit_of_measurement.split("/")[0],
+            )
+        entities.append(
+            NordpoolPlannerRealizedCostSensor(
+                planner,
+                entity_description=entity_description,
+                consumption_entity=config_entry.data[CONF_CONSUMPTION_ENTITY],
+            )
+        )
+
     async_add_entities(entities)
     return True
 
@@ -191,16 +268,21 @@ class NordpoolPlannerUsedHoursSensor(NordpoolPlannerSensor, RestoreSensor):
         if (
             (last_state := await self.async_get_last_state()) is not None
             and last_state.state not in (STATE_UNKNOWN, STATE_UNAVAILABLE)
-            and last_state.state.isdigit()
+            and last_state.state.replace(".", "", 1).isdigit()
             # and (extra_data := await self.async_get_last_sensor_data()) is not None
         ):
-            self._planner.low_hours = int(last_state.state)
+            if last_state.state.isdigit():
+                self._planner.set_used_hours(int(last_state.state))
+            else:
+                self._planner.set_used_hours(float(last_state.state))
         else:
-            self._planner.low_hours = 0
+            self._planner.set_used_hours(0)
 
     @property
     def native_value(self):
         """Output state."""
+        if isinstance(self._planner.low_hours, float):
+            return round(self._planner.low_hours, 2)
         return self._planner.low_hours
 
 
@@ -219,3 +301,181 @@ class NordpoolPlannerHealthSensor(NordpoolPlannerSensor, RestoreSensor):
             "running_state": self._planner.planner_status.running_text,
             "config_state": self._planner.planner_status.config_text,
         }
+
+
+class NordpoolPlannerBatteryActionSensor(NordpoolPlannerSensor):
+    """Battery action sensor."""
+
+    _attr_icon = "mdi:home-battery"
+
+    @property
+    def native_value(self):
+        """Output state."""
+        if self._planner.battery_plan is None:
+            return None
+        action = self._planner.battery_plan.action_at(dt_util.now())
+        if action is None:
+            return None
+        return action.value
+
+    @property
+    def extra_state_attributes(self):
+        """Extra state attributes."""
+        if self._planner.battery_plan is None:
+            return {
+                "expected_profit": STATE_UNKNOWN,
+                "current_step": None,
+                "next_step": None,
+                "price_sensor": self._planner.price_sensor_id,
+            }
+        # Only the steps at hand, the full plan is read with the WebSocket API
+        current, following = self._planner.battery_plan.steps_at(dt_util.now())
+        return {
+            "expected_profit": round(self._planner.battery_plan.expected_profit, 3),
+            "current_step": current.as_dict() if current else None,
+            "next_step": following.as_dict() if following else None,
+            "price_sensor": self._planner.price_sensor_id,
+        }
+
+
+class NordpoolPlannerHeatingPlanSensor(NordpoolPlannerSensor):
+    """Heating plan sensor."""
+
+    _attr_icon = "mdi:radiator"
+
+    @property
+    def native_value(self):
+        """Output state."""
+        if self._planner.thermal_plan is None:
+            return None
+        heat = self._planner.thermal_plan.heat_at(dt_util.now())
+        if heat is None:
+            return None
+        return "heat" if heat else "off"
+
+    @property
+    def extra_state_attributes(self):
+        """Extra state attributes."""
+        if self._planner.thermal_plan is None:
+            return {
+                "expected_cost": STATE_UNKNOWN,
+                "current_step": None,
+                "next_step": None,
+                "price_sensor": self._planner.price_sensor_id,
+            }
+        # Only the steps at hand, the full plan is read with the WebSocket API
+        current, following = self._planner.thermal_plan.steps_at(dt_util.now())
+        return {
+            "expected_cost": round(self._planner.thermal_plan.expected_cost, 3),
+            "current_step": current.as_dict() if current else None,
+            "next_step": following.as_dict() if following else None,
+            "price_sensor": self._planner.price_sensor_id,
+        }
+
+
+class NordpoolPlannerRealizedCostSensor(NordpoolPlannerSensor, RestoreSensor):
+    """Realized cost today of the consumption of a power or energy sensor."""
+
+    _attr_icon = "mdi:cash"
+
+    def __init__(
+        self,
+        planner,
+        entity_description: SensorEntityDescription,
+        consumption_entity: str,
+    ) -> None:
+        """Initialize the entity."""
+        super().__init__(planner, entity_description)
+        self._consumption_entity = consumption_entity
+        self._meter = CostMeter()
+
+    async def async_added_to_hass(self) -> None:
+        """Restore cost of today and start tracking consumption."""
+        await super().async_added_to_hass()
+        if (
+            last_state := await self.async_get_last_state()
+        ) is not None and last_state.attributes.get(
+            "date"
+        ) == dt_util.now().date().isoformat():
+            try:
+                self._meter.restore(
+                    dt_util.now().date(),
+                    float(last_state.attributes["energy"]),
+                    float(last_state.state),
+                )
+            except (KeyError, TypeError, ValueError):
+                _LOGGER.debug("Could not restore realized cost of %s", self.unique_id)
+
+        self.async_on_remove(
+            async_track_state_change_event(
+                self.hass, [self._consumption_entity], self._async_consumption_changed
+            )
+        )
+        self.async_on_remove(
+            async_track_time_change(
+                self.hass, self._async_midnight, hour=0, minute=0, second=0
+            )
+        )
+        if (state := self.hass.states.get(self._consumption_entity)) is not None:
+            self._consume(state, dt_util.now())
+
+    @callback
+    def _async_consumption_changed(self, event: Event[EventStateChangedData]) -> None:
+        """Integrate consumption up to the new state."""
+        if (state := event.data["new_state"]) is None:
+            return
+        self._consume(state, dt_util.as_local(state.last_updated))
+        self.async_write_ha_state()
+
+    @callback
+    def _async_midnight(self, now: dt.datetime) -> None:
+        """Start a new day."""
+        self._meter.advance(self._planner.prices_series, now)
+        self.async_write_ha_state()
+
+    def _consume(self, state, time: dt.datetime) -> None:
+        """Report the power or energy of state to the meter."""
+        unit = state.attributes.get(ATTR_UNIT_OF_MEASUREMENT)
+        try:
+            value = float(state.state)
+        except ValueError:
+            value = None
+        series = self._planner.prices_series
+        if unit in ENERGY_UNITS:
+            self._meter.set_reading(
+                series, time, value * ENERGY_UNITS[unit] if value is not None else None
+            )
+        else:
+            factor = POWER_UNITS.get(unit, 1.0)
+            self._meter.set_power(
+                series, time, value * factor if value is not None else None
+            )
+
+    def update_callback(self) -> None:
+        """Integrate up to now with the prices of the planner update."""
+        self._meter.advance(self._planner.prices_series, dt_util.now())
+        super().update_callback()
+
+    @property
+    def native_value(self):
+        """Output state."""
+        if self._meter.day is None:
+            return None
+        return round(self._meter.cost, 4)
+
+    @property
+    def extra_state_attributes(self):
+        """Extra state attributes."""
+        meter = self._meter
+
+        def rounded(value):
+            return round(value, 4) if value is not None else None
+
+        return {
+            "date": meter.day.isoformat() if meter.day else None,
+            "energy": rounded(meter.energy),
+            "average_price": rounded(meter.average_price),
+            "day_average_price": rounded(meter.day_average),
+            "savings": rounded(meter.savings),
+            "consumption_sensor": self._consumption_entity,
+        }
@@ -0,0 +1,313 @@
+"""Compact price series with prefix sums for time-weighted window averages."""
+
+from __future__ import annotations
+
+import bisect
+from collections.abc import Iterator
+import copy
+import datetime as dt
+
+# Tolerance in seconds when checking that a window is fully covered by prices
+_COVER_TOLERANCE = 1.0
+
+
+class PriceWindow:
+    """A time window with its time-weighted average price."""
+
+    def __init__(
+        self,
+        start: dt.datetime,
+        end: dt.datetime,
+        average: float,
+        secondary: float | None = None,
+    ) -> None:
+        """Initialize price window."""
+        self._start = start
+        self._end = end
+        self._average = average
+        self._secondary = secondary
+
+    def __str__(self) -> str:
+        """Get string representation of class."""
+        return f"start_time={self._start.strftime("%Y-%m-%d %H:%M")} end_time={self._end.strftime("%Y-%m-%d %H:%M")} average={self._average}"
+
+    def __repr__(self) -> str:
+        """Get string representation for debugging."""
+        return type(self).__name__ + f" ({self.__str__()})"
+
+    @property
+    def average(self) -> float:
+        """The time-weighted average price of the window."""
+        return self._average
+
+    @property
+    def secondary(self) -> float | None:
+        """The time-weighted average of the second series, if any."""
+        return self._secondary
+
+    def score(self, weight: float) -> float:
+        """Blended objective, average price plus weight times second series."""
+        if weight and self._secondary is not None:
+            return self._average + weight * self._secondary
+        return self._average
+
+    @property
+    def start_time(self) -> dt.datetime:
+        """The start time of the window."""
+        return self._start
+
+    @property
+    def end_time(self) -> dt.datetime:
+        """The end time of the window."""
+        return self._end
+
+
+class PriceSeries:
+    """Prices as parallel lists of epoch start, end and value.
+
+    Prefix sums of price * hours and of covered hours at every slot start
+    give the integral up to any point in time with one multiply-add, so the
+    time-weighted average of a window, including partially elapsed slots,
+    is O(1) once the slots at the window edges are known.
+
+    A second series aligned to the same slots, e.g. CO2 intensity, can be
+    added with its own prefix sums and is then averaged in the same pass.
+    """
+
+    def __init__(self, prices: list[dict]) -> None:
+        """Initialize from list of dicts with "start", optional "end" and "value"."""
+        self.tzinfo = None
+        self.secondary: list[float | None] | None = None
+        self.starts: list[float] = []
+        self.ends: list[float] = []
+        self.values: list[float] = []
+        for i, p in enumerate(prices):
+            if p.get("value") is None:
+                continue
+            start = p["start"]
+            if (end := p.get("end")) is None:
+                if i + 1 < len(prices):
+                    end = prices[i + 1]["start"]
+                elif i > 0:
+                    end = start + (start - prices[i - 1]["start"])
+                else:
+                    end = start + dt.timedelta(hours=1)
+            if self.tzinfo is None:
+                self.tzinfo = start.tzinfo
+            self.starts.append(start.timestamp())
+            self.ends.append(end.timestamp())
+            self.values.append(float(p["value"]))
+
+        self._cost = [0.0]
+        self._hours = [0.0]
+        for start, end, value in zip(self.starts, self.ends, self.values):
+            hours = (end - start) / 3600
+            self._cost.append(self._cost[-1] + value * hours)
+            self._hours.append(self._hours[-1] + hours)
+
+    def __len__(self) -> int:
+        """Number of slots in series."""
+        return len(self.values)
+
+    @property
+    def resolution(self) -> float:
+        """Length in seconds of the shortest slot, 0 if empty."""
+        return min(
+            (end - start for start, end in zip(self.starts, self.ends)), default=0.0
+        )
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "slots": len(self),
+            "start": self.to_datetime(self.starts[0]) if self.starts else None,
+            "end": self.to_datetime(self.ends[-1]) if self.ends else None,
+        }
+
+    def to_datetime(self, timestamp: float) -> dt.datetime:
+        """Convert epoch timestamp to datetime in the time zone of the series."""
+        return dt.datetime.fromtimestamp(timestamp, self.tzinfo)
+
+    def index_at(self, timestamp: float) -> int:
+        """Index of the last slot starting at or before timestamp, -1 if none."""
+        return bisect.bisect_right(self.starts, timestamp) - 1
+
+    def slot_start(self, time: dt.datetime) -> float:
+        """Epoch start of the slot covering time, time itself if before series."""
+        timestamp = time.timestamp()
+        i = self.index_at(timestamp)
+        return self.starts[i] if i >= 0 else timestamp
+
+    def _prefix(self, timestamp: float, i: int) -> tuple[float, float]:
+        """Integral of (price * hours, hours) from series start to timestamp in slot i."""
+        if i < 0:
+            return 0.0, 0.0
+        hours = (min(timestamp, self.ends[i]) - self.starts[i]) / 3600
+        return (
+            self._cost[i] + self.values[i] * hours,
+            self._hours[i] + hours,
+        )
+
+    def with_secondary(self, values: list[float | None]) -> PriceSeries:
+        """Get the series with a second value per slot, None where unknown.
+
+        Slots and price prefix sums are shared with this series, not copied.
+        """
+        series = copy.copy(self)
+        series.secondary = values
+        series._secondary_cost = [0.0]
+        series._secondary_hours = [0.0]
+        for start, end, value in zip(self.starts, self.ends, values):
+            hours = (end - start) / 3600 if value is not None else 0.0
+            series._secondary_cost.append(
+                series._secondary_cost[-1] + (value or 0.0) * hours
+            )
+            series._secondary_hours.append(series._secondary_hours[-1] + hours)
+        return series
+
+    def aligned(self, other: PriceSeries) -> list[float | None]:
+        """Time-weighted average of other series over each slot of this series."""
+        return [
+            other._window_average(
+                start, end, other.index_at(start), other.index_at(end)
+            )
+            for start, end in zip(self.starts, self.ends)
+        ]
+
+    def _secondary_average(
+        self, start: float, end: float, i: int, j: int
+    ) -> float | None:
+        """Time-weighted average of second series over covered part of window."""
+        totals = []
+        for timestamp, k in ((start, i), (end, j)):
+            if k < 0:
+                totals.append((0.0, 0.0))
+                continue
+            hours = 0.0
+            if self.secondary[k] is not None:
+                hours = (min(timestamp, self.ends[k]) - self.starts[k]) / 3600
+            totals.append(
+                (
+                    self._secondary_cost[k] + (self.secondary[k] or 0.0) * hours,
+                    self._secondary_hours[k] + hours,
+                )
+            )
+        hours = totals[1][1] - totals[0][1]
+        if hours <= 0:
+            return None
+        return (totals[1][0] - totals[0][0]) / hours
+
+    def _window_average(self, start: float, end: float, i: int, j: int) -> float | None:
+        """Time-weighted average between timestamps in slot i and slot j.
+
+        Returns None if the window is not fully covered by prices.
+        """
+        cost_start, hours_start = self._prefix(start, i)
+        cost_end, hours_end = self._prefix(end, j)
+        hours = hours_end - hours_start
+        if hours <= 0 or (end - start) / 3600 - hours > _COVER_TOLERANCE / 3600:
+            return None
+        return (cost_end - cost_start) / hours
+
+    def average(self, start: dt.datetime, end: dt.datetime) -> float | None:
+        """Time-weighted average price between start and end."""
+        start_ts = start.timestamp()
+        end_ts = end.timestamp()
+        return self._window_average(
+            start_ts, end_ts, self.index_at(start_ts), self.index_at(end_ts)
+        )
+
+    def spans(
+        self,
+        start: dt.datetime,
+        end: dt.datetime,
+        duration: dt.timedelta,
+    ) -> Iterator[tuple[float, float, int, int, float]]:
+        """Get (start, end, start slot, end slot, average) of windows of duration.
+
+        Windows start at start or a slot start after it and have to end
+        before end, except the first one that is always evaluated. Windows
+        not fully covered by prices are left out.
+        """
+        length = duration.total_seconds()
+        if length <= 0 or not self.starts:
+            return
+        first = start.timestamp()
+        last = end.timestamp()
+
+        i = self.index_at(first)
+        j = self.index_at(first + length)
+        candidate = first
+        while True:
+            window_end = candidate + length
+            if candidate != first and window_end > last:
+                break
+            while j + 1 < len(self.starts) and self.starts[j + 1] <= window_end:
+                j += 1
+            average = self._window_average(candidate, window_end, i, j)
+            if average is not None:
+                yield candidate, window_end, i, j, average
+            elif window_end > self.ends[-1]:
+                break
+            i += 1
+            if i >= len(self.starts):
+                break
+            candidate = self.starts[i]
+
+    def _window(self, start: float, end: float, i: int, j: int, average: float):
+        """Get the price window of a span."""
+        return PriceWindow(
+            self.to_datetime(start),
+            self.to_datetime(end),
+            average,
+            self._secondary_average(start, end, i, j)
+            if self.secondary is not None
+            else None,
+        )
+
+    def window(self, start: dt.datetime, duration: dt.timedelta) -> PriceWindow | None:
+        """Get the window of duration at start, None if not covered by prices."""
+        length = duration.total_seconds()
+        if length <= 0 or not self.starts:
+            return None
+        first = start.timestamp()
+        i, j = self.index_at(first), self.index_at(first + length)
+        if (average := self._window_average(first, first + length, i, j)) is None:
+            return None
+        return self._window(first, first + length, i, j, average)
+
+    def windows(
+        self,
+        start: dt.datetime,
+        end: dt.datetime,
+        duration: dt.timedelta,
+    ) -> list[PriceWindow]:
+        """Get all windows of duration starting at start or a slot start after it.
+
+        Windows have to end before end, except the first one that is always
+        evaluated. Windows not fully covered by prices are left out.
+        """
+        return [
+            self._window(window_start, window_end, i, j, average)
+            for window_start, window_end, i, j, average in self.spans(
+                start, end, duration
+            )
+        ]
+
+    def slots(self, after: dt.datetime) -> list[tuple[dt.datetime, dt.datetime, float]]:
+        """Get (start, end, price) of slots that has not ended at after."""
+        i = bisect.bisect_right(self.ends, after.timestamp())
+        return [
+            (self.to_datetime(start), self.to_datetime(end), value)
+            for start, end, value in zip(
+                self.starts[i:], self.ends[i:], self.values[i:]
+            )
+        ]
+
+    def value_at(self, time: dt.datetime) -> float | None:
+        """Price of the slot covering time."""
+        timestamp = time.timestamp()
+        i = self.index_at(timestamp)
+        if i < 0 or timestamp >= self.ends[i]:
+            return None
+        return self.values[i]
@@ -0,0 +1,370 @@
+"""Adapters reading prices from the different source formats."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Mapping
+import datetime as dt
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant, State
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    CONF_PRICES_END_FIELD,
+    CONF_PRICES_PATH,
+    CONF_PRICES_START_FIELD,
+    CONF_PRICES_VALUE_FIELD,
+    DOMAIN,
+    NAME_ARCHIVE_READER,
+    NAME_FILE_READER,
+    PATH_ARCHIVE_READER,
+    PATH_FILE_READER,
+    SIGNAL_SOURCE_REFRESHED,
+)
+from .archive import PriceArchive
+from .helpers import get_np_from_file
+from .series import PriceSeries
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PriceSourceAdapter:
+    """Interface for a price source format.
+
+    An adapter is chosen once per source entity by `detect_adapter` and then
+    used for every state of it, so the format is never sniffed again. Other
+    formats are added by subclassing and `register_adapter`.
+    """
+
+    name = "generic"
+
+    def __init__(self, entity_id: str) -> None:
+        """Initialize adapter for entity."""
+        self.entity_id = entity_id
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {"name": self.name, "entity_id": self.entity_id}
+
+    @classmethod
+    def detect(cls, state: State) -> bool:
+        """Check if state is of the format of this adapter."""
+        raise NotImplementedError
+
+    def get_state(self, hass: HomeAssistant) -> State | None:
+        """Get the current state of the source."""
+        return hass.states.get(self.entity_id)
+
+    def has_prices(self, state: State) -> bool:
+        """Check if state contains prices for today."""
+        raise NotImplementedError
+
+    def prices(self, state: State) -> list[dict]:
+        """Get list of dicts with "start", optional "end" and "value"."""
+        raise NotImplementedError
+
+    def series(self, state: State) -> PriceSeries:
+        """Get the normalized price series of state."""
+        return PriceSeries(self.prices(state))
+
+    def current_price(self, state: State) -> float | None:
+        """Get the current price of state, if provided by the source."""
+        return None
+
+
+class NordpoolAdapter(PriceSourceAdapter):
+    """Nordpool custom integration, prices in raw_today and raw_tomorrow."""
+
+    name = "nordpool"
+
+    @classmethod
+    def detect(cls, state: State) -> bool:
+        """Check if state is of the format of this adapter."""
+        return "raw_today" in state.attributes
+
+    def has_prices(self, state: State) -> bool:
+        """Check if state contains prices for today."""
+        return "today" in state.attributes
+
+    def prices(self, state: State) -> list[dict]:
+        """Get list of dicts with "start", optional "end" and "value"."""
+        prices = state.attributes.get("raw_today") or []
+        if state.attributes.get("tomorrow_valid"):
+            # Not in-place, would extend the list in the source state
+            prices = prices + (state.attributes.get("raw_tomorrow") or [])
+        return prices
+
+    def current_price(self, state: State) -> float | None:
+        """Get the current price of state."""
+        return state.attributes.get("current_price")
+
+
+class EntsoeAdapter(PriceSourceAdapter):
+    """ENTSO-e integration, prices as time and price in the prices attribute."""
+
+    name = "entsoe"
+
+    @classmethod
+    def detect(cls, state: State) -> bool:
+        """Check if state is of the format of this adapter."""
+        return "prices_today" in state.attributes and "prices" in state.attributes
+
+    def has_prices(self, state: State) -> bool:
+        """Check if state contains prices for today."""
+        return "prices_today" in state.attributes
+
+    def prices(self, state: State) -> list[dict]:
+        """Get list of dicts with "start", optional "end" and "value"."""
+        return [
+            {"start": dt_util.parse_datetime(p["time"]), "value": p["price"]}
+            for p in state.attributes.get("prices") or []
+        ]
+
+
+class FileAdapter(NordpoolAdapter):
+    """Nordpool format read from a diagnostics file, for testing."""
+
+    name = "file"
+
+    def get_state(self, hass: HomeAssistant) -> State | None:
+        """Get the state from file."""
+        return get_np_from_file(PATH_FILE_READER)
+
+
+class ArchiveAdapter(PriceSourceAdapter):
+    """Prices of today and tomorrow from the local price archive.
+
+    The entity id is "archive_reader", or "archive_reader:<area>" for the
+    archive of an area. The state is only rebuilt when the day changes, so
+    planners see it as one version a day. The archive is opened and read in
+    the executor, when done SIGNAL_SOURCE_REFRESHED is sent for the entity.
+    """
+
+    name = "archive"
+
+    def __init__(self, entity_id: str, path: str = PATH_ARCHIVE_READER) -> None:
+        """Initialize adapter for entity, the archive is opened on first read."""
+        super().__init__(entity_id)
+        self.area = entity_id.partition(":")[2] or None
+        self.path = path
+        self.archive: PriceArchive | None = None
+        self._state: State | None = None
+        self._day: dt.date | None = None
+        self._refresh: asyncio.Task | None = None
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "name": self.name,
+            "entity_id": self.entity_id,
+            "path": self.path,
+            "archive": self.archive,
+        }
+
+    @classmethod
+    def detect(cls, state: State) -> bool:
+        """Never detected, has to be selected."""
+        return False
+
+    def get_state(self, hass: HomeAssistant) -> State | None:
+        """Get the state with the archived prices of today and tomorrow.
+
+        The state of the previous read is returned (None before the first),
+        a new read is started in the background when the day has changed.
+        """
+        now = dt_util.now()
+        if self._day != now.date() and self._refresh is None:
+            self._refresh = hass.async_create_background_task(
+                self._async_refresh(hass, now),
+                name=f"{DOMAIN} {self.entity_id} refresh",
+            )
+        return self._state
+
+    async def _async_refresh(self, hass: HomeAssistant, now: dt.datetime) -> None:
+        """Read the prices of the day of now in the executor."""
+        try:
+            self.archive, prices = await hass.async_add_executor_job(
+                self._read, dt_util.start_of_local_day(now)
+            )
+        except OSError as e:
+            _LOGGER.warning("Could not read price archive %s: %s", self.path, e)
+            return
+        finally:
+            self._refresh = None
+        self._state = State(
+            f"sensor.{DOMAIN}_archive",
+            str(len(prices)),
+            {"prices": prices},
+        )
+        self._day = now.date()
+        async_dispatcher_send(hass, SIGNAL_SOURCE_REFRESHED.format(self.entity_id))
+
+    def _read(self, start: dt.datetime) -> tuple[PriceArchive, list[dict]]:
+        """Open the archive and read two days of prices from start, blocking."""
+        archive = PriceArchive(self.path, self.area)
+        return archive, archive.prices(start, start + dt.timedelta(days=2))
+
+    def has_prices(self, state: State) -> bool:
+        """Check if state contains prices."""
+        return len(self.prices(state)) > 0
+
+    def prices(self, state: State) -> list[dict]:
+        """Get list of dicts with "start", optional "end" and "value"."""
+        return state.attributes.get("prices") or []
+
+
+_ADAPTERS: list[type[PriceSourceAdapter]] = [NordpoolAdapter, EntsoeAdapter]
+
+
+def register_adapter(adapter: type[PriceSourceAdapter]) -> None:
+    """Register adapter for a new source format, tried before the built-in."""
+    if adapter not in _ADAPTERS:
+        _ADAPTERS.insert(0, adapter)
+
+
+def detect_adapter(entity_id: str, state: State | None) -> PriceSourceAdapter | None:
+    """Get the adapter for the format of an entity, None if unknown."""
+    if entity_id == NAME_FILE_READER:
+        return FileAdapter(entity_id)
+    if entity_id.partition(":")[0] == NAME_ARCHIVE_READER:
+        return ArchiveAdapter(entity_id)
+    if state is None:
+        return None
+    for adapter in _ADAPTERS:
+        if adapter.detect(state):
+            _LOGGER.debug("Detected %s format for %s", adapter.name, entity_id)
+            return adapter(entity_id)
+    return None
+
+
+def _to_datetime(value: Any) -> dt.datetime:
+    """Convert a timestamp as string, datetime or epoch seconds."""
+    if isinstance(value, dt.datetime):
+        return value
+    if isinstance(value, (int, float)):
+        return dt_util.utc_from_timestamp(value)
+    if (parsed := dt_util.parse_datetime(str(value))) is None:
+        raise ValueError(f'Could not parse "{value}" as a time')
+    return parsed
+
+
+def compile_extractor(
+    path: str, start_field: str, value_field: str, end_field: str | None = None
+) -> Callable[[Mapping], list[dict]]:
+    """Compile a declared attribute path and field names to an extractor.
+
+    The path is a dot separated list of keys (or list indexes) from the state
+    attributes to a list of prices, several paths can be separated by comma
+    and are concatenated, e.g. "today,tomorrow". The extractor raises KeyError,
+    IndexError, TypeError or ValueError if the attributes do not match.
+    """
+    key_paths = [
+        tuple(
+            int(key) if key.lstrip("-").isdigit() else key
+            for key in list_path.strip().split(".")
+            if key
+        )
+        for list_path in path.split(",")
+    ]
+
+    def extract(attributes: Mapping) -> list[dict]:
+        prices = []
+        for keys in key_paths:
+            items = attributes
+            for key in keys:
+                items = items[key]
+            for item in items or []:
+                price = {
+                    "start": _to_datetime(item[start_field]),
+                    "value": item[value_field],
+                }
+                if end_field:
+                    price["end"] = _to_datetime(item[end_field])
+                prices.append(price)
+        return prices
+
+    return extract
+
+
+class AttributePathAdapter(PriceSourceAdapter):
+    """Any entity with a list of prices at a declared attribute path.
+
+    The extractor is compiled once from the configuration, and the prices are
+    only extracted once per state version.
+    """
+
+    name = "attribute_path"
+
+    def __init__(
+        self,
+        entity_id: str,
+        path: str,
+        start_field: str,
+        value_field: str,
+        end_field: str | None = None,
+    ) -> None:
+        """Initialize adapter for entity."""
+        super().__init__(entity_id)
+        self.path = path
+        self.start_field = start_field
+        self.value_field = value_field
+        self.end_field = end_field
+        self._extract = compile_extractor(path, start_field, value_field, end_field)
+        self._cached_at = None
+        self._cached: list[dict] = []
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "name": self.name,
+            "entity_id": self.entity_id,
+            "path": self.path,
+            "start_field": self.start_field,
+            "end_field": self.end_field,
+            "value_field": self.value_field,
+        }
+
+    @classmethod
+    def detect(cls, state: State) -> bool:
+        """Never detected, has to be configured."""
+        return False
+
+    def validate(self, state: State) -> list[dict]:
+        """Extract prices, raising if the attributes do not match the declaration."""
+        return self._extract(state.attributes)
+
+    def has_prices(self, state: State) -> bool:
+        """Check if state contains prices."""
+        return len(self.prices(state)) > 0
+
+    def prices(self, state: State) -> list[dict]:
+        """Get list of dicts with "start", optional "end" and "value"."""
+        if state.last_updated != self._cached_at:
+            try:
+                self._cached = self._extract(state.attributes)
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                _LOGGER.warning(
+                    'Could not extract prices at "%s" of %s: %s',
+                    self.path,
+                    self.entity_id,
+                    e,
+                )
+                self._cached = []
+            self._cached_at = state.last_updated
+        return self._cached
+
+
+def configured_adapter(entity_id: str, data: Mapping) -> PriceSourceAdapter | None:
+    """Get the adapter declared in config entry data, None to detect format."""
+    if not data.get(CONF_PRICES_PATH):
+        return None
+    return AttributePathAdapter(
+        entity_id,
+        data[CONF_PRICES_PATH],
+        data[CONF_PRICES_START_FIELD],
+        data[CONF_PRICES_VALUE_FIELD],
+        data.get(CONF_PRICES_END_FIELD) or None,
+    )
@@ -0,0 +1,150 @@
+"""Rolling price statistics over the search horizon of a planner."""
+
+from __future__ import annotations
+
+import bisect
+from collections import deque
+import datetime as dt
+
+from .series import PriceSeries
+
+
+class RollingPriceStatistics:
+    """Min, max, mean, median and percentiles of the slots in a moving range.
+
+    The range is a span of slot indexes in a price series. As the range
+    normally only moves forward in time, slots are pushed at the end and
+    popped at the start: monotonic deques of indexes give min and max, and
+    a sorted list of values (bisect insert and remove) serves as the order
+    statistic for median, percentiles and rank. Everything is rebuilt if the
+    prices or their version change or the range moves backwards, a copy of
+    the series with a second series keeps the statistics.
+    """
+
+    def __init__(self) -> None:
+        """Initialize empty statistics."""
+        self._series: PriceSeries | None = None
+        self._version = None
+        self._first = 0
+        self._last = 0
+        self._min: deque[int] = deque()
+        self._max: deque[int] = deque()
+        self._sorted: list[float] = []
+        self._sum = 0.0
+
+    def __len__(self) -> int:
+        """Number of slots in the range."""
+        return self._last - self._first
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        if not len(self):
+            return {"slots": 0}
+        return {
+            "slots": len(self),
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "median": self.median,
+        }
+
+    def update(
+        self,
+        series: PriceSeries,
+        version,
+        start: dt.datetime,
+        end: dt.datetime,
+    ) -> None:
+        """Move the range to the slots overlapping start to end."""
+        first = max(0, series.index_at(start.timestamp()))
+        if first < len(series) and series.ends[first] <= start.timestamp():
+            first += 1
+        last = bisect.bisect_left(series.starts, end.timestamp())
+        last = max(first, last)
+
+        if (
+            self._series is None
+            or self._series.values is not series.values
+            or self._version != version
+            or first < self._first
+            or last < self._last
+        ):
+            self._reset(series, version, first)
+        while self._last < last:
+            self._push()
+        while self._first < first:
+            self._pop()
+
+    def _reset(self, series: PriceSeries, version, first: int) -> None:
+        """Clear range and start it empty at first."""
+        self._series = series
+        self._version = version
+        self._first = first
+        self._last = first
+        self._min.clear()
+        self._max.clear()
+        self._sorted = []
+        self._sum = 0.0
+
+    def _push(self) -> None:
+        """Add the slot after the end of range."""
+        values = self._series.values
+        i = self._last
+        value = values[i]
+        while self._min and values[self._min[-1]] >= value:
+            self._min.pop()
+        self._min.append(i)
+        while self._max and values[self._max[-1]] <= value:
+            self._max.pop()
+        self._max.append(i)
+        bisect.insort(self._sorted, value)
+        self._sum += value
+        self._last += 1
+
+    def _pop(self) -> None:
+        """Remove the slot at the start of range."""
+        i = self._first
+        value = self._series.values[i]
+        if self._min and self._min[0] == i:
+            self._min.popleft()
+        if self._max and self._max[0] == i:
+            self._max.popleft()
+        del self._sorted[bisect.bisect_left(self._sorted, value)]
+        self._sum -= value
+        self._first += 1
+
+    @property
+    def min(self) -> float | None:
+        """Lowest slot price in range."""
+        return self._series.values[self._min[0]] if self._min else None
+
+    @property
+    def max(self) -> float | None:
+        """Highest slot price in range."""
+        return self._series.values[self._max[0]] if self._max else None
+
+    @property
+    def mean(self) -> float | None:
+        """Mean slot price in range."""
+        return self._sum / len(self) if len(self) else None
+
+    @property
+    def median(self) -> float | None:
+        """Median slot price in range."""
+        return self.percentile(50)
+
+    def percentile(self, percent: float) -> float | None:
+        """Slot price at percent (0-100) of range, linearly interpolated."""
+        if not self._sorted:
+            return None
+        pos = max(0.0, min(100.0, percent)) / 100 * (len(self._sorted) - 1)
+        i = int(pos)
+        if i + 1 >= len(self._sorted):
+            return self._sorted[-1]
+        return self._sorted[i] + (self._sorted[i + 1] - self._sorted[i]) * (pos - i)
+
+    def rank(self, value: float) -> float | None:
+        """Share in percent of slots in range with a lower price than value."""
+        if not self._sorted:
+            return None
+        return bisect.bisect_left(self._sorted, value) / len(self._sorted) * 100
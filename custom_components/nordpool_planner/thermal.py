@@ -0,0 +1,373 @@
+"""Thermal model predictive planning for the thermal planner type."""
+
+from __future__ import annotations
+
+from concurrent.futures import CancelledError
+import datetime as dt
+import math
+import threading
+
+# Resolution and margins of the indoor temperature grid
+GRID_STEP = 0.1
+GRID_MARGIN_BELOW = 3.0
+GRID_MARGIN_ABOVE = 2.0
+
+
+class ThermalParameters:
+    """First-order thermal model of the building and the comfort band.
+
+    The model is C * dT/dt = P * u - UA * (T - T_out), where UA is the loss
+    coefficient in kW/°C, P the heater power in kW and C the thermal capacity
+    in kWh/°C.
+    """
+
+    def __init__(
+        self,
+        loss_coefficient: float,
+        heater_power: float,
+        thermal_capacity: float,
+        comfort_min: float,
+        comfort_max: float,
+    ) -> None:
+        """Initialize parameters."""
+        self.loss_coefficient = loss_coefficient
+        self.heater_power = heater_power
+        self.thermal_capacity = thermal_capacity
+        self.comfort_min = comfort_min
+        self.comfort_max = comfort_max
+
+    def __eq__(self, other: object) -> bool:
+        """Compare parameters."""
+        if not isinstance(other, ThermalParameters):
+            return NotImplemented
+        return self.key == other.key
+
+    def __hash__(self) -> int:
+        """Hash of parameters."""
+        return hash(self.key)
+
+    @property
+    def key(self) -> tuple:
+        """Tuple identifying the parameters."""
+        return (
+            self.loss_coefficient,
+            self.heater_power,
+            self.thermal_capacity,
+            self.comfort_min,
+            self.comfort_max,
+        )
+
+    @property
+    def valid(self) -> bool:
+        """Are the parameters usable for planning."""
+        return (
+            self.loss_coefficient > 0
+            and self.heater_power > 0
+            and self.thermal_capacity > 0
+            and self.comfort_min < self.comfort_max
+        )
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return self.__dict__
+
+    def step_response(self, hours: float, outdoor: float) -> tuple[float, float, float]:
+        """Get exact discretization (decay, offset off, offset on) for a slot.
+
+        Temperature after the slot is T * decay + offset, where offset depends
+        on if the heater is on or off during the slot.
+        """
+        decay = math.exp(-self.loss_coefficient * hours / self.thermal_capacity)
+        offset_off = outdoor * (1 - decay)
+        offset_on = offset_off + self.heater_power / self.loss_coefficient * (1 - decay)
+        return decay, offset_off, offset_on
+
+
+class ThermalPlanStep:
+    """One interval of constant heater state in the thermal plan."""
+
+    def __init__(
+        self,
+        start: dt.datetime,
+        end: dt.datetime,
+        heat: bool,
+        temperature_start: float,
+        temperature_end: float,
+        price: float,
+    ) -> None:
+        """Initialize step."""
+        self.start = start
+        self.end = end
+        self.heat = heat
+        self.temperature_start = temperature_start
+        self.temperature_end = temperature_end
+        self._price_sum = price
+        self._slot_count = 1
+
+    @property
+    def average(self) -> float:
+        """The average price of slots in step."""
+        return self._price_sum / self._slot_count
+
+    def extend(self, end: dt.datetime, temperature_end: float, price: float) -> None:
+        """Extend step with a following slot of same heater state."""
+        self.end = end
+        self.temperature_end = temperature_end
+        self._price_sum += price
+        self._slot_count += 1
+
+    def __repr__(self) -> str:
+        """Get string representation for debugging."""
+        return (
+            type(self).__name__
+            + f" (start={self.start} end={self.end} heat={self.heat}"
+            + f" temperature={self.temperature_start:.1f}-{self.temperature_end:.1f})"
+        )
+
+    def as_dict(self):
+        """For diagnostics and state attribute serialization."""
+        return {
+            "start": self.start,
+            "end": self.end,
+            "heat": self.heat,
+            "temperature_start": round(self.temperature_start, 1),
+            "temperature_end": round(self.temperature_end, 1),
+            "average": self.average,
+        }
+
+
+class ThermalPlan:
+    """Result of a simulated run through the optimized policy."""
+
+    def __init__(self, steps: list[ThermalPlanStep], expected_cost: float) -> None:
+        """Initialize plan."""
+        self.steps = steps
+        self.expected_cost = expected_cost
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "steps": [s.as_dict() for s in self.steps],
+            "expected_cost": self.expected_cost,
+        }
+
+    def heat_at(self, time: dt.datetime) -> bool | None:
+        """Get the planned heater state at given timestamp."""
+        for step in self.steps:
+            if step.start <= time < step.end:
+                return step.heat
+        return None
+
+    def steps_at(
+        self, time: dt.datetime
+    ) -> tuple[ThermalPlanStep | None, ThermalPlanStep | None]:
+        """Get the step at given timestamp and the step after it."""
+        for i, step in enumerate(self.steps):
+            if time < step.end:
+                following = self.steps[i + 1] if i + 1 < len(self.steps) else None
+                if step.start <= time:
+                    return step, following
+                return None, step
+        return None, None
+
+    def next_start(self, heat: bool) -> ThermalPlanStep | None:
+        """Get the first step with given heater state."""
+        for step in self.steps:
+            if step.heat == heat:
+                return step
+        return None
+
+
+class ThermalOptimizer:
+    """Model predictive heating schedule over the price horizon.
+
+    The cost-to-go is solved backwards over a grid of indoor temperatures,
+    with heating cost plus a penalty for every °C-hour outside the comfort
+    band. The whole grid is moved through the model at once per slot, as the
+    exact discretization is the same affine map for every grid point. As the
+    cost-to-go does not depend on the current indoor temperature, a new
+    indoor reading only needs a new simulation through the stored policy.
+    The heater state of the first, partly elapsed, slot is chosen again in
+    the simulation for the time left of it.
+    """
+
+    def __init__(
+        self,
+        params: ThermalParameters,
+        slots: list[tuple[dt.datetime, dt.datetime, float]],
+        outdoor: float,
+        cancelled: threading.Event | None = None,
+    ) -> None:
+        """Initialize and solve over (start, end, price) slots.
+
+        Raises CancelledError if cancelled is set before the solve is done.
+        """
+        self._params = params
+        self._slots = slots
+        self._outdoor = outdoor
+        self._low = params.comfort_min - GRID_MARGIN_BELOW
+        self._size = (
+            round((params.comfort_max + GRID_MARGIN_ABOVE - self._low) / GRID_STEP) + 1
+        )
+        self._responses = [
+            params.step_response((end - start).total_seconds() / 3600, outdoor)
+            for start, end, _ in slots
+        ]
+        self._policy: list[bytearray] = []
+        # Cost-to-go at the end of the first slot, and the comfort penalty
+        self._next_value: list[float] = []
+        self._penalty = 0.0
+        self._solve(cancelled)
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "params": self._params,
+            "outdoor": self._outdoor,
+            "slots": len(self._slots),
+            "grid_size": self._size,
+        }
+
+    @property
+    def params(self) -> ThermalParameters:
+        """Parameters used for optimization."""
+        return self._params
+
+    @property
+    def slots(self) -> list[tuple[dt.datetime, dt.datetime, float]]:
+        """Slots used for optimization."""
+        return self._slots
+
+    @property
+    def outdoor(self) -> float:
+        """Outdoor temperature used for optimization."""
+        return self._outdoor
+
+    def _interpolate(
+        self, value: list[float], temperatures: list[float]
+    ) -> list[float]:
+        """Linear interpolation of cost-to-go at temperatures, clamped to grid."""
+        last = self._size - 1
+        low = self._low
+        result = []
+        for temperature in temperatures:
+            pos = (temperature - low) / GRID_STEP
+            if pos <= 0:
+                result.append(value[0])
+            elif pos >= last:
+                result.append(value[last])
+            else:
+                i = int(pos)
+                frac = pos - i
+                result.append(value[i] + (value[i + 1] - value[i]) * frac)
+        return result
+
+    def _discomfort(self, temperatures: list[float], hours: float) -> list[float]:
+        """Get °C-hours outside comfort band for temperatures."""
+        t_min = self._params.comfort_min
+        t_max = self._params.comfort_max
+        return [
+            (max(0.0, t_min - t) + max(0.0, t - t_max)) * hours for t in temperatures
+        ]
+
+    def _solve(self, cancelled: threading.Event | None = None) -> None:
+        """Backward pass computing the optimal heater state per slot and grid point."""
+        if not self._slots:
+            return
+        # Any violation of comfort shall cost more than heating a full slot
+        penalty = (
+            10
+            * self._params.heater_power
+            * max(1.0, max(abs(s[2]) for s in self._slots))
+        )
+        self._penalty = penalty
+        grid = [self._low + i * GRID_STEP for i in range(self._size)]
+        value = [0.0] * self._size
+        policy: list[bytearray] = [bytearray(self._size) for _ in self._slots]
+        for t in range(len(self._slots) - 1, -1, -1):
+            if cancelled is not None and cancelled.is_set():
+                raise CancelledError
+            if t == 0:
+                self._next_value = value
+            start, end, price = self._slots[t]
+            hours = (end - start).total_seconds() / 3600
+            decay, offset_off, offset_on = self._responses[t]
+            heat_cost = price * self._params.heater_power * hours
+
+            next_off = [g * decay + offset_off for g in grid]
+            next_on = [g * decay + offset_on for g in grid]
+            cost_off = [
+                v + penalty * d
+                for v, d in zip(
+                    self._interpolate(value, next_off),
+                    self._discomfort(next_off, hours),
+                )
+            ]
+            cost_on = [
+                v + penalty * d + heat_cost
+                for v, d in zip(
+                    self._interpolate(value, next_on),
+                    self._discomfort(next_on, hours),
+                )
+            ]
+            actions = policy[t]
+            for i in range(self._size):
+                if cost_on[i] < cost_off[i]:
+                    actions[i] = 1
+            value = [min(a, b) for a, b in zip(cost_off, cost_on)]
+        self._policy = policy
+
+    def _heat(
+        self,
+        temperature: float,
+        hours: float,
+        response: tuple[float, float, float],
+        price: float,
+    ) -> bool:
+        """Get the best heater state at temperature for the first slot."""
+        decay, offset_off, offset_on = response
+        costs = []
+        for offset in (offset_off, offset_on):
+            new_temperature = temperature * decay + offset
+            costs.append(
+                self._interpolate(self._next_value, [new_temperature])[0]
+                + self._penalty * self._discomfort([new_temperature], hours)[0]
+            )
+        return costs[1] + price * self._params.heater_power * hours < costs[0]
+
+    def plan(self, indoor: float, now: dt.datetime | None = None) -> ThermalPlan:
+        """Simulate the model from indoor temperature at now through the policy.
+
+        The first slot is simulated from now if it has started.
+        """
+        last = self._size - 1
+        steps: list[ThermalPlanStep] = []
+        cost = 0.0
+        temperature = indoor
+        for t, (start, end, price) in enumerate(self._slots):
+            response = self._responses[t]
+            if t == 0 and now is not None and start < now < end:
+                start = now
+                hours = (end - start).total_seconds() / 3600
+                response = self._params.step_response(hours, self._outdoor)
+                heat = self._heat(temperature, hours, response, price)
+            else:
+                i = min(last, max(0, round((temperature - self._low) / GRID_STEP)))
+                heat = bool(self._policy[t][i])
+            decay, offset_off, offset_on = response
+            new_temperature = temperature * decay + (offset_on if heat else offset_off)
+            if heat:
+                hours = (end - start).total_seconds() / 3600
+                cost += price * self._params.heater_power * hours
+
+            if steps and steps[-1].heat == heat and steps[-1].end == start:
+                steps[-1].extend(end, new_temperature, price)
+            else:
+                steps.append(
+                    ThermalPlanStep(
+                        start, end, heat, temperature, new_temperature, price
+                    )
+                )
+            temperature = new_temperature
+
+        return ThermalPlan(steps, cost)
@@ -0,0 +1,96 @@
+"""Compact traces of planner updates, kept for debugging."""
+
+from __future__ import annotations
+
+from collections import deque
+import datetime as dt
+from typing import Any
+
+
+class PlanTrace:
+    """What one planner update saw and decided.
+
+    Only references to values the update computed anyway are stored, they
+    are first formatted when read, so recording a trace is nearly free.
+    """
+
+    __slots__ = (
+        "cached",
+        "elapsed",
+        "highest",
+        "inputs",
+        "lowest",
+        "prices_version",
+        "rule",
+        "status",
+        "time",
+        "windows",
+    )
+
+    def __init__(self, time: dt.datetime) -> None:
+        """Initialize trace of update at time."""
+        self.time = time
+        self.prices_version = None
+        self.inputs: dict[str, Any] | None = None
+        self.windows: int | None = None
+        self.cached = False
+        self.rule: str | None = None
+        self.lowest = None
+        self.highest = None
+        self.status: str | None = None
+        self.elapsed = 0.0
+
+    def as_dict(self):
+        """For diagnostics serialization."""
+        return {
+            "time": self.time,
+            "prices_version": self.prices_version,
+            "inputs": self.inputs,
+            "windows": self.windows,
+            "cached": self.cached,
+            "rule": self.rule,
+            "lowest": _window(self.lowest),
+            "highest": _window(self.highest),
+            "status": self.status,
+            "elapsed_ms": round(self.elapsed * 1000, 3),
+        }
+
+
+def _window(window) -> dict | None:
+    """Format a price window or (start, end, average) interval."""
+    if window is None:
+        return None
+    if isinstance(window, tuple):
+        start, end, average = window
+    else:
+        start, end, average = window.start_time, window.end_time, window.average
+    return {"start": start, "end": end, "average": average}
+
+
+class PlanTraces:
+    """Ring buffer of the latest plan traces of a planner."""
+
+    def __init__(self, size: int) -> None:
+        """Initialize buffer keeping size traces."""
+        self._traces: deque[PlanTrace] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        """Number of traces in buffer."""
+        return len(self._traces)
+
+    def __iter__(self):
+        """Iterate traces, oldest first."""
+        return iter(self._traces)
+
+    @property
+    def latest(self) -> PlanTrace | None:
+        """The latest trace, if any."""
+        return self._traces[-1] if self._traces else None
+
+    def as_dict(self):
+        """For diagnostics serialization, latest first."""
+        return [trace.as_dict() for trace in reversed(self._traces)]
+
+    def append(self, trace: PlanTrace) -> None:
+        """Add trace, dropping the oldest if full."""
+        self._traces.append(trace)
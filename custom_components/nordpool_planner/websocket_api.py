@@ -0,0 +1,254 @@
+"""WebSocket commands for plan data too large for entity attributes.
+
+Everything is read from the current plan of a planner, no command replans.
+Lists are paginated with offset and limit, and the plan version is included
+so a client can tell if pages are of the same plan. The plan history is read
+from the history file of the planner, in the executor.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from typing import TYPE_CHECKING, Any
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, WS_PAGE_LIMIT
+
+if TYPE_CHECKING:
+    from . import NordpoolPlanner
+
+PAGINATION = {
+    vol.Required("entry_id"): str,
+    vol.Optional("offset", default=0): vol.All(int, vol.Range(min=0)),
+    vol.Optional("limit", default=WS_PAGE_LIMIT): vol.All(
+        int, vol.Range(min=1, max=WS_PAGE_LIMIT)
+    ),
+}
+
+
+@callback
+def async_register_commands(hass: HomeAssistant) -> None:
+    """Register the WebSocket commands of the integration."""
+    websocket_api.async_register_command(hass, ws_timeline)
+    websocket_api.async_register_command(hass, ws_steps)
+    websocket_api.async_register_command(hass, ws_windows)
+    websocket_api.async_register_command(hass, ws_prices)
+    websocket_api.async_register_command(hass, ws_statistics)
+    websocket_api.async_register_command(hass, ws_history)
+    websocket_api.async_register_command(hass, ws_subscribe)
+
+
+def _get_planner(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict
+) -> NordpoolPlanner | None:
+    """Get the planner of the config entry of msg, sending an error if none."""
+    if (planner := hass.data.get(DOMAIN, {}).get(msg["entry_id"])) is None:
+        connection.send_error(
+            msg["id"], websocket_api.ERR_NOT_FOUND, "No planner of config entry"
+        )
+    return planner
+
+
+def _page(msg: dict, items: list, plan_version: int, key: str) -> dict[str, Any]:
+    """Get the page of items asked for by msg."""
+    offset, limit = msg["offset"], msg["limit"]
+    return {
+        "plan_version": plan_version,
+        "total": len(items),
+        "offset": offset,
+        key: items[offset : offset + limit],
+    }
+
+
+def _interval(interval: tuple[str, dt.datetime, dt.datetime, float]) -> dict:
+    """Format a timeline interval."""
+    kind, start, end, average = interval
+    return {"kind": kind, "start": start, "end": end, "average": average}
+
+
+@websocket_api.websocket_command(
+    {vol.Required("type"): f"{DOMAIN}/timeline", **PAGINATION}
+)
+@callback
+def ws_timeline(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict
+) -> None:
+    """Get the planned intervals of a planner."""
+    if (planner := _get_planner(hass, connection, msg)) is None:
+        return
+    page = _page(msg, planner.timeline, planner.plan_version, "timeline")
+    page["timeline"] = [_interval(i) for i in page["timeline"]]
+    connection.send_result(msg["id"], page)
+
+
+@websocket_api.websocket_command(
+    {vol.Required("type"): f"{DOMAIN}/steps", **PAGINATION}
+)
+@callback
+def ws_steps(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict
+) -> None:
+    """Get the steps of the battery or thermal plan of a planner."""
+    if (planner := _get_planner(hass, connection, msg)) is None:
+        return
+    page = _page(msg, planner.plan_steps, planner.plan_version, "steps")
+    page["steps"] = [step.as_dict() for step in page["steps"]]
+    connection.send_result(msg["id"], page)
+
+
+@websocket_api.websocket_command(
+    {vol.Required("type"): f"{DOMAIN}/windows", **PAGINATION}
+)
+@callback
+def ws_windows(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict
+) -> None:
+    """Get the windows of the last search of a planner, lowest cost first."""
+    if (planner := _get_planner(hass, connection, msg)) is None:
+        return
+    page = _page(msg, planner.ranked_windows(), planner.plan_version, "windows")
+    page["windows"] = [
+        {
+            "rank": msg["offset"] + i + 1,
+            "start": window.start_time,
+            "end": window.end_time,
+            "average": window.average,
+            "secondary": window.secondary,
+        }
+        for i, window in enumerate(page["windows"])
+    ]
+    connection.send_result(msg["id"], page)
+
+
+@websocket_api.websocket_command(
+    {vol.Required("type"): f"{DOMAIN}/prices", **PAGINATION}
+)
+@callback
+def ws_prices(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict
+) -> None:
+    """Get the price slots of the source of a planner."""
+    if (planner := _get_planner(hass, connection, msg)) is None:
+        return
+    series = planner.prices_series
+    offset, limit = msg["offset"], msg["limit"]
+    slots = range(offset, min(offset + limit, len(series)))
+    connection.send_result(
+        msg["id"],
+        {
+            "plan_version": planner.plan_version,
+            "total": len(series),
+            "offset": offset,
+            "prices": [
+                {
+                    "start": series.to_datetime(series.starts[i]),
+                    "end": series.to_datetime(series.ends[i]),
+                    "value": series.values[i],
+                }
+                for i in slots
+            ],
+        },
+    )
+
+
+@websocket_api.websocket_command(
+    {vol.Required("type"): f"{DOMAIN}/statistics", vol.Required("entry_id"): str}
+)
+@callback
+def ws_statistics(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict
+) -> None:
+    """Get the price and planning statistics of a planner."""
+    if (planner := _get_planner(hass, connection, msg)) is None:
+        return
+    connection.send_result(msg["id"], planner.statistics)
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/history",
+        vol.Required("start"): cv.datetime,
+        vol.Required("end"): cv.datetime,
+        vol.Optional("daily", default=True): bool,
+        **PAGINATION,
+    }
+)
+@websocket_api.async_response
+async def ws_history(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict
+) -> None:
+    """Get the recorded slots of a planner in range, or their totals per day.
+
+    Days are in the time zone of start, the local time zone if none given.
+    """
+    if (planner := _get_planner(hass, connection, msg)) is None:
+        return
+    start, end = msg["start"], msg["end"]
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=dt_util.get_default_time_zone())
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=dt_util.get_default_time_zone())
+    history = await planner.async_get_history(start, end, msg["daily"])
+    if not msg["daily"]:
+        history = [
+            {
+                "start": dt_util.utc_from_timestamp(slot),
+                "price": price,
+                "hours": hours,
+            }
+            for slot, price, hours in history
+        ]
+    offset, limit = msg["offset"], msg["limit"]
+    connection.send_result(
+        msg["id"],
+        {
+            "total": len(history),
+            "offset": offset,
+            "history": history[offset : offset + limit],
+        },
+    )
+
+
+@websocket_api.websocket_command(
+    {vol.Required("type"): f"{DOMAIN}/subscribe", vol.Required("entry_id"): str}
+)
+@callback
+def ws_subscribe(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict
+) -> None:
+    """Subscribe to the timeline of a planner.
+
+    The first event has the whole timeline as added, then an event with the
+    added and removed intervals is sent each time the plan version changes.
+    """
+    if (planner := _get_planner(hass, connection, msg)) is None:
+        return
+    sent: list[tuple] = []
+
+    @callback
+    def _send() -> None:
+        nonlocal sent
+        timeline = planner.timeline
+        current = set(timeline)
+        previous = set(sent)
+        connection.send_message(
+            websocket_api.event_message(
+                msg["id"],
+                {
+                    "plan_version": planner.plan_version,
+                    "added": [_interval(i) for i in timeline if i not in previous],
+                    "removed": [_interval(i) for i in sent if i not in current],
+                },
+            )
+        )
+        sent = timeline
+
+    connection.subscriptions[msg["id"]] = planner.subscribe_plan(_send)
+    connection.send_result(msg["id"])
+    _send()
@@ -1,5 +1,7 @@
 """Fixtures for testing."""
 
+import contextlib
+
 import pytest
 
 
@@ -7,3 +9,16 @@ import pytest
 def auto_enable_custom_integrations(enable_custom_integrations):
     """Enable custom integrations."""
     return
+
+
+@pytest.fixture(scope="session", autouse=True)
+def start_resolver_thread():
+    """Start the background thread of the DNS resolver before any test.
+
+    It is started by the first WebSocket client and never stops, so would
+    otherwise be taken for a thread left behind by that test.
+    """
+    with contextlib.suppress(ImportError):
+        import pycares
+
+        pycares.Channel()
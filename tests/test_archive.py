@@ -0,0 +1,100 @@
+"""price archive tests."""
+
+import datetime as dt
+import json
+
+from custom_components.nordpool_planner.archive import (
+    RECORD,
+    PriceArchive,
+    import_diagnostics,
+    main,
+)
+from custom_components.nordpool_planner.const import SIGNAL_SOURCE_REFRESHED
+from custom_components.nordpool_planner.sources import ArchiveAdapter, detect_adapter
+from homeassistant.core import callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.util import dt as dt_util
+
+NEW_YEAR = dt.datetime(2025, 1, 1, tzinfo=dt.UTC)
+
+
+def write_diagnostics(path, start, hours, offset=0.0):
+    """Write a planner diagnostics file with hourly prices from start."""
+    raw = [
+        {
+            "start": (start + dt.timedelta(hours=h)).isoformat(),
+            "end": (start + dt.timedelta(hours=h + 1)).isoformat(),
+            "value": h + offset,
+        }
+        for h in range(hours)
+    ]
+    path.write_text(
+        json.dumps(
+            {"data": {"planner": {"_prices_entity": {"_np": {"raw_today": raw}}}}}
+        ),
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+def test_import_shards_per_year(tmp_path):
+    """Test prices are merged into one shard per year and read by range."""
+    first = write_diagnostics(tmp_path / "a.json", NEW_YEAR - dt.timedelta(hours=2), 4)
+    second = write_diagnostics(tmp_path / "b.json", NEW_YEAR, 3, offset=10.0)
+    archive_dir = tmp_path / "archive"
+
+    assert import_diagnostics(archive_dir, [first, second], "SE3") == 5
+    shards = sorted(p.name for p in (archive_dir / "SE3").iterdir())
+    assert shards == ["2024.bin", "2025.bin"]
+    assert (archive_dir / "SE3" / "2025.bin").stat().st_size == 3 * RECORD.size
+
+    archive = PriceArchive(archive_dir, "SE3")
+    assert len(archive) == 5
+    prices = archive.prices(
+        NEW_YEAR - dt.timedelta(hours=1), NEW_YEAR + dt.timedelta(hours=2)
+    )
+    assert [p["value"] for p in prices] == [1.0, 10.0, 11.0]
+    assert prices[1]["start"] == NEW_YEAR
+    assert (
+        archive.prices(NEW_YEAR + dt.timedelta(days=1), NEW_YEAR + dt.timedelta(days=2))
+        == []
+    )
+
+    # Importing again replaces the prices of the same slots
+    assert main([str(archive_dir), "--area", "SE3", second]) == 0
+    assert len(PriceArchive(archive_dir, "SE3")) == 5
+    assert PriceArchive(tmp_path / "missing").prices(NEW_YEAR, NEW_YEAR) == []
+
+
+async def test_archive_adapter(hass, tmp_path):
+    """Test the archive adapter serves today and tomorrow as one state a day."""
+    today = dt_util.start_of_local_day()
+    diagnostics = write_diagnostics(
+        tmp_path / "a.json", today - dt.timedelta(days=1), 96
+    )
+    import_diagnostics(tmp_path, [diagnostics], "SE3")
+
+    adapter = detect_adapter("archive_reader:SE3", None)
+    assert isinstance(adapter, ArchiveAdapter)
+    assert adapter.archive is None
+
+    refreshed = []
+    async_dispatcher_connect(
+        hass,
+        SIGNAL_SOURCE_REFRESHED.format("archive_reader:SE3"),
+        callback(lambda: refreshed.append(True)),
+    )
+    adapter = ArchiveAdapter("archive_reader:SE3", str(tmp_path))
+    # Read in the background, nothing until done
+    assert adapter.get_state(hass) is None
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert len(refreshed) == 1
+
+    state = adapter.get_state(hass)
+    assert adapter.has_prices(state)
+    series = adapter.series(state)
+    assert len(series) == 48
+    assert series.value_at(today) == 24.0
+    assert adapter.get_state(hass) is state
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert len(refreshed) == 1
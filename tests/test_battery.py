@@ -0,0 +1,94 @@
+"""battery planner tests."""
+
+from concurrent.futures import CancelledError
+import datetime as dt
+import threading
+
+from custom_components.nordpool_planner.battery import (
+    BatteryAction,
+    BatteryOptimizer,
+    BatteryParameters,
+)
+import pytest
+
+START = dt.datetime(2025, 1, 1, tzinfo=dt.UTC)
+
+
+def _slots(prices, minutes=60):
+    step = dt.timedelta(minutes=minutes)
+    return [(START + i * step, START + (i + 1) * step, p) for i, p in enumerate(prices)]
+
+
+def test_battery_charge_low_discharge_high():
+    """Test that the battery charges at low and discharges at high price."""
+    optimizer = BatteryOptimizer(
+        BatteryParameters(10, 5, 5, 1.0), _slots([1, 1, 5, 5, 3])
+    )
+    plan = optimizer.plan(0)
+
+    assert plan.action_at(START) == BatteryAction.Charge
+    assert plan.action_at(START + dt.timedelta(hours=2)) == BatteryAction.Discharge
+    assert plan.steps[0].soc_end == 100
+    assert plan.expected_profit == 40
+
+    current, following = plan.steps_at(START + dt.timedelta(minutes=30))
+    assert (current, following) == (plan.steps[0], plan.steps[1])
+    assert plan.steps_at(START - dt.timedelta(hours=1)) == (None, plan.steps[0])
+    assert plan.steps_at(START + dt.timedelta(hours=5)) == (None, None)
+
+
+def test_battery_idle_when_loss_larger_than_spread():
+    """Test that no arbitrage is done when efficiency loss eats the spread."""
+    optimizer = BatteryOptimizer(
+        BatteryParameters(10, 5, 5, 0.5), _slots([1.0, 1.2, 1.1, 1.3])
+    )
+    plan = optimizer.plan(50)
+
+    assert plan.next_start(BatteryAction.Charge) is None
+
+
+def test_battery_replan_on_soc_change():
+    """Test that a new state of charge only needs a forward pass."""
+    optimizer = BatteryOptimizer(
+        BatteryParameters(10, 5, 5, 1.0), _slots([5, 1, 5], minutes=15)
+    )
+    full = optimizer.plan(100)
+    empty = optimizer.plan(0)
+
+    assert full.action_at(START) == BatteryAction.Discharge
+    assert empty.action_at(START) == BatteryAction.Idle
+
+
+def test_battery_low_power_short_slots():
+    """Test a large battery charged at low power over 15 minute slots."""
+    optimizer = BatteryOptimizer(
+        BatteryParameters(50, 1.5, 1.5, 0.9), _slots([1] * 16 + [5] * 16, minutes=15)
+    )
+    plan = optimizer.plan(0)
+
+    assert optimizer.levels > 100
+    assert plan.action_at(START) == BatteryAction.Charge
+    assert plan.steps[0].soc_end > 0
+    assert plan.expected_profit > 0
+
+
+def test_battery_first_slot_from_now():
+    """Test the elapsed part of the first slot is not planned."""
+    optimizer = BatteryOptimizer(BatteryParameters(10, 5, 5, 1.0), _slots([1, 5]))
+    now = START + dt.timedelta(minutes=30)
+    plan = optimizer.plan(0, now)
+
+    assert plan.steps[0].start == now
+    assert plan.steps[0].soc_end == 25
+    assert plan.expected_profit == 10
+
+
+def test_battery_cancelled():
+    """Test the backward pass stops when cancelled."""
+    cancelled = threading.Event()
+    params = BatteryParameters(10, 5, 5, 1.0)
+    BatteryOptimizer(params, _slots([1, 5]), cancelled=cancelled)
+
+    cancelled.set()
+    with pytest.raises(CancelledError):
+        BatteryOptimizer(params, _slots([1, 5]), cancelled=cancelled)
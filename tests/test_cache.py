@@ -0,0 +1,19 @@
+"""plan cache tests."""
+
+from custom_components.nordpool_planner.cache import PlanCache
+
+
+def test_cache_hits_misses_and_eviction():
+    """Test that the least recently used entry is evicted when full."""
+    cache = PlanCache(2)
+    cache.put(("a",), 1)
+    cache.put(("b",), 2)
+
+    assert cache.get(("a",)) == 1
+    cache.put(("c",), 3)
+
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == 1
+    assert cache.get(("c",)) == 3
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (3, 1)
@@ -0,0 +1,99 @@
+"""calendar tests."""
+
+import datetime as dt
+from unittest import mock
+
+from custom_components.nordpool_planner import NordpoolPlanner
+from custom_components.nordpool_planner.const import (
+    CONF_DURATION_ENTITY,
+    CONF_HIGH_COST_ENTITY,
+    CONF_LOW_COST_ENTITY,
+    CONF_PRICES_ENTITY,
+    CONF_SEARCH_LENGTH_ENTITY,
+    CONF_TYPE,
+    CONF_TYPE_MOVING,
+    DOMAIN,
+)
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.const import ATTR_NAME, ATTR_UNIT_OF_MEASUREMENT
+from homeassistant.setup import async_setup_component
+from homeassistant.util import dt as dt_util
+
+PRICES_ENT = "sensor.np_ent"
+CALENDAR_ENT = "calendar.heater_calendar"
+
+
+@pytest.mark.asyncio
+async def test_calendar_events(hass):
+    """Test planned windows are events, cached until the plan changes."""
+    hour = dt_util.now().replace(minute=0, second=0, microsecond=0)
+    raw = [
+        {"start": hour + dt.timedelta(hours=i), "value": v}
+        for i, v in enumerate([5, 4, 1, 1, 6, 7, 3, 8, 9, 9, 9, 9])
+    ]
+    hass.states.async_set(
+        PRICES_ENT,
+        "5",
+        {"today": [], "raw_today": raw, "tomorrow_valid": False, "current_price": 5},
+    )
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            ATTR_NAME: "Heater",
+            CONF_TYPE: CONF_TYPE_MOVING,
+            CONF_PRICES_ENTITY: PRICES_ENT,
+            CONF_LOW_COST_ENTITY: True,
+            CONF_HIGH_COST_ENTITY: True,
+            CONF_DURATION_ENTITY: True,
+            CONF_SEARCH_LENGTH_ENTITY: True,
+        },
+        options={ATTR_UNIT_OF_MEASUREMENT: "EUR/kWh"},
+        version=2,
+        minor_version=2,
+    )
+    entry.add_to_hass(hass)
+    assert await async_setup_component(hass, DOMAIN, {})
+    await hass.async_block_till_done()
+    planner = hass.data[DOMAIN][entry.entry_id]
+    hass.states.async_set("number.heater_duration", "2")
+    hass.states.async_set("number.heater_search_length", "10")
+    await hass.async_block_till_done()
+    version = planner.plan_version
+
+    with mock.patch.object(NordpoolPlanner, "_update_plan") as update_plan:
+        for _ in range(2):
+            response = await hass.services.async_call(
+                "calendar",
+                "get_events",
+                {
+                    "entity_id": CALENDAR_ENT,
+                    "start_date_time": hour,
+                    "end_date_time": hour + dt.timedelta(days=1),
+                },
+                blocking=True,
+                return_response=True,
+            )
+    update_plan.assert_not_called()
+    assert planner.plan_version == version
+
+    events = response[CALENDAR_ENT]["events"]
+    assert [e["summary"] for e in events] == ["Heater low cost", "Heater high cost"]
+    assert dt_util.parse_datetime(events[0]["start"]) == hour + dt.timedelta(hours=2)
+    assert dt_util.parse_datetime(events[0]["end"]) == hour + dt.timedelta(hours=4)
+    assert events[0]["description"] == "Average price 1.000"
+    assert hass.states.get(CALENDAR_ENT).attributes["message"] == "Heater low cost"
+
+    # A new plan replaces the events
+    hass.states.async_set("number.heater_duration", "3")
+    await hass.async_block_till_done()
+    # States are written in a callback scheduled by the update
+    await hass.async_block_till_done()
+    assert planner.plan_version > version
+    assert hass.states.get(CALENDAR_ENT).attributes["start_time"] == (
+        (hour + dt.timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
+    )
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
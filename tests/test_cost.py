@@ -0,0 +1,66 @@
+"""realized cost meter tests."""
+
+import datetime as dt
+
+from custom_components.nordpool_planner.cost import CostMeter
+from custom_components.nordpool_planner.series import PriceSeries
+import pytest
+
+DAY = dt.datetime(2025, 1, 6, tzinfo=dt.UTC)
+
+
+def quarter_series(values, start=DAY):
+    """Get series of 15 minute prices from start."""
+    return PriceSeries(
+        [
+            {"start": start + dt.timedelta(minutes=15 * i), "value": v}
+            for i, v in enumerate(values)
+        ]
+    )
+
+
+def test_cost_meter_power_slot_boundaries():
+    """Test power is integrated at the price of each 15 minute slot."""
+    series = quarter_series([1, 2, 3, 4] * 24)
+    meter = CostMeter()
+    meter.set_power(series, DAY + dt.timedelta(minutes=10), 2.0)
+    # 5 min at 1, 15 min at 2, 10 min at 3
+    meter.set_power(series, DAY + dt.timedelta(minutes=40), 0.0)
+
+    assert meter.energy == pytest.approx(1.0)
+    assert meter.cost == pytest.approx(2 * (5 * 1 + 15 * 2 + 10 * 3) / 60)
+    assert meter.average_price == pytest.approx(meter.cost / meter.energy)
+    assert meter.day_average == pytest.approx(2.5)
+    assert meter.savings == pytest.approx(2.5 - meter.cost)
+
+    # Nothing consumed while off
+    meter.advance(series, DAY + dt.timedelta(hours=2))
+    assert meter.energy == pytest.approx(1.0)
+
+
+def test_cost_meter_energy_reading_and_midnight():
+    """Test meter readings are spread evenly and the day starts over at midnight."""
+    series = quarter_series([1] * 96 + [3] * 96)
+    meter = CostMeter()
+    meter.set_reading(series, DAY + dt.timedelta(hours=23, minutes=30), 100.0)
+    meter.set_reading(series, DAY + dt.timedelta(days=1, minutes=30), 101.0)
+
+    assert meter.day == dt.date(2025, 1, 7)
+    assert meter.energy == pytest.approx(0.5)
+    assert meter.cost == pytest.approx(1.5)
+    assert meter.day_average == pytest.approx(3)
+
+    # Reset of the meter counts the new reading
+    meter.set_reading(series, DAY + dt.timedelta(days=1, hours=1), 0.5)
+    assert meter.energy == pytest.approx(1.0)
+
+
+def test_cost_meter_outside_prices():
+    """Test consumption outside of the prices is not counted."""
+    series = quarter_series([2] * 4, DAY + dt.timedelta(hours=1))
+    meter = CostMeter()
+    meter.set_power(series, DAY, 1.0)
+    meter.advance(series, DAY + dt.timedelta(hours=3))
+
+    assert meter.energy == pytest.approx(1.0)
+    assert meter.cost == pytest.approx(2.0)
@@ -0,0 +1,52 @@
+"""deadline planner tests."""
+
+import datetime as dt
+
+from custom_components.nordpool_planner.deadline import DeadlineSchedule
+
+START = dt.datetime(2025, 1, 1, tzinfo=dt.UTC)
+
+
+def _slots(prices, minutes=60):
+    step = dt.timedelta(minutes=minutes)
+    return [(START + i * step, START + (i + 1) * step, p) for i, p in enumerate(prices)]
+
+
+def test_deadline_cheapest_before_each_deadline():
+    """Test that the cheapest slots are placed before each deadline."""
+    prices = [5, 1, 4, 2, 9, 9, 9, 9] + [9] * 16 + [3, 8, 1, 8, 8, 8, 8, 8]
+    schedule = DeadlineSchedule(_slots(prices), 6, START)
+    plan = schedule.plan(START, 2, 0)
+
+    assert [d["deadline"].hour for d in plan.deadlines] == [6, 6, 6]
+    assert not plan.deadlines[2]["complete"]
+    assert plan.intervals[0][:2] == (
+        START + dt.timedelta(hours=1),
+        START + dt.timedelta(hours=2),
+    )
+    assert plan.intervals[1][0] == START + dt.timedelta(hours=3)
+    assert plan.intervals[2][0] == START + dt.timedelta(hours=24)
+    assert plan.intervals[3][0] == START + dt.timedelta(hours=26)
+
+
+def test_deadline_used_quota_and_partial_slot():
+    """Test that used hours are subtracted and a partial slot is planned."""
+    schedule = DeadlineSchedule(_slots([5, 1, 4, 2, 9, 9]), 6, START)
+    now = START + dt.timedelta(minutes=90)
+    plan = schedule.plan(now, 2, 0.5)
+
+    assert plan.deadlines[0]["needed"] == 1.5
+    assert plan.next_interval(now) == (now, START + dt.timedelta(hours=2), 1)
+    assert plan.intervals[1] == (
+        START + dt.timedelta(hours=3),
+        START + dt.timedelta(hours=4),
+        2,
+    )
+
+
+def test_deadline_missing_time():
+    """Test that missing time before deadline is reported."""
+    schedule = DeadlineSchedule(_slots([1, 1, 1, 1, 1, 1]), 2, START)
+    plan = schedule.plan(START, 3, 0)
+
+    assert plan.deadlines[0]["missing"] == 1
@@ -0,0 +1,43 @@
+"""diagnostics tests."""
+
+import json
+
+from custom_components.nordpool_planner.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+import pytest
+
+from homeassistant.helpers.json import ExtendedJSONEncoder
+from homeassistant.util import dt as dt_util
+
+from .test_websocket import setup_planner
+
+
+@pytest.mark.asyncio
+async def test_diagnostics(hass):
+    """Test diagnostics hold the plan and traces but no internal caches."""
+    hour = dt_util.now().replace(minute=0, second=0, microsecond=0)
+    entry = await setup_planner(hass, hour)
+
+    # Encoded like the download of diagnostics
+    data = json.loads(
+        json.dumps(
+            await async_get_config_entry_diagnostics(hass, entry),
+            cls=ExtendedJSONEncoder,
+        )
+    )
+
+    planner = data["planner"]
+    assert planner["_prices_entity"]["_np"]["attributes"]["raw_today"]
+    assert planner["_duration_number_entity"]["value"] == 2
+    assert planner["low_cost_state"]
+    assert planner["statistics"]["prices"]["slots"] > 0
+    assert planner["traces"][0]["rule"] == "lowest"
+    for internal in ("_plan_cache", "_history", "_scenarios", "_prices_batch"):
+        assert internal not in planner
+    assert set(data["tick_dispatcher"]) == {
+        "ticks",
+        "last_latency",
+        "max_latency",
+        "mean_latency",
+    }
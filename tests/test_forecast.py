@@ -0,0 +1,154 @@
+"""price forecast tests."""
+
+import datetime as dt
+from unittest import mock
+
+from custom_components.nordpool_planner import NordpoolPlanner
+from custom_components.nordpool_planner.forecast import PriceProfile, forecast_window
+from custom_components.nordpool_planner.planning import plan_windows
+from custom_components.nordpool_planner.series import PriceSeries
+from custom_components.nordpool_planner.stats import RollingPriceStatistics
+from custom_components.nordpool_planner.trace import PlanTrace
+import pytest
+
+from homeassistant.util import dt as dt_util
+
+from .test_planner import CONF_ENTRY, PRICES_ENT
+
+TODAY = dt.datetime(2025, 1, 6, tzinfo=dt.UTC)
+TOMORROW = TODAY + dt.timedelta(days=1)
+HOUR = dt.timedelta(hours=1)
+HOURS_3 = dt.timedelta(hours=3)
+
+
+def known_series(price):
+    """Get hourly prices of the rest of today from noon."""
+    return PriceSeries(
+        [
+            {"start": TODAY + dt.timedelta(hours=h), "value": price}
+            for h in range(12, 24)
+        ]
+    )
+
+
+def past_day(day, night):
+    """Get (start, price) of a past day with night price until 06."""
+    return [
+        ((day + dt.timedelta(hours=h)).timestamp(), night if h < 6 else 6.0)
+        for h in range(24)
+    ]
+
+
+def test_profile_scenarios_same_weekday():
+    """Test unpublished slots are sampled from past days of the same weekday."""
+    records = (
+        past_day(TOMORROW - dt.timedelta(days=7), 1.0)
+        + past_day(TOMORROW - dt.timedelta(days=14), 3.0)
+        + past_day(TOMORROW - dt.timedelta(days=1), 9.0)
+    )
+    profile = PriceProfile(records, dt.UTC)
+    assert len(profile) == 3
+
+    scenarios = profile.scenarios(
+        known_series(4.0), TOMORROW + dt.timedelta(hours=6), 20, seed=1
+    )
+    assert len(scenarios) == 20
+    nights = scenarios.values_at(TOMORROW + dt.timedelta(hours=2))
+    assert set(nights) == {1.0, 3.0}
+    assert set(scenarios.values_at(TODAY + dt.timedelta(hours=13))) == {4.0}
+    # The grid is priced at the mean of the scenarios
+    assert scenarios.grid.value_at(TOMORROW + dt.timedelta(hours=2)) == pytest.approx(
+        sum(nights) / len(nights)
+    )
+
+    # Every scenario averaged at once over a window of the grid
+    start, end, i, j, mean = next(
+        scenarios.grid.spans(TOMORROW, TOMORROW + dt.timedelta(hours=6), HOURS_3)
+    )
+    assert scenarios.averages(start, end, i, j) == pytest.approx(nights)
+    assert mean == pytest.approx(sum(nights) / len(nights))
+
+    # Nothing to sample if all prices are known
+    assert (
+        profile.scenarios(known_series(4.0), TODAY + dt.timedelta(hours=20), 5) is None
+    )
+
+
+@pytest.mark.parametrize(("risk", "rule"), [(0.0, "forecast"), (1.0, "lowest")])
+def test_plan_windows_with_scenarios(risk, rule):
+    """Test a likely cheaper night is awaited unless too uncertain for risk."""
+    records = past_day(TOMORROW - dt.timedelta(days=7), 1.0) + past_day(
+        TOMORROW - dt.timedelta(days=14), 6.0
+    )
+    series = known_series(4.5)
+    end = TOMORROW + dt.timedelta(hours=6)
+    scenarios = PriceProfile(records, dt.UTC).scenarios(series, end, 50, seed=2)
+
+    window = forecast_window(
+        scenarios, TODAY + dt.timedelta(hours=12), end, dt.timedelta(hours=3)
+    )
+    assert window.start_time == TOMORROW
+    assert 1.0 < window.average < 4.5
+
+    trace = PlanTrace(TODAY)
+    lowest, highest = plan_windows(
+        series,
+        TODAY + dt.timedelta(hours=12),
+        end,
+        dt.timedelta(hours=3),
+        RollingPriceStatistics(),
+        trace=trace,
+        scenarios=scenarios,
+        risk=risk,
+    )
+    assert trace.rule == rule
+    if rule == "forecast":
+        assert lowest.start_time >= TOMORROW
+    else:
+        assert lowest.start_time < TOMORROW
+    assert highest.average == 4.5
+
+
+@pytest.mark.asyncio
+async def test_planner_scenarios_of_new_profile(hass, caplog):
+    """Test scenarios are sampled again from a newly loaded profile."""
+    now = dt_util.now()
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    raw = [{"start": hour + dt.timedelta(hours=i), "value": 4.0} for i in range(4)]
+    hass.states.async_set(
+        PRICES_ENT,
+        "4",
+        {"today": [], "raw_today": raw, "tomorrow_valid": False, "current_price": 4},
+    )
+    day = dt_util.start_of_local_day(now)
+    week_ago = day - dt.timedelta(days=7)
+    records = [((week_ago + HOUR * h).timestamp(), 1.0, 0.0) for h in range(24)]
+    planner = NordpoolPlanner(hass, CONF_ENTRY)
+    planner._forecast = True
+    planner._history = mock.MagicMock()
+    planner._history.read.return_value = records
+    planner._prices_entity.update(hass)
+    end = hour + dt.timedelta(hours=10)
+
+    assert planner.get_scenarios(now, end) is None
+    await hass.async_block_till_done(wait_background_tasks=True)
+    first = planner.get_scenarios(now, end)
+    assert set(first.values_at(hour + dt.timedelta(hours=6))) == {1.0}
+
+    # A new profile loaded the same day replaces the scenarios
+    planner._history.read.return_value = [
+        (start, 2.0, hours) for start, _, hours in records
+    ]
+    await planner._async_load_profile(now)
+    second = planner.get_scenarios(now, end)
+    assert second is not first
+    assert set(second.values_at(hour + dt.timedelta(hours=6))) == {2.0}
+
+    # A failed read is logged and keeps the last profile
+    planner._history.read.side_effect = OSError("disk gone")
+    await planner._async_load_profile(now)
+    assert planner._profile_task is None
+    assert "disk gone" in caplog.text
+    assert planner.get_scenarios(now, end) is second
+
+    planner.cleanup()
@@ -0,0 +1,90 @@
+"""planner group joint scheduling tests."""
+
+import random
+import time
+
+from custom_components.nordpool_planner.group import GroupDemand, schedule_group
+import pytest
+
+
+def test_group_respects_power_limit():
+    """Test two appliances do not share the cheapest slot above the limit."""
+    prices = [5, 1, 2, 9]
+    hours = [1.0] * 4
+    demands = [GroupDemand(3.0, 1.0, 0, 4), GroupDemand(2.0, 1.0, 0, 4)]
+
+    schedule = schedule_group(prices, hours, 4.0, demands)
+
+    assert schedule.slots(0) == [(1, 1.0)]
+    assert schedule.slots(1) == [(2, 1.0)]
+    assert max(schedule.load) <= 4.0
+    assert schedule.missing == [0.0, 0.0]
+    assert schedule.cost == 3.0 * 1 + 2.0 * 2
+
+    unlimited = schedule_group(prices, hours, float("inf"), demands)
+    assert unlimited.slots(1) == [(1, 1.0)]
+
+
+def test_group_repair_moves_flexible_demand():
+    """Test a flexible demand is moved away to make room for a blocked one."""
+    prices = [1, 2, 3, 4]
+    hours = [1.0] * 4
+    # Same slack, the larger power is placed first in both slots the second
+    # one can use, repair moves it from the slot where moving costs least
+    demands = [GroupDemand(3.0, 2.0, 0, 3), GroupDemand(2.0, 1.0, 0, 2)]
+
+    schedule = schedule_group(prices, hours, 4.0, demands)
+
+    assert schedule.missing == [0.0, 0.0]
+    assert schedule.slots(0) == [(0, 1.0), (2, 1.0)]
+    assert schedule.slots(1) == [(1, 1.0)]
+    assert max(schedule.load) <= 4.0
+    assert schedule.cost == 3.0 * (1 + 3) + 2.0 * 2
+
+
+def test_group_repair_prices_taken_hours():
+    """Test repair prices the freed slot by the hours actually taken."""
+    prices = [1, 0.5, 0.8, 3]
+    hours = [4.0, 1.0, 1.0, 1.0]
+    # The long cheap slot is freed for the one hour needed, not for its
+    # four hours which would make freeing the short slot look cheaper
+    demands = [GroupDemand(3.0, 3.0, 0, 4), GroupDemand(2.0, 1.0, 0, 2)]
+
+    schedule = schedule_group(prices, hours, 4.0, demands)
+
+    assert schedule.missing == [0.0, 0.0]
+    assert schedule.slots(0) == [(1, 1.0), (2, 1.0), (3, 1.0)]
+    assert schedule.slots(1) == [(0, 1.0)]
+    assert schedule.cost == pytest.approx(3.0 * (0.5 + 0.8 + 3) + 2.0 * 1)
+
+
+def test_group_partial_and_missing():
+    """Test the last slot is partially used and uncovered hours are reported."""
+    schedule = schedule_group(
+        [1, 2],
+        [1.0, 1.0],
+        3.0,
+        [GroupDemand(2.0, 1.5, 0, 2), GroupDemand(2.0, 1.0, 0, 2)],
+    )
+
+    assert sum(h for _, h in schedule.slots(0)) + schedule.missing[0] == 1.5
+    assert max(schedule.load) <= 3.0
+    assert sum(schedule.missing) == 1.0
+
+
+def test_group_scale():
+    """Test ten appliances over two days of quarter hours solve quickly."""
+    rng = random.Random(1)
+    prices = [rng.uniform(0, 3) for _ in range(192)]
+    hours = [0.25] * 192
+    demands = [
+        GroupDemand(rng.choice([2.0, 3.0, 7.0]), rng.choice([2.0, 4.0]), 0, 96)
+        for _ in range(10)
+    ]
+
+    started = time.perf_counter()
+    schedule = schedule_group(prices, hours, 11.0, demands)
+
+    assert time.perf_counter() - started < 1.0
+    assert max(schedule.load) <= 11.0
+    assert schedule.missing == [0.0] * 10
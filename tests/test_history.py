@@ -0,0 +1,108 @@
+"""plan history tests."""
+
+import datetime as dt
+
+from custom_components.nordpool_planner import NordpoolPlanner
+from custom_components.nordpool_planner.history import RECORD, PlanHistory
+import pytest
+
+from homeassistant.util import dt as dt_util
+
+from .test_planner import CONF_ENTRY, PRICES_ENT
+
+DAY = dt.datetime(2025, 1, 6, tzinfo=dt.UTC)
+
+
+def test_history_daily(tmp_path):
+    """Test records are written in order and summarized per day."""
+    history = PlanHistory(str(tmp_path / "history" / "planner.bin"), 30)
+    for i, price in enumerate([4, 1, 2, 5]):
+        history.append((DAY + dt.timedelta(hours=i)).timestamp(), price, i == 1)
+    history.flush()
+    # Already written slot is not appended again, e.g. after a restart
+    history.append(DAY.timestamp(), 9, 1.0)
+    history.append((DAY + dt.timedelta(days=1)).timestamp(), 3, 0.5)
+    history.flush()
+
+    assert (tmp_path / "history" / "planner.bin").stat().st_size == 5 * RECORD.size
+    days = history.daily(DAY, DAY + dt.timedelta(days=2))
+    assert days == [
+        {"date": "2025-01-06", "cost": 1, "runtime": 1, "baseline": 3, "savings": 2},
+        {
+            "date": "2025-01-07",
+            "cost": 1.5,
+            "runtime": 0.5,
+            "baseline": 1.5,
+            "savings": 0,
+        },
+    ]
+    assert [r[1] for r in history.read(DAY + dt.timedelta(hours=1), DAY)] == []
+    assert [
+        r[1]
+        for r in history.read(DAY + dt.timedelta(hours=1), DAY + dt.timedelta(hours=3))
+    ] == [1, 2]
+
+
+def test_history_compact(tmp_path):
+    """Test compaction drops records older than retention."""
+    history = PlanHistory(str(tmp_path / "planner.bin"), 2)
+    for day in range(5):
+        history.append((DAY + dt.timedelta(days=day)).timestamp(), day, 1.0)
+    history.flush(DAY + dt.timedelta(days=4, hours=12))
+
+    records = history.read(DAY, DAY + dt.timedelta(days=5))
+    assert [r[1] for r in records] == [3, 4]
+    assert history.as_dict()["compacted"] == dt.date(2025, 1, 10)
+
+
+def test_history_flush_failed(tmp_path):
+    """Test records are kept when writing fails and written on next flush."""
+    (tmp_path / "history").write_text("not a directory")
+    history = PlanHistory(str(tmp_path / "history" / "planner.bin"), 30)
+    history.append(DAY.timestamp(), 1, 1.0)
+
+    with pytest.raises(OSError):
+        history.flush()
+    history.append((DAY + dt.timedelta(hours=1)).timestamp(), 2, 0.0)
+    assert len(history) == 2
+
+    (tmp_path / "history").unlink()
+    history.flush()
+    assert len(history) == 0
+    assert [r[1] for r in history.read(DAY, DAY + dt.timedelta(days=1))] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_planner_records_history(hass, tmp_path):
+    """Test the planner records hours on and price of every passed slot."""
+    now = dt_util.now()
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    raw = [
+        {"start": hour + dt.timedelta(hours=i), "value": v}
+        for i, v in enumerate([5, 4, 1, 1, 6, 7])
+    ]
+    hass.states.async_set(
+        PRICES_ENT,
+        "5",
+        {"today": [], "raw_today": raw, "tomorrow_valid": False, "current_price": 5},
+    )
+    planner = NordpoolPlanner(hass, CONF_ENTRY)
+    planner._prices_entity.update(hass)
+    planner._history = PlanHistory(str(tmp_path / "planner.bin"), 30)
+    planner.low_cost_state.starts_at = hour + dt.timedelta(minutes=30)
+    planner.low_cost_state.ends_at = hour + dt.timedelta(hours=2)
+
+    planner.record_history(hour)
+    planner.record_history(hour + dt.timedelta(minutes=15))
+    planner.record_history(hour + dt.timedelta(hours=2, minutes=30))
+    await hass.async_block_till_done()
+
+    records = planner._history.read(hour, hour + dt.timedelta(hours=6))
+    assert records == [
+        (int(hour.timestamp()), 5, 0.5),
+        (int((hour + dt.timedelta(hours=1)).timestamp()), 4, 1.0),
+    ]
+    assert planner._history_slot[2:] == (1, 0.0)
+    assert await planner.async_get_history(hour, hour + dt.timedelta(hours=6))
+
+    planner.cleanup()
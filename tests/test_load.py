@@ -0,0 +1,247 @@
+"""Synthetic load tests of many planners over shared price sources.
+
+Runs offline on the test instance of Home Assistant, with the planners set
+up from config entries like in a real instance. Size and budgets are set by
+environment variables, e.g. for a larger instance:
+
+    NORDPOOL_PLANNER_LOAD_PLANNERS=1000 pytest tests/test_load.py -s
+"""
+
+from collections.abc import Callable
+import datetime as dt
+import os
+import time
+import tracemalloc
+from unittest import mock
+
+from custom_components.nordpool_planner import NordpoolPlanner, get_tick_dispatcher
+from custom_components.nordpool_planner.const import (
+    CONF_DURATION_ENTITY,
+    CONF_END_TIME_ENTITY,
+    CONF_HEALTH_ENTITY,
+    CONF_HIGH_COST_ENTITY,
+    CONF_LOW_COST_ENTITY,
+    CONF_PRICES_ENTITY,
+    CONF_SEARCH_LENGTH_ENTITY,
+    CONF_START_TIME_ENTITY,
+    CONF_STARTS_AT_ENTITY,
+    CONF_TYPE,
+    CONF_TYPE_MOVING,
+    CONF_TYPE_STATIC,
+    CONF_USED_HOURS_LOW_ENTITY,
+    DOMAIN,
+)
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.const import (
+    ATTR_NAME,
+    ATTR_UNIT_OF_MEASUREMENT,
+    EVENT_STATE_CHANGED,
+)
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.setup import async_setup_component
+from homeassistant.util import dt as dt_util
+
+PLANNERS = int(os.environ.get("NORDPOOL_PLANNER_LOAD_PLANNERS", "100"))
+SOURCES = int(os.environ.get("NORDPOOL_PLANNER_LOAD_SOURCES", "4"))
+
+# Budgets, generous by default to pass on slow CI runners
+MAX_LOOP_LAG = float(os.environ.get("NORDPOOL_PLANNER_LOAD_MAX_LAG", "2.0"))
+MIN_REPLANS_PER_SECOND = float(
+    os.environ.get("NORDPOOL_PLANNER_LOAD_MIN_REPLANS", "200")
+)
+MAX_WRITES_PER_REPLAN = float(os.environ.get("NORDPOOL_PLANNER_LOAD_MAX_WRITES", "6"))
+MAX_KIB_PER_PLANNER = float(os.environ.get("NORDPOOL_PLANNER_LOAD_MAX_KIB", "512"))
+
+PROBE_INTERVAL = 0.005
+
+
+class LoadHarness:
+    """Planners of config entries over shared sources, with load metrics.
+
+    Replans are counted per planner update, state writes are the state
+    changed events of planner entities, and the event loop lag is the
+    largest delay of a probe scheduled every few milliseconds.
+    """
+
+    def __init__(self, hass: HomeAssistant, planners: int, sources: int) -> None:
+        """Initialize harness of planners over sources."""
+        self.hass = hass
+        self.planners = planners
+        self.sources = [f"sensor.load_prices_{i}" for i in range(sources)]
+        self.hour = dt_util.now().replace(minute=0, second=0, microsecond=0)
+        self.memory_per_planner = 0.0
+        self.replans = 0
+        self.writes = 0
+        self.lag = 0.0
+        self._probe = None
+        self._probe_at = 0.0
+
+    def prices(self, day: int, source: int) -> list[dict]:
+        """Get hourly prices of day (0 today) of a source."""
+        start = dt_util.start_of_local_day() + dt.timedelta(days=day)
+        return [
+            {
+                "start": start + dt.timedelta(hours=h),
+                "end": start + dt.timedelta(hours=h + 1),
+                "value": 10 + (h * 7 + source * 3 + day * 5) % 13,
+            }
+            for h in range(24)
+        ]
+
+    def set_sources(self, tomorrow: bool = False) -> None:
+        """Set states of price sources, with tomorrow's prices if published."""
+        for i, entity_id in enumerate(self.sources):
+            self.hass.states.async_set(
+                entity_id,
+                "10",
+                {
+                    "raw_today": self.prices(0, i),
+                    "raw_tomorrow": self.prices(1, i) if tomorrow else [],
+                    "tomorrow_valid": tomorrow,
+                    "today": [],
+                    "current_price": 10,
+                    ATTR_UNIT_OF_MEASUREMENT: "EUR/kWh",
+                },
+            )
+
+    async def async_setup(self) -> list[NordpoolPlanner]:
+        """Set up planners from config entries, measuring their memory."""
+        self.set_sources()
+        for i in range(self.planners):
+            data = {
+                ATTR_NAME: f"Load {i}",
+                CONF_PRICES_ENTITY: self.sources[i % len(self.sources)],
+                CONF_LOW_COST_ENTITY: True,
+                CONF_HIGH_COST_ENTITY: True,
+                CONF_HEALTH_ENTITY: True,
+                CONF_STARTS_AT_ENTITY: True,
+                CONF_DURATION_ENTITY: True,
+            }
+            if i % 4 == 3:
+                data[CONF_TYPE] = CONF_TYPE_STATIC
+                data[CONF_START_TIME_ENTITY] = True
+                data[CONF_END_TIME_ENTITY] = True
+                data[CONF_USED_HOURS_LOW_ENTITY] = True
+            else:
+                data[CONF_TYPE] = CONF_TYPE_MOVING
+                data[CONF_SEARCH_LENGTH_ENTITY] = True
+            MockConfigEntry(
+                domain=DOMAIN,
+                data=data,
+                options={ATTR_UNIT_OF_MEASUREMENT: "EUR/kWh"},
+                version=2,
+                minor_version=2,
+                unique_id=f"load_{i}",
+            ).add_to_hass(self.hass)
+
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            assert await async_setup_component(self.hass, DOMAIN, {})
+            await self.hass.async_block_till_done()
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        self.memory_per_planner = (after - before) / self.planners
+        self.hass.bus.async_listen(EVENT_STATE_CHANGED, self._async_state_changed)
+        return list(self.hass.data[DOMAIN].values())
+
+    @callback
+    def _async_state_changed(self, event) -> None:
+        """Count state writes of planner entities."""
+        if event.data["entity_id"].split(".")[1].startswith("load_"):
+            self.writes += 1
+
+    def _probe_loop(self) -> None:
+        """Record the delay of the probe and schedule the next."""
+        now = time.perf_counter()
+        self.lag = max(self.lag, now - self._probe_at - PROBE_INTERVAL)
+        self._probe_at = now
+        self._probe = self.hass.loop.call_later(PROBE_INTERVAL, self._probe_loop)
+
+    async def async_storm(self, name: str, fire: Callable[[], None]) -> dict:
+        """Fire a storm of events and measure the load until all is done."""
+        self.replans = self.writes = 0
+        self.lag = 0.0
+        original = NordpoolPlanner._update_plan
+
+        def _update_plan(planner, *args):
+            self.replans += 1
+            return original(planner, *args)
+
+        with mock.patch.object(NordpoolPlanner, "_update_plan", _update_plan):
+            self._probe_at = started = time.perf_counter()
+            self._probe = self.hass.loop.call_later(PROBE_INTERVAL, self._probe_loop)
+            fire()
+            await self.hass.async_block_till_done()
+            elapsed = time.perf_counter() - started
+            self._probe.cancel()
+            # The storm itself delays the first probe
+            self.lag = max(self.lag, time.perf_counter() - self._probe_at)
+
+        metrics = {
+            "storm": name,
+            "replans": self.replans,
+            "seconds": elapsed,
+            "replans_per_second": self.replans / elapsed,
+            "writes_per_second": self.writes / elapsed,
+            "writes_per_replan": self.writes / max(self.replans, 1),
+            "loop_lag": self.lag,
+        }
+        print(  # noqa: T201
+            "{storm}: {replans} replans in {seconds:.3f} s, "
+            "{replans_per_second:.0f} replans/s, {writes_per_second:.0f} writes/s, "
+            "max loop lag {loop_lag:.3f} s".format(**metrics)
+        )
+        return metrics
+
+
+def check_budgets(metrics: dict) -> None:
+    """Fail if the metrics of a storm exceed the budgets."""
+    assert metrics["replans"] > 0, metrics
+    assert metrics["loop_lag"] <= MAX_LOOP_LAG, metrics
+    assert metrics["replans_per_second"] >= MIN_REPLANS_PER_SECOND, metrics
+    assert metrics["writes_per_replan"] <= MAX_WRITES_PER_REPLAN, metrics
+
+
+@pytest.mark.asyncio
+async def test_load_event_storms(hass):
+    """Test many planners keep within budgets through storms of events."""
+    harness = LoadHarness(hass, PLANNERS, SOURCES)
+    planners = await harness.async_setup()
+    assert len(planners) == PLANNERS
+    print(f"{harness.memory_per_planner / 1024:.1f} KiB per planner")  # noqa: T201
+    assert harness.memory_per_planner <= MAX_KIB_PER_PLANNER * 1024
+
+    dispatcher = get_tick_dispatcher(hass)
+    next_hour = harness.hour + dt.timedelta(hours=1)
+
+    # Every batch is replanned at the top of the hour
+    metrics = await harness.async_storm("tick", lambda: dispatcher.tick(next_hour))
+    check_budgets(metrics)
+    assert metrics["replans"] == PLANNERS
+
+    # Tomorrow's prices are published for all sources, picked up by the tick
+    def publish_tomorrow():
+        harness.set_sources(tomorrow=True)
+        dispatcher.tick(next_hour)
+
+    check_budgets(await harness.async_storm("tomorrow", publish_tomorrow))
+
+    # Burst of duration changes, each planner changed twice in a row
+    durations = [planner._duration_number_entity for planner in planners]
+
+    def change_numbers():
+        for value in ("2", "3"):
+            for i, entity_id in enumerate(durations):
+                hass.states.async_set(entity_id, str(int(value) + i % 3))
+
+    metrics = await harness.async_storm("numbers", change_numbers)
+    check_budgets(metrics)
+    assert metrics["replans"] <= 2 * PLANNERS
+
+    for entry in hass.config_entries.async_entries(DOMAIN):
+        assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
@@ -1,8 +1,19 @@
 """planner tests."""
 
+import datetime as dt
+import functools
+import logging
+import operator
+import threading
 from unittest import mock
 
-from custom_components.nordpool_planner import NordpoolPlanner
+from custom_components.nordpool_planner import (
+    PROFILE_SCHEMA,
+    NordpoolPlanner,
+    async_profile,
+    get_tick_dispatcher,
+    get_worker_pool,
+)
 
 # from pytest_homeassistant_custom_component.async_mock import patch
 # from pytest_homeassistant_custom_component.common import (
@@ -12,20 +23,44 @@ from custom_components.nordpool_planner import NordpoolPlanner
 #     mock_platform,
 # )
 from custom_components.nordpool_planner.const import (
+    ATTR_CONFIG_ENTRY_ID,
+    CONF_ACCEPT_COST_ENTITY,
+    CONF_CO2_ENTITY,
+    CONF_CO2_WEIGHT_ENTITY,
     CONF_DURATION_ENTITY,
+    CONF_END_TIME_ENTITY,
+    CONF_GROUP,
+    CONF_GROUP_POWER_LIMIT,
+    CONF_POWER_ENTITY,
     CONF_PRICES_ENTITY,
+    CONF_PRICES_PATH,
+    CONF_PRICES_START_FIELD,
+    CONF_PRICES_VALUE_FIELD,
     CONF_SEARCH_LENGTH_ENTITY,
     CONF_TYPE,
+    CONF_WORKERS,
+    DATA_PROFILER,
+    DATA_WORKERS,
     DOMAIN,
+    PLAN_TRACE_SIZE,
+    SERVICE_PROFILE,
+    PlannerStates,
 )
+from custom_components.nordpool_planner.deadline import DeadlinePlan
+from custom_components.nordpool_planner.group import schedule_group
+from custom_components.nordpool_planner.profiling import summary
 import pytest
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
 
 from homeassistant import config_entries
 from homeassistant.const import ATTR_NAME, ATTR_UNIT_OF_MEASUREMENT
+from homeassistant.exceptions import ServiceValidationError
 
 # from homeassistant.components import sensor
 # from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.setup import async_setup_component
+from homeassistant.util import dt as dt_util
 
 NAME = "My planner 1"
 TYPE = "moving"
@@ -98,3 +133,544 @@ async def test_planner_init(hass):
     assert planner.name == NAME
     assert planner._is_static == False
     assert planner._is_moving == True
+
+
+@pytest.mark.asyncio
+async def test_planner_transitions(hass):
+    """Test outputs are written at the exact start and end of planned window."""
+    planner = NordpoolPlanner(hass, CONF_ENTRY)
+    listener = mock.Mock()
+    planner.register_output_listener_entity(listener, "low_cost_entity")
+
+    now = dt_util.utcnow()
+    start = now + dt.timedelta(minutes=7)
+    end = start + dt.timedelta(hours=1)
+    planner.low_cost_state.starts_at = start
+    planner.low_cost_state.ends_at = end
+
+    planner.publish(now)
+    assert listener.update_callback.call_count == 1
+    assert not planner.low_cost_state.on_at(now)
+
+    # Nothing changed, no state written
+    planner.publish(now)
+    assert listener.update_callback.call_count == 1
+
+    async_fire_time_changed(hass, start)
+    await hass.async_block_till_done()
+    assert listener.update_callback.call_count == 2
+    assert planner.low_cost_state.on_at(start)
+
+    async_fire_time_changed(hass, end)
+    await hass.async_block_till_done()
+    assert listener.update_callback.call_count == 3
+    assert not planner.low_cost_state.on_at(end)
+    assert planner.low_cost_state.on_hours(now, end + dt.timedelta(hours=1)) == 1.0
+
+    planner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_planner_moving_update_cached(hass):
+    """Test a moving planner finds the cheapest window and reuses the plan."""
+    now = dt_util.now()
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    raw = [
+        {"start": hour + dt.timedelta(hours=i), "value": v}
+        for i, v in enumerate([5, 4, 1, 1, 6, 7, 3, 8, 9, 9, 9, 9])
+    ]
+    hass.states.async_set(
+        PRICES_ENT,
+        "5",
+        {"today": [], "raw_today": raw, "tomorrow_valid": False, "current_price": 5},
+    )
+    hass.states.async_set("number.duration", "2")
+    hass.states.async_set("number.search_length", "10")
+
+    planner = NordpoolPlanner(hass, CONF_ENTRY)
+    planner.register_input_entity_id("number.duration", CONF_DURATION_ENTITY)
+    planner.register_input_entity_id("number.search_length", CONF_SEARCH_LENGTH_ENTITY)
+
+    planner.update(hour + dt.timedelta(minutes=5))
+    assert planner.low_cost_state.starts_at == hour + dt.timedelta(hours=2)
+    assert planner.low_cost_state.ends_at == hour + dt.timedelta(hours=4)
+    assert planner.low_cost_state.cost_at == 1
+
+    # Later in the same slot only the window at the start is priced again
+    hits = planner._plan_cache.hits
+    planner.update(hour + dt.timedelta(minutes=35))
+    assert planner._plan_cache.hits == hits + 1
+    assert planner.low_cost_state.starts_at == hour + dt.timedelta(hours=2)
+
+    # A planner with the same settings gets the plan and the statistics
+    other = NordpoolPlanner(hass, CONF_ENTRY)
+    other.register_input_entity_id("number.duration", CONF_DURATION_ENTITY)
+    other.register_input_entity_id("number.search_length", CONF_SEARCH_LENGTH_ENTITY)
+    other.update(hour + dt.timedelta(minutes=40))
+    assert planner._plan_cache.hits == hits + 2
+    assert other.low_cost_state.starts_at == hour + dt.timedelta(hours=2)
+    assert other._price_statistics is planner._price_statistics
+    assert planner._price_statistics.mean == 62 / 11
+
+    # The window at the start wins when it gets cheapest within the slot
+    hour = hour + dt.timedelta(hours=2)
+    planner.update(hour + dt.timedelta(minutes=5))
+    misses = planner._plan_cache.misses
+    planner.update(hour + dt.timedelta(minutes=55))
+    assert planner._plan_cache.misses == misses
+    assert planner.low_cost_state.starts_at == hour + dt.timedelta(minutes=55)
+
+    other.cleanup()
+    planner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_planner_traces(hass):
+    """Test updates are traced with the rule that fired, in a bounded buffer."""
+    now = dt_util.now()
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    raw = [
+        {"start": hour + dt.timedelta(hours=i), "value": v}
+        for i, v in enumerate([5, 4, 1, 1, 6, 7, 3, 8, 9, 9, 9, 9])
+    ]
+    hass.states.async_set(
+        PRICES_ENT,
+        "5",
+        {"today": [], "raw_today": raw, "tomorrow_valid": False, "current_price": 5},
+    )
+    hass.states.async_set("number.duration", "2")
+    hass.states.async_set("number.search_length", "10")
+    hass.states.async_set("number.accept_cost", "2")
+
+    planner = NordpoolPlanner(hass, CONF_ENTRY)
+    planner.register_input_entity_id("number.duration", CONF_DURATION_ENTITY)
+    planner.register_input_entity_id("number.search_length", CONF_SEARCH_LENGTH_ENTITY)
+    planner.register_input_entity_id("number.accept_cost", CONF_ACCEPT_COST_ENTITY)
+
+    planner.update(now)
+    trace = planner._traces.as_dict()[0]
+    assert trace["rule"] == "accept_cost"
+    assert trace["windows"] == 9
+    assert not trace["cached"]
+    assert trace["inputs"]["accept_cost"] == 2
+    assert trace["lowest"]["start"] == hour + dt.timedelta(hours=2)
+    assert trace["status"] == "ok"
+
+    for _ in range(PLAN_TRACE_SIZE + 5):
+        planner.update(now)
+    assert len(planner._traces) == PLAN_TRACE_SIZE
+    trace = planner._traces.as_dict()[0]
+    assert trace["cached"]
+    assert trace["rule"] == "accept_cost"
+    assert trace["windows"] == 9
+
+    planner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_profile_service(hass, tmp_path):
+    """Test the next replans are profiled and the stats written at the limit."""
+    hass.config.config_dir = str(tmp_path)
+    planner = NordpoolPlanner(hass, CONF_ENTRY)
+    hass.data[DOMAIN] = {CONF_ENTRY.entry_id: planner}
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        functools.partial(async_profile, hass),
+        schema=PROFILE_SCHEMA,
+    )
+
+    with pytest.raises(ServiceValidationError):
+        await hass.services.async_call(
+            DOMAIN, SERVICE_PROFILE, {ATTR_CONFIG_ENTRY_ID: "unknown"}, blocking=True
+        )
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_PROFILE,
+        {ATTR_CONFIG_ENTRY_ID: CONF_ENTRY.entry_id, "replans": 2},
+        blocking=True,
+    )
+    with pytest.raises(ServiceValidationError):
+        await hass.services.async_call(DOMAIN, SERVICE_PROFILE, {}, blocking=True)
+
+    planner.update()
+    assert hass.data[DATA_PROFILER].profiled == 1
+    planner.update()
+    assert DATA_PROFILER not in hass.data
+    await hass.async_block_till_done(wait_background_tasks=True)
+
+    files = list(tmp_path.glob("*.prof"))
+    assert len(files) == 1
+    assert any("_update_plan" in row[0] for row in summary(str(files[0])))
+
+    # Timeout stops a profile without replans, nothing is written
+    await hass.services.async_call(
+        DOMAIN, SERVICE_PROFILE, {"timeout": 5}, blocking=True
+    )
+    async_fire_time_changed(hass, dt_util.utcnow() + dt.timedelta(seconds=6))
+    await hass.async_block_till_done()
+    assert DATA_PROFILER not in hass.data
+
+    planner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_planners_share_prices_batch(hass):
+    """Test planners of the same source share prices and are updated together."""
+    planner_1 = NordpoolPlanner(hass, CONF_ENTRY)
+    planner_2 = NordpoolPlanner(hass, CONF_ENTRY)
+    await planner_1.async_setup()
+    await planner_2.async_setup()
+
+    batch = planner_1._prices_batch
+    assert planner_2._prices_batch is batch
+    assert planner_2._prices_entity is planner_1._prices_entity
+    assert batch.planners == [planner_1, planner_2]
+
+    with mock.patch.object(NordpoolPlanner, "update") as update:
+        batch.update()
+    assert update.call_count == 2
+    assert update.call_args_list[0].args == update.call_args_list[1].args
+
+    # Statistics are shared by planners searching the same range
+    assert planner_2._price_statistics is planner_1._price_statistics
+    hass.states.async_set("number.search_length", "10")
+    planner_2.register_input_entity_id(
+        "number.search_length", CONF_SEARCH_LENGTH_ENTITY
+    )
+    assert planner_2._price_statistics is not planner_1._price_statistics
+    assert batch.as_dict()["statistics"] == 2
+
+    # Same source read with a declared adapter is another batch
+    declared = config_entries.ConfigEntry(
+        data={
+            **CONF_ENTRY.data,
+            CONF_PRICES_PATH: "raw_today",
+            CONF_PRICES_START_FIELD: "start",
+            CONF_PRICES_VALUE_FIELD: "value",
+        },
+        options=CONF_ENTRY.options,
+        domain=DOMAIN,
+        version=2,
+        minor_version=0,
+        source="user",
+        title="Nordpool Planner",
+        unique_id="654321",
+        discovery_keys=None,
+    )
+    planner_3 = NordpoolPlanner(hass, declared)
+    await planner_3.async_setup()
+    assert planner_3._prices_batch is not batch
+    assert planner_3._prices_entity._adapter.path == "raw_today"
+    assert (
+        planner_3._prices_entity.source_version
+        != planner_1._prices_entity.source_version
+    )
+
+    planner_2.cleanup()
+    assert batch.as_dict()["statistics"] == 1
+    planner_1.cleanup()
+    planner_3.cleanup()
+    assert batch.planners == []
+
+
+@pytest.mark.asyncio
+async def test_tick_dispatcher(hass):
+    """Test one dispatcher updates batches in source order on their slot boundaries."""
+    dispatcher = get_tick_dispatcher(hass)
+    hourly = mock.Mock(key=("sensor.b", ""), tick_minutes=60, planners=[1])
+    quarterly = mock.Mock(key=("sensor.a", ""), tick_minutes=15, planners=[1, 2])
+    dispatcher.add(hourly)
+    dispatcher.add(quarterly)
+    order = mock.Mock()
+    order.attach_mock(hourly.update, "hourly")
+    order.attach_mock(quarterly.update, "quarterly")
+
+    now = dt_util.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    dispatcher.tick(now)
+    assert order.mock_calls == [mock.call.quarterly(now), mock.call.hourly(now)]
+
+    dispatcher.tick(now + dt.timedelta(minutes=15))
+    assert hourly.update.call_count == 1
+    assert quarterly.update.call_count == 2
+    assert dispatcher.ticks == 2
+    assert len(dispatcher.latencies) == 2
+
+    dispatcher.remove(hourly)
+    dispatcher.remove(quarterly)
+    assert dispatcher._time_listener is None
+
+
+@pytest.mark.asyncio
+async def test_planner_single_flight(hass):
+    """Test requests during an update are merged into one follow-up update."""
+    planner = NordpoolPlanner(hass, CONF_ENTRY)
+    generations = []
+
+    def _update(now, prices_updated, generation):
+        generations.append(generation)
+        if len(generations) == 1:
+            planner.update()
+            planner.update()
+            assert planner._superseded(generation)
+
+    with mock.patch.object(planner, "_update", side_effect=_update):
+        planner.update()
+
+    assert generations == [1, 3]
+    assert not planner._update_running
+
+
+@pytest.mark.asyncio
+async def test_planner_run_in_pool(hass):
+    """Test jobs run in the worker pool, superseded jobs are dropped."""
+    planner = NordpoolPlanner(hass, CONF_ENTRY)
+
+    def _sum(values, cancelled):
+        return sum(values)
+
+    with mock.patch.object(planner, "update") as update:
+        assert planner.run_in_pool("a", _sum, [1, 2]) is None
+        assert planner.run_in_pool("b", _sum, [3, 4]) is None
+        await hass.async_block_till_done(wait_background_tasks=True)
+
+        assert update.call_count == 1
+        assert planner.run_in_pool("b", _sum, [3, 4]) == 7
+
+    planner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_planner_run_in_pool_timeout(hass):
+    """Test a job timing out keeps the last plan, is stopped and retried."""
+    hass.data[DATA_WORKERS] = 1
+    planner = NordpoolPlanner(hass, CONF_ENTRY)
+    stopped = threading.Event()
+
+    def _wait(cancelled):
+        if cancelled.wait(10):
+            stopped.set()
+
+    with (
+        mock.patch("custom_components.nordpool_planner.PLANNER_TIMEOUT", 0.01),
+        mock.patch.object(planner, "update") as update,
+    ):
+        assert planner.run_in_pool("a", _wait) is None
+        await hass.async_block_till_done(wait_background_tasks=True)
+
+    assert update.call_count == 0
+    assert planner.planner_status.status == PlannerStates.Warning
+    assert planner._job_key is None
+
+    # The job stopped and its worker, the only one, takes the next job
+    assert stopped.wait(1)
+    assert get_worker_pool(hass).submit(int).result(1) == 0
+
+    planner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_planner_run_in_pool_superseded_failure(hass):
+    """Test a superseded job failing late leaves the newer job alone."""
+    planner = NordpoolPlanner(hass, CONF_ENTRY)
+    planner._job_key = "b"
+    status = planner.planner_status.status
+
+    def _fail(cancelled):
+        return operator.truediv(1, 0)
+
+    await planner._async_run_job("a", _fail, ())
+
+    assert planner._job_key == "b"
+    assert planner.planner_status.status == status
+
+    planner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_size(hass):
+    """Test the worker pool is sized from the configuration."""
+    assert await async_setup_component(hass, DOMAIN, {DOMAIN: {CONF_WORKERS: 3}})
+    assert get_worker_pool(hass)._max_workers == 3
+
+
+@pytest.mark.asyncio
+async def test_planner_deadline_transitions(hass):
+    """Test a deadline planner moves on to its next interval between updates."""
+    now = dt_util.now().replace(minute=0, second=0, microsecond=0)
+    raw = [
+        {"start": now + dt.timedelta(hours=i), "value": v}
+        for i, v in enumerate([9, 1, 9, 1, 9, 9, 9, 9, 9, 9, 9, 9])
+    ]
+    hass.states.async_set(PRICES_ENT, "5", {"today": [], "raw_today": raw})
+    hass.states.async_set("number.duration", "2")
+    hass.states.async_set("number.end_time", str((now.hour + 6) % 24))
+    entry = config_entries.ConfigEntry(
+        data={
+            ATTR_NAME: "Dishwasher",
+            CONF_TYPE: "deadline",
+            CONF_PRICES_ENTITY: PRICES_ENT,
+        },
+        options={},
+        domain=DOMAIN,
+        version=2,
+        minor_version=0,
+        source="user",
+        title="Dishwasher",
+        unique_id="dishwasher",
+        discovery_keys=None,
+    )
+    planner = NordpoolPlanner(hass, entry)
+    planner.register_input_entity_id("number.duration", CONF_DURATION_ENTITY)
+    planner.register_input_entity_id("number.end_time", CONF_END_TIME_ENTITY)
+    listener = mock.Mock()
+    planner.register_output_listener_entity(listener, "low_cost_entity")
+
+    planner.update(now)
+    assert planner.low_cost_state.starts_at == now + dt.timedelta(hours=1)
+    assert planner.low_cost_state.ends_at == now + dt.timedelta(hours=2)
+
+    for hours in (1, 2):
+        async_fire_time_changed(hass, now + dt.timedelta(hours=hours))
+        await hass.async_block_till_done()
+    # No update since, the end of the first interval set the second
+    assert planner._last_update == now
+    assert planner.low_cost_state.starts_at == now + dt.timedelta(hours=3)
+    assert planner.low_cost_state.ends_at == now + dt.timedelta(hours=4)
+    assert not planner.low_cost_state.on_at(now + dt.timedelta(hours=2))
+
+    async_fire_time_changed(hass, now + dt.timedelta(hours=3))
+    await hass.async_block_till_done()
+    assert planner.low_cost_state.on_at(now + dt.timedelta(hours=3))
+
+    planner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_planner_group_power_limit(hass, caplog):
+    """Test grouped deadline planners are not planned above the power limit."""
+    now = dt_util.now().replace(minute=0, second=0, microsecond=0)
+    raw = [
+        {"start": now + dt.timedelta(hours=i), "value": v}
+        for i, v in enumerate([5, 1, 2, 6, 7, 8, 9, 9, 9, 9, 9, 9])
+    ]
+    hass.states.async_set(PRICES_ENT, "5", {"today": [], "raw_today": raw})
+    hass.states.async_set("number.duration", "1")
+    hass.states.async_set("number.end_time", str((now.hour + 6) % 24))
+
+    planners = []
+    for name, power in [("EV", "7"), ("Heater", "3")]:
+        entry = config_entries.ConfigEntry(
+            data={
+                ATTR_NAME: name,
+                CONF_TYPE: "deadline",
+                CONF_PRICES_ENTITY: PRICES_ENT,
+                CONF_GROUP: "fuse",
+                CONF_GROUP_POWER_LIMIT: 8.0,
+            },
+            options={},
+            domain=DOMAIN,
+            version=2,
+            minor_version=0,
+            source="user",
+            title=name,
+            unique_id=name,
+            discovery_keys=None,
+        )
+        planner = NordpoolPlanner(hass, entry)
+        hass.states.async_set(f"number.{name}_power", power)
+        planner.register_input_entity_id("number.duration", CONF_DURATION_ENTITY)
+        planner.register_input_entity_id("number.end_time", CONF_END_TIME_ENTITY)
+        planner.register_input_entity_id(f"number.{name}_power", CONF_POWER_ENTITY)
+        await planner.async_setup()
+        planners.append(planner)
+    ev, heater = planners
+    assert ev._group is heater._group
+
+    ev.update(now)
+    # The more powerful is placed first in the cheapest hour, the other is
+    # pushed to the second cheapest by the group without updating itself
+    assert ev.low_cost_state.starts_at == now + dt.timedelta(hours=1)
+    assert heater.low_cost_state.starts_at == now + dt.timedelta(hours=2)
+    assert max(ev._group.schedule.load) <= 8.0
+    assert heater.deadline_plan.deadlines[0]["missing"] == 0
+
+    # Nothing changed, nothing to warn about
+    caplog.clear()
+    ev.update(now)
+    assert not [r for r in caplog.records if r.levelno >= logging.WARNING]
+
+    # Updates later in the same price slot reuse the joint schedule
+    with mock.patch(
+        "custom_components.nordpool_planner.schedule_group", wraps=schedule_group
+    ) as solve:
+        heater.update(now + dt.timedelta(minutes=10))
+        ev.update(now + dt.timedelta(minutes=10))
+    assert solve.call_count == 0
+    assert heater.low_cost_state.starts_at == now + dt.timedelta(hours=2)
+
+    # A push supersedes an update in flight, which replans in a follow-up
+    plan = heater.deadline_plan
+    other = DeadlinePlan([], plan.deadlines)
+    generation = heater._update_generation
+    later = now + dt.timedelta(minutes=10)
+    heater._update_running = True
+    heater.push_deadline_plan(later, other)
+    assert heater.deadline_plan is plan
+    assert heater._update_generation == generation + 1
+    assert heater._update_pending
+    heater._update_running = heater._update_pending = False
+
+    # A push older than the last update of the planner is ignored
+    heater._last_update = later + dt.timedelta(minutes=5)
+    heater.push_deadline_plan(later, other)
+    assert heater.deadline_plan is plan
+
+    for planner in planners:
+        planner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_planner_co2_weight(hass):
+    """Test windows are ranked by price plus weighted CO2 intensity."""
+    now = dt_util.now()
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    raw = [
+        {"start": hour + dt.timedelta(hours=i), "value": v}
+        for i, v in enumerate([5, 4, 1, 1, 6, 7, 3, 8, 9, 9, 9, 9])
+    ]
+    co2 = [
+        {"start": hour + dt.timedelta(hours=i), "value": v}
+        for i, v in enumerate([100, 100, 900, 900] + [500] * 8)
+    ]
+    hass.states.async_set(PRICES_ENT, "5", {"today": [], "raw_today": raw})
+    hass.states.async_set("sensor.co2", "100", {"today": [], "raw_today": co2})
+    hass.states.async_set("number.duration", "2")
+    hass.states.async_set("number.search_length", "10")
+    hass.states.async_set("number.co2_weight", "0")
+
+    entry = config_entries.ConfigEntry(
+        data={**CONF_ENTRY.data, CONF_CO2_ENTITY: "sensor.co2"},
+        options={},
+        domain=DOMAIN,
+        version=2,
+        minor_version=0,
+        source="user",
+        title="Nordpool Planner",
+        unique_id="co2",
+        discovery_keys=None,
+    )
+    planner = NordpoolPlanner(hass, entry)
+    planner.register_input_entity_id("number.duration", CONF_DURATION_ENTITY)
+    planner.register_input_entity_id("number.search_length", CONF_SEARCH_LENGTH_ENTITY)
+    planner.register_input_entity_id("number.co2_weight", CONF_CO2_WEIGHT_ENTITY)
+
+    planner.update(hour)
+    assert planner.low_cost_state.starts_at == hour + dt.timedelta(hours=2)
+
+    hass.states.async_set("number.co2_weight", "0.01")
+    planner.update(hour)
+    assert planner.low_cost_state.starts_at == hour
+    assert planner.low_cost_state.cost_at == 4.5
+
+    planner.cleanup()
@@ -0,0 +1,160 @@
+"""planning core and command line tests."""
+
+import ast
+import datetime as dt
+import json
+import pathlib
+
+from custom_components.nordpool_planner import cli
+from custom_components.nordpool_planner.cache import PlanCache
+from custom_components.nordpool_planner.planning import (
+    moving_range,
+    normalize_prices,
+    plan_windows,
+    static_duration_left,
+    static_range,
+)
+from custom_components.nordpool_planner.series import PriceSeries
+from custom_components.nordpool_planner.stats import RollingPriceStatistics
+
+START = dt.datetime(2025, 1, 1, tzinfo=dt.UTC)
+VALUES = [5, 4, 1, 1, 6, 7, 3, 8, 9, 9, 9, 9]
+
+
+def test_normalize_prices_formats():
+    """Test lists, Nordpool and ENTSO-e attributes and diagnostics are read."""
+    raw = [
+        {"start": (START + dt.timedelta(hours=i)).isoformat(), "value": v}
+        for i, v in enumerate(VALUES)
+    ]
+    entsoe = {
+        "prices": [{"time": p["start"], "price": p["value"]} for p in raw],
+    }
+    diagnostics = {
+        "data": {
+            "planner": {
+                "_prices_entity": {
+                    "_np": {"attributes": {"raw_today": raw, "tomorrow_valid": False}}
+                }
+            }
+        }
+    }
+
+    for data in [raw, entsoe, diagnostics]:
+        prices = normalize_prices(data)
+        assert prices[0] == {"start": START, "value": 5}
+        assert len(prices) == len(VALUES)
+
+
+def test_static_range_and_quota():
+    """Test static range over midnight and duration left of quota."""
+    now = START.replace(hour=20)
+    assert static_range(now, 18, 7) == (
+        now,
+        START.replace(hour=7) + dt.timedelta(days=1),
+    )
+    assert static_range(START.replace(hour=10), 18, 7)[0] == START.replace(hour=18)
+    assert static_duration_left(3, 1) == dt.timedelta(hours=2)
+    assert static_duration_left(3, 3) is None
+
+
+def test_plan_windows_accept_cost():
+    """Test lowest window and the first accepted window."""
+    series = PriceSeries(
+        [
+            {"start": START + dt.timedelta(hours=i), "value": v}
+            for i, v in enumerate(VALUES)
+        ]
+    )
+    end = START + dt.timedelta(hours=10)
+    duration = dt.timedelta(hours=2)
+
+    lowest, highest = plan_windows(
+        series, START, end, duration, RollingPriceStatistics()
+    )
+    assert lowest.start_time == START + dt.timedelta(hours=2)
+    assert highest.average == 9
+
+    lowest, _ = plan_windows(
+        series, START, end, duration, RollingPriceStatistics(), accept_cost=5
+    )
+    assert lowest.start_time == START
+
+
+def test_plan_windows_cached_slots():
+    """Test plans from the cache are the same as planned from scratch."""
+    series = PriceSeries(
+        [
+            {"start": START + dt.timedelta(minutes=15 * i), "value": v}
+            for i, v in enumerate(VALUES * 4)
+        ]
+    )
+    cache = PlanCache(8)
+    duration = dt.timedelta(hours=1, minutes=10)
+    for minutes in range(0, 360, 2):
+        start, end = moving_range(START + dt.timedelta(minutes=minutes), 4.5)
+        for rules in ({}, {"accept_rate": 0.5}, {"accept_percentile": 20}):
+            planned = plan_windows(
+                series, start, end, duration, RollingPriceStatistics(), **rules
+            )
+            cached = plan_windows(
+                series,
+                start,
+                end,
+                duration,
+                RollingPriceStatistics(),
+                cache=cache,
+                key=tuple(rules),
+                **rules,
+            )
+            assert [(w.start_time, w.average) for w in cached] == [
+                (w.start_time, w.average) for w in planned
+            ]
+    assert cache.hits > cache.misses
+
+
+def test_cli_json_lines(tmp_path):
+    """Test the command line plans files in parallel and writes JSON lines."""
+    files = []
+    for n in range(3):
+        path = tmp_path / f"prices_{n}.json"
+        path.write_text(
+            json.dumps(
+                [
+                    {"start": (START + dt.timedelta(hours=i)).isoformat(), "value": v}
+                    for i, v in enumerate(VALUES[n:] + VALUES[:n])
+                ]
+            )
+        )
+        files.append(str(path))
+    output = tmp_path / "plans.jsonl"
+
+    assert (
+        cli.main(["--duration", "2", "--workers", "2", "--output", str(output), *files])
+        == 0
+    )
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [line["file"] for line in lines] == files
+    assert lines[0]["low_starts_at"] == (START + dt.timedelta(hours=2)).isoformat()
+
+    assert (
+        cli.main(["--every-slot", "--workers", "1", "--output", str(output), files[0]])
+        == 0
+    )
+    assert len(output.read_text().splitlines()) == len(VALUES)
+    assert cli.main(["--output", str(output), str(tmp_path / "missing.json")]) == 1
+
+
+def test_core_without_home_assistant():
+    """Test the planning core modules do not import Home Assistant."""
+    package = pathlib.Path(cli.__file__).parent
+    for name in ("cli", "planning", "series", "stats"):
+        tree = ast.parse((package / f"{name}.py").read_text(encoding="utf-8"))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                modules = [node.module or ""]
+            else:
+                continue
+            assert not any(m.startswith("homeassistant") for m in modules), name
@@ -0,0 +1,67 @@
+"""price series tests."""
+
+import datetime as dt
+
+from custom_components.nordpool_planner.series import PriceSeries
+
+START = dt.datetime(2025, 1, 1, tzinfo=dt.UTC)
+PRICES = [
+    {"start": START + dt.timedelta(hours=i), "value": v}
+    for i, v in enumerate([4, 1, 2, 8, 3])
+]
+
+
+def test_series_partial_slot_average():
+    """Test that partially elapsed slots are time-weighted."""
+    series = PriceSeries(PRICES)
+    average = series.average(
+        START + dt.timedelta(minutes=40), START + dt.timedelta(minutes=100)
+    )
+
+    assert abs(average - 2) < 1e-9
+
+
+def test_series_windows():
+    """Test that windows start at now and then on every slot start."""
+    series = PriceSeries(PRICES)
+    now = START + dt.timedelta(minutes=40)
+    windows = series.windows(now, START + dt.timedelta(hours=5), dt.timedelta(hours=2))
+
+    assert [w.start_time for w in windows] == [
+        now,
+        START + dt.timedelta(hours=1),
+        START + dt.timedelta(hours=2),
+        START + dt.timedelta(hours=3),
+    ]
+    assert abs(windows[0].average - 11 / 6) < 1e-9
+    assert windows[1].average == 1.5
+    assert series.average(START, START + dt.timedelta(hours=6)) is None
+
+
+def test_series_secondary_aligned():
+    """Test a second series is aligned to slots and averaged with the windows."""
+    series = PriceSeries(PRICES)
+    # Quarter-hourly CO2 intensity, only known for the first three hours
+    co2 = PriceSeries(
+        [
+            {
+                "start": START + dt.timedelta(minutes=15 * i),
+                "value": 100 + 10 * (i // 4),
+            }
+            for i in range(12)
+        ]
+    )
+    blended = series.with_secondary(series.aligned(co2))
+
+    assert blended.secondary == [100, 110, 120, None, None]
+    assert blended.values is series.values
+    assert series.secondary is None
+
+    windows = blended.windows(
+        START, START + dt.timedelta(hours=5), dt.timedelta(hours=2)
+    )
+    assert windows[0].secondary == 105
+    assert windows[0].score(0.1) == 2.5 + 10.5
+    assert windows[2].secondary == 120
+    assert windows[3].secondary is None
+    assert windows[3].score(0.1) == windows[3].average
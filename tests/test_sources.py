@@ -0,0 +1,122 @@
+"""price source adapter tests."""
+
+import datetime as dt
+
+import pytest
+
+from custom_components.nordpool_planner.const import (
+    CONF_PRICES_PATH,
+    CONF_PRICES_START_FIELD,
+    CONF_PRICES_VALUE_FIELD,
+)
+from custom_components.nordpool_planner.sources import (
+    AttributePathAdapter,
+    EntsoeAdapter,
+    NordpoolAdapter,
+    PriceSourceAdapter,
+    configured_adapter,
+    detect_adapter,
+    register_adapter,
+)
+
+from homeassistant.core import State
+
+START = dt.datetime(2025, 1, 1, tzinfo=dt.UTC)
+
+
+def test_detect_nordpool():
+    """Test Nordpool format is detected and today and tomorrow are combined."""
+    raw = [{"start": START + dt.timedelta(hours=i), "value": i} for i in range(4)]
+    state = State(
+        "sensor.nordpool",
+        "1",
+        {
+            "today": [0, 1],
+            "raw_today": raw[:2],
+            "raw_tomorrow": raw[2:],
+            "tomorrow_valid": True,
+            "current_price": 1,
+        },
+    )
+    adapter = detect_adapter("sensor.nordpool", state)
+
+    assert isinstance(adapter, NordpoolAdapter)
+    assert adapter.has_prices(state)
+    assert adapter.series(state).values == [0, 1, 2, 3]
+    assert adapter.current_price(state) == 1
+
+
+def test_detect_entsoe():
+    """Test ENTSO-e format is detected and prices parsed."""
+    state = State(
+        "sensor.average_electricity_price",
+        "2.5",
+        {
+            "prices_today": [],
+            "prices": [
+                {"time": "2025-01-01 00:00:00+00:00", "price": 2},
+                {"time": "2025-01-01 01:00:00+00:00", "price": 3},
+            ],
+        },
+    )
+    adapter = detect_adapter(state.entity_id, state)
+
+    assert isinstance(adapter, EntsoeAdapter)
+    assert adapter.prices(state)[1]["start"] == START + dt.timedelta(hours=1)
+
+
+def test_register_adapter():
+    """Test a registered adapter is tried before the built-in ones."""
+
+    class TibberAdapter(PriceSourceAdapter):
+        name = "tibber"
+
+        @classmethod
+        def detect(cls, state):
+            return "tibber" in state.attributes
+
+    state = State("sensor.tibber", "1", {"tibber": True, "raw_today": []})
+    register_adapter(TibberAdapter)
+
+    assert isinstance(detect_adapter(state.entity_id, state), TibberAdapter)
+    assert detect_adapter("sensor.unknown", State("sensor.unknown", "1")) is None
+
+
+def test_attribute_path():
+    """Test prices at a declared path are extracted once per state version."""
+    items = [
+        {"startsAt": (START + dt.timedelta(hours=i)).isoformat(), "total": i}
+        for i in range(4)
+    ]
+    state = State(
+        "sensor.tibber", "1", {"data": {"today": items[:2], "tomorrow": items[2:]}}
+    )
+    assert detect_adapter("sensor.tibber", state) is None
+    adapter = configured_adapter(
+        "sensor.tibber",
+        {
+            CONF_PRICES_PATH: "data.today, data.tomorrow",
+            CONF_PRICES_START_FIELD: "startsAt",
+            CONF_PRICES_VALUE_FIELD: "total",
+        },
+    )
+
+    assert isinstance(adapter, AttributePathAdapter)
+    assert adapter.has_prices(state)
+    prices = adapter.prices(state)
+    assert prices[0]["start"] == START
+    assert adapter.series(state).values == [0, 1, 2, 3]
+    assert adapter.prices(state) is prices
+    assert configured_adapter("sensor.nordpool", {}) is None
+
+
+def test_attribute_path_invalid():
+    """Test a declaration not matching the state raises on validate only."""
+    state = State("sensor.other", "1", {"prices": [{"time": "x", "price": 1}]})
+    adapter = AttributePathAdapter("sensor.other", "prices", "time", "price")
+
+    with pytest.raises(ValueError):
+        adapter.validate(state)
+    assert not adapter.has_prices(state)
+    with pytest.raises(KeyError):
+        AttributePathAdapter("sensor.other", "data.0", "time", "price").validate(state)
@@ -0,0 +1,55 @@
+"""rolling price statistics tests."""
+
+import datetime as dt
+import random
+import statistics
+
+from custom_components.nordpool_planner.series import PriceSeries
+from custom_components.nordpool_planner.stats import RollingPriceStatistics
+
+START = dt.datetime(2025, 1, 1, tzinfo=dt.UTC)
+
+
+def _series(values):
+    return PriceSeries(
+        [
+            {"start": START + dt.timedelta(minutes=15 * i), "value": v}
+            for i, v in enumerate(values)
+        ]
+    )
+
+
+def test_stats_rolling_matches_full_recompute():
+    """Test that moving the range incrementally gives the same as recomputing."""
+    rng = random.Random(1)
+    values = [round(rng.uniform(-2, 10), 2) for _ in range(192)]
+    series = _series(values)
+    stats = RollingPriceStatistics()
+
+    for step in range(0, 150, 3):
+        start = START + dt.timedelta(minutes=15 * step + 5)
+        end = start + dt.timedelta(hours=10)
+        stats.update(series, 1, start, end)
+        window = values[step : step + 41]
+
+        assert len(stats) == len(window)
+        assert stats.min == min(window)
+        assert stats.max == max(window)
+        assert abs(stats.mean - statistics.fmean(window)) < 1e-9
+        assert stats.median == statistics.median(window)
+
+
+def test_stats_percentile_and_rank():
+    """Test percentiles and rank of a value in range."""
+    series = _series([5, 1, 4, 2, 3])
+    stats = RollingPriceStatistics()
+    stats.update(series, 1, START, START + dt.timedelta(hours=2))
+
+    assert stats.percentile(0) == 1
+    assert stats.percentile(25) == 2
+    assert stats.percentile(100) == 5
+    assert stats.rank(3) == 40
+
+    # New version of prices restarts the range
+    stats.update(_series([7, 8]), 2, START, START + dt.timedelta(hours=2))
+    assert (stats.min, stats.max) == (7, 8)
@@ -0,0 +1,80 @@
+"""thermal planner tests."""
+
+from concurrent.futures import CancelledError
+import datetime as dt
+import threading
+
+from custom_components.nordpool_planner.thermal import (
+    ThermalOptimizer,
+    ThermalParameters,
+)
+import pytest
+
+START = dt.datetime(2025, 1, 1, tzinfo=dt.UTC)
+
+
+def _slots(prices, minutes=60):
+    step = dt.timedelta(minutes=minutes)
+    return [(START + i * step, START + (i + 1) * step, p) for i, p in enumerate(prices)]
+
+
+def test_thermal_preheat_before_expensive():
+    """Test that heating is moved to cheap slots before expensive ones."""
+    params = ThermalParameters(0.1, 5.0, 5.0, 20.0, 23.0)
+    optimizer = ThermalOptimizer(params, _slots([1, 1, 10, 10, 10, 10]), 0.0)
+    plan = optimizer.plan(20.5)
+
+    assert plan.heat_at(START) is True
+    assert plan.heat_at(START + dt.timedelta(hours=3)) is False
+    assert all(s.temperature_end >= 19.9 for s in plan.steps)
+
+
+def test_thermal_no_heat_when_warm():
+    """Test that no heating is planned when staying inside comfort band."""
+    params = ThermalParameters(0.1, 3.0, 10.0, 20.0, 23.0)
+    optimizer = ThermalOptimizer(params, _slots([1, 2, 3]), 20.0)
+    plan = optimizer.plan(22.0)
+
+    assert plan.next_start(heat=True) is None
+    assert plan.expected_cost == 0
+
+
+def test_thermal_steps_at():
+    """Test getting the current and next step of a plan."""
+    params = ThermalParameters(0.1, 5.0, 5.0, 20.0, 23.0)
+    plan = ThermalOptimizer(params, _slots([1, 1, 10]), 0.0).plan(20.5)
+
+    assert plan.steps_at(START) == (plan.steps[0], plan.steps[1])
+    assert plan.steps_at(START + dt.timedelta(hours=2, minutes=30)) == (
+        plan.steps[2],
+        None,
+    )
+    assert plan.steps_at(START - dt.timedelta(hours=1)) == (None, plan.steps[0])
+    assert plan.steps_at(START + dt.timedelta(hours=3)) == (None, None)
+
+
+def test_thermal_first_slot_from_now():
+    """Test the elapsed part of the first slot is not planned."""
+    params = ThermalParameters(0.1, 5.0, 5.0, 20.0, 23.0)
+    optimizer = ThermalOptimizer(params, _slots([1, 1, 10, 10, 10, 10]), 0.0)
+    now = START + dt.timedelta(minutes=45)
+    full = optimizer.plan(20.5)
+    plan = optimizer.plan(20.5, now)
+
+    assert plan.steps[0].start == now
+    assert plan.steps[-1].end == full.steps[-1].end
+    # A quarter of the cheap slot left does not heat enough to skip heating
+    # in an expensive one, as heating the full slot would
+    assert plan.heat_at(now) is False
+    assert plan.expected_cost > full.expected_cost
+
+
+def test_thermal_cancelled():
+    """Test the backward pass stops when cancelled."""
+    cancelled = threading.Event()
+    params = ThermalParameters(0.1, 5.0, 5.0, 20.0, 23.0)
+    ThermalOptimizer(params, _slots([1, 10]), 0.0, cancelled=cancelled)
+
+    cancelled.set()
+    with pytest.raises(CancelledError):
+        ThermalOptimizer(params, _slots([1, 10]), 0.0, cancelled=cancelled)
@@ -0,0 +1,212 @@
+"""WebSocket API tests."""
+
+import datetime as dt
+
+from custom_components.nordpool_planner.battery import (
+    BatteryOptimizer,
+    BatteryParameters,
+)
+from custom_components.nordpool_planner.const import (
+    CONF_DURATION_ENTITY,
+    CONF_HIGH_COST_ENTITY,
+    CONF_LOW_COST_ENTITY,
+    CONF_PRICES_ENTITY,
+    CONF_SEARCH_LENGTH_ENTITY,
+    CONF_TYPE,
+    CONF_TYPE_MOVING,
+    DOMAIN,
+)
+from custom_components.nordpool_planner.history import PlanHistory
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.const import ATTR_NAME, ATTR_UNIT_OF_MEASUREMENT
+from homeassistant.setup import async_setup_component
+from homeassistant.util import dt as dt_util
+
+PRICES_ENT = "sensor.np_ent"
+
+
+async def setup_planner(hass, hour):
+    """Set up a moving planner over 12 hourly prices from hour."""
+    raw = [
+        {"start": hour + dt.timedelta(hours=i), "value": v}
+        for i, v in enumerate([5, 4, 1, 1, 6, 7, 3, 8, 9, 9, 9, 9])
+    ]
+    hass.states.async_set(
+        PRICES_ENT,
+        "5",
+        {"today": [], "raw_today": raw, "tomorrow_valid": False, "current_price": 5},
+    )
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            ATTR_NAME: "Heater",
+            CONF_TYPE: CONF_TYPE_MOVING,
+            CONF_PRICES_ENTITY: PRICES_ENT,
+            CONF_LOW_COST_ENTITY: True,
+            CONF_HIGH_COST_ENTITY: True,
+            CONF_DURATION_ENTITY: True,
+            CONF_SEARCH_LENGTH_ENTITY: True,
+        },
+        options={ATTR_UNIT_OF_MEASUREMENT: "EUR/kWh"},
+        version=2,
+        minor_version=2,
+    )
+    entry.add_to_hass(hass)
+    assert await async_setup_component(hass, DOMAIN, {})
+    await hass.async_block_till_done()
+    hass.states.async_set("number.heater_duration", "2")
+    hass.states.async_set("number.heater_search_length", "10")
+    await hass.async_block_till_done()
+    return entry
+
+
+@pytest.mark.asyncio
+async def test_websocket_commands(hass, hass_ws_client, tmp_path):
+    """Test plan data is served paginated from the current plan."""
+    hour = dt_util.now().replace(minute=0, second=0, microsecond=0)
+    entry = await setup_planner(hass, hour)
+    planner = hass.data[DOMAIN][entry.entry_id]
+    client = await hass_ws_client(hass)
+
+    await client.send_json_auto_id(
+        {"type": f"{DOMAIN}/timeline", "entry_id": entry.entry_id}
+    )
+    result = (await client.receive_json())["result"]
+    assert result["plan_version"] == planner.plan_version
+    assert [i["kind"] for i in result["timeline"]] == ["low_cost", "high_cost"]
+    assert dt_util.parse_datetime(result["timeline"][0]["start"]) == (
+        hour + dt.timedelta(hours=2)
+    )
+
+    await client.send_json_auto_id(
+        {"type": f"{DOMAIN}/windows", "entry_id": entry.entry_id, "limit": 2}
+    )
+    result = (await client.receive_json())["result"]
+    assert result["total"] == len(planner.ranked_windows()) > 2
+    assert [w["rank"] for w in result["windows"]] == [1, 2]
+    assert [w["average"] for w in result["windows"]] == [1.0, 2.5]
+
+    await client.send_json_auto_id(
+        {"type": f"{DOMAIN}/prices", "entry_id": entry.entry_id, "offset": 10}
+    )
+    result = (await client.receive_json())["result"]
+    assert result["total"] == 12
+    assert [p["value"] for p in result["prices"]] == [9, 9]
+
+    await client.send_json_auto_id(
+        {"type": f"{DOMAIN}/statistics", "entry_id": entry.entry_id}
+    )
+    result = (await client.receive_json())["result"]
+    assert result["plan_version"] == planner.plan_version
+    assert result["prices"]["slots"] > 0
+
+    await client.send_json_auto_id(
+        {"type": f"{DOMAIN}/steps", "entry_id": entry.entry_id}
+    )
+    assert (await client.receive_json())["result"]["steps"] == []
+    planner.battery_plan = BatteryOptimizer(
+        BatteryParameters(10, 5, 5, 1.0),
+        [
+            (hour + dt.timedelta(hours=i), hour + dt.timedelta(hours=i + 1), p)
+            for i, p in enumerate([1, 5])
+        ],
+    ).plan(0)
+    await client.send_json_auto_id(
+        {"type": f"{DOMAIN}/steps", "entry_id": entry.entry_id}
+    )
+    result = (await client.receive_json())["result"]
+    assert [s["action"] for s in result["steps"]] == ["charge", "discharge"]
+    planner.battery_plan = None
+
+    planner._history = PlanHistory(str(tmp_path / "history.bin"), 30)
+    for i, (price, hours) in enumerate([(2.0, 1.0), (4.0, 0.0)]):
+        planner._history.append(
+            (hour - dt.timedelta(hours=2 - i)).timestamp(), price, hours
+        )
+    start = hour - dt.timedelta(hours=3)
+    await client.send_json_auto_id(
+        {
+            "type": f"{DOMAIN}/history",
+            "entry_id": entry.entry_id,
+            "start": start.isoformat(),
+            "end": hour.isoformat(),
+            "daily": False,
+        }
+    )
+    result = (await client.receive_json())["result"]
+    assert result["total"] == 2
+    assert [s["hours"] for s in result["history"]] == [1.0, 0.0]
+    assert dt_util.parse_datetime(result["history"][0]["start"]) == (
+        hour - dt.timedelta(hours=2)
+    )
+    await client.send_json_auto_id(
+        {
+            "type": f"{DOMAIN}/history",
+            "entry_id": entry.entry_id,
+            "start": start.isoformat(),
+            "end": hour.isoformat(),
+        }
+    )
+    result = (await client.receive_json())["result"]
+    assert sum(day["runtime"] for day in result["history"]) == 1.0
+    assert sum(day["cost"] for day in result["history"]) == 2.0
+
+    await client.send_json_auto_id({"type": f"{DOMAIN}/statistics", "entry_id": "x"})
+    response = await client.receive_json()
+    assert not response["success"]
+    assert response["error"]["code"] == "not_found"
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+
+@pytest.mark.asyncio
+async def test_websocket_subscribe(hass, hass_ws_client):
+    """Test subscribers get the changes of the timeline on new plan versions."""
+    hour = dt_util.now().replace(minute=0, second=0, microsecond=0)
+    entry = await setup_planner(hass, hour)
+    planner = hass.data[DOMAIN][entry.entry_id]
+    client = await hass_ws_client(hass)
+
+    await client.send_json_auto_id(
+        {"type": f"{DOMAIN}/subscribe", "entry_id": entry.entry_id}
+    )
+    assert (await client.receive_json())["success"]
+    event = (await client.receive_json())["event"]
+    assert len(event["added"]) == 2
+    assert event["removed"] == []
+
+    # Same plan, nothing pushed
+    version = planner.plan_version
+    planner.update()
+    assert planner.plan_version == version
+
+    hass.states.async_set("number.heater_duration", "3")
+    await hass.async_block_till_done()
+    event = (await client.receive_json())["event"]
+    assert event["plan_version"] == version + 1
+    assert [i["kind"] for i in event["added"]] == ["low_cost", "high_cost"]
+    assert len(event["removed"]) == 2
+    assert dt_util.parse_datetime(event["added"][0]["start"]) == (
+        hour + dt.timedelta(hours=1)
+    )
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+
+@pytest.mark.asyncio
+async def test_migrate_entry(hass):
+    """Test a version 2.2 entry is migrated to 2.3 with its data kept."""
+    hour = dt_util.now().replace(minute=0, second=0, microsecond=0)
+    entry = await setup_planner(hass, hour)
+
+    assert entry.version == 2
+    assert entry.minor_version == 3
+    assert entry.data[CONF_PRICES_ENTITY] == PRICES_ENT
+    assert entry.data[CONF_DURATION_ENTITY] is True
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()